@@ -51,7 +51,8 @@ class Host:
 class Network(object):
     def __init__(self, priority, threshold):
         logger.debug('Network Module created.')
-        self._graph = nx.DiGraph()
+        # The topology version is stored on the graph so it survives deep copies of the network
+        self._graph = nx.DiGraph(topology_version=0)
         self._priority = priority
         self._threshold = threshold
 
@@ -66,6 +67,12 @@ class Network(object):
     def get_threshold(self):
         return self._threshold
 
+    def get_topology_version(self) -> int:
+        return self._graph.graph['topology_version']
+
+    def _topology_changed(self):
+        self._graph.graph['topology_version'] += 1
+
     def get_id_from_ip(self, ip: str) -> int:
         for node_id, host in self._hosts.items():
             if host.ip_address == ip:
@@ -78,6 +85,8 @@ class Network(object):
 
         self._graph.add_node(node.node_id, name=node.name, type="node")
 
+        self._topology_changed()
+
         return True
 
     def remove_node(self, node_id: int) -> bool:
@@ -86,6 +95,8 @@ class Network(object):
         self._nodes.pop(node.node_id)
         self._graph.remove_node(node.node_id)
 
+        self._topology_changed()
+
         return True
 
     def add_edge(self, edge: Edge) -> bool:
@@ -115,6 +126,8 @@ class Network(object):
                              arrival_curve=ArrivalCurve(rate=0.0, burst=0.0),
                              service_curve=ServiceCurve(latency=edge.prop_delay + MAX_PACKET_SIZE_DELAY, rate=edge.rate))
 
+        self._topology_changed()
+
         return True
 
     def remove_edge(self, edge_id: int) -> bool:
@@ -127,6 +140,8 @@ class Network(object):
         self._graph.remove_edge(edge.first_node, edge.second_node)
         self._graph.remove_edge(edge.second_node, edge.first_node)
 
+        self._topology_changed()
+
         return True
 
     def add_host(self, host: Host) -> bool:
@@ -157,6 +172,8 @@ class Network(object):
                              arrival_curve=ArrivalCurve(rate=0.0, burst=0.0),
                              service_curve=ServiceCurve(latency=host.prop_delay + MAX_PACKET_SIZE_DELAY, rate=host.rate))
 
+        self._topology_changed()
+
         return True
 
     def remove_host(self, host_id: int) -> bool:
@@ -168,6 +185,8 @@ class Network(object):
         self._graph.remove_edge(host.connected_switch, host.host_id)
         self._graph.remove_edge(host.host_id, host.connected_switch)
 
+        self._topology_changed()
+
         return True
 
     def get_network_graph(self):
@@ -378,11 +397,51 @@ class NetworkManager(object):
         else:
             print('Numbers of Qs musst be 4 or 8 for now')
 
+        # State version, the version every edge last changed in and the version of the last topology change
+        self._version = 0
+        self._edge_versions: Dict[Tuple[int, int], int] = {}
+        self._topology_version = 0
+        # The current networks were handed out as a snapshot and must not be changed in place
+        self._shared = False
+
     def get_current_networks(self) -> List[Network]:
         return self._q_networks
 
     def update_network_state(self, networks: List[Network]) -> None:
+        """ Replaces the state. Edges whose arrival curves changed (on any queue) get the new state version. """
+        self._version += 1
+        for old, new in zip(self._q_networks, networks):
+            old_edges = old.get_network_graph().edges
+            for u, v, ac in new.get_network_graph().edges(data='arrival_curve'):
+                old_ac = old_edges[u, v]['arrival_curve'] if (u, v) in old_edges else None
+                if old_ac is None or old_ac.rate != ac.rate or old_ac.burst != ac.burst:
+                    self._edge_versions[(u, v)] = self._version
+
         self._q_networks = copy.deepcopy(networks)
+        self._shared = False
+
+    """ Versioned snapshots for optimistic concurrency """
+    def get_version(self) -> int:
+        return self._version
+
+    def get_snapshot(self) -> Tuple[int, List[Network]]:
+        """ Version and networks of the current state. The networks are never changed afterwards (copy-on-write). """
+        self._shared = True
+        return self._version, self._q_networks
+
+    def get_changed_edges(self, version: int):
+        """ Edges that changed after ``version``, None if the topology changed (every edge may differ) """
+        if self._topology_version > version:
+            return None
+        return {edge for edge, edge_version in self._edge_versions.items() if edge_version > version}
+
+    def _change_topology(self) -> List[Network]:
+        if self._shared:
+            self._q_networks = copy.deepcopy(self._q_networks)
+            self._shared = False
+        self._version += 1
+        self._topology_version = self._version
+        return self._q_networks
 
     def is_node_host(self, node_id: int) -> bool:
         return self._q_networks[0].is_host(node_id)
@@ -394,37 +453,37 @@ class NetworkManager(object):
     """ Pass Through for add, remove functions """
 
     def add_node(self, node: Node) -> bool:
-        for q_network in self._q_networks:
+        for q_network in self._change_topology():
             q_network.add_node(node)
 
         return True
 
     def add_edge(self, edge: Edge) -> bool:
-        for q_network in self._q_networks:
+        for q_network in self._change_topology():
             q_network.add_edge(edge)
 
         return True
 
     def add_host(self, host: Host) -> bool:
-        for q_network in self._q_networks:
+        for q_network in self._change_topology():
             q_network.add_host(host)
 
         return True
 
     def remove_node(self, node_id: int) -> bool:
-        for q_network in self._q_networks:
+        for q_network in self._change_topology():
             q_network.remove_node(node_id)
 
         return True
 
     def remove_edge(self, edge_id: int) -> bool:
-        for q_network in self._q_networks:
+        for q_network in self._change_topology():
             q_network.remove_edge(edge_id)
 
         return True
 
     def remove_host(self, host_id: int) -> bool:
-        for q_network in self._q_networks:
+        for q_network in self._change_topology():
             q_network.remove_host(host_id)
 
         return True
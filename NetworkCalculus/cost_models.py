@@ -0,0 +1,111 @@
+from abc import ABC, abstractmethod
+from functools import cached_property
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class LinkState(object):
+    """
+    Per-edge state of one priority network as parallel arrays, in the order of ``edges``.
+
+    Only the queueing delay is always computed. All other arrays are extracted from the curves the first time a cost
+    model asks for them, so a model only pays for the state it actually uses.
+    """
+
+    def __init__(self, edges: List[Tuple[int, int]], delay: np.ndarray, threshold: float,
+                 acs: Dict, scs: Dict, buffers: Dict):
+        self.edges = edges
+        self.delay = delay
+        self.threshold = threshold
+        self._acs = acs
+        self._scs = scs
+        self._buffers = buffers
+
+    @cached_property
+    def rate(self) -> np.ndarray:
+        """Rate of the aggregated arrival curve."""
+        return np.fromiter((self._acs[edge].rate for edge in self.edges), dtype=np.float64, count=len(self.edges))
+
+    @cached_property
+    def burst(self) -> np.ndarray:
+        """Burst of the aggregated arrival curve."""
+        return np.fromiter((self._acs[edge].burst for edge in self.edges), dtype=np.float64, count=len(self.edges))
+
+    @cached_property
+    def capacity(self) -> np.ndarray:
+        """Rate of the (residual) service curve."""
+        return np.fromiter((self._scs[edge].rate for edge in self.edges), dtype=np.float64, count=len(self.edges))
+
+    @cached_property
+    def latency(self) -> np.ndarray:
+        """Latency of the (residual) service curve."""
+        return np.fromiter((self._scs[edge].latency for edge in self.edges), dtype=np.float64, count=len(self.edges))
+
+    @cached_property
+    def buffer(self) -> np.ndarray:
+        return np.fromiter((self._buffers[edge] for edge in self.edges), dtype=np.float64, count=len(self.edges))
+
+
+class LinkCostModel(ABC):
+    """
+    Interface for link cost models. A model computes the routing cost of all edges of a network at once. The cost of an
+    edge may only depend on the state of that edge, since models are also evaluated on the changed edges only.
+    """
+
+    @abstractmethod
+    def compute(self, state: LinkState) -> np.ndarray:
+        """Returns the cost of every edge in ``state.edges``. Must be >= 1 (or inf for unusable edges)."""
+        raise NotImplementedError
+
+
+class DelayCostModel(LinkCostModel):
+    """Cost grows with the worst case queueing delay: 1 + scale * delay. This is the original LCDN cost."""
+
+    def __init__(self, scale: float = 1e6):
+        self._scale = scale
+
+    def compute(self, state: LinkState) -> np.ndarray:
+        return 1 + self._scale * state.delay
+
+
+class SlackCostModel(LinkCostModel):
+    """
+    Cost grows with the inverse of the remaining delay slack of the queue: 1 + weight * (1 / slack - 1), where slack is
+    the unused share of the queue threshold. Edges without slack are unusable.
+    """
+
+    def __init__(self, weight: float = 1.0, min_slack: float = 1e-9):
+        self._weight = weight
+        self._min_slack = min_slack
+
+    def compute(self, state: LinkState) -> np.ndarray:
+        slack = (state.threshold - state.delay) / state.threshold
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cost = 1 + self._weight * (1 / np.maximum(slack, self._min_slack) - 1)
+        cost[~(slack > 0)] = np.inf
+        return np.maximum(cost, 1.0)
+
+
+class UtilizationCostModel(LinkCostModel):
+    """Cost grows with the rate utilization of the link: 1 + weight * u / (1 - u). Saturated edges are unusable."""
+
+    def __init__(self, weight: float = 1.0):
+        self._weight = weight
+
+    def compute(self, state: LinkState) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            utilization = np.where(state.capacity > 0, state.rate / state.capacity, 1.0)
+            cost = 1 + self._weight * utilization / (1 - utilization)
+        cost[utilization >= 1] = np.inf
+        return cost
+
+
+class HopCountCostModel(LinkCostModel):
+    """Shortest hop count. Equal hop counts are broken by the delay share of the threshold (scaled by epsilon)."""
+
+    def __init__(self, epsilon: float = 1e-3):
+        self._epsilon = epsilon
+
+    def compute(self, state: LinkState) -> np.ndarray:
+        return 1 + self._epsilon * np.minimum(state.delay / state.threshold, 1.0)
@@ -1,4 +1,5 @@
 import networkx as nx
+import numpy as np
 import logging
 import math
 from typing import Dict, Tuple, Union, List
@@ -7,6 +8,7 @@ from dataclasses import dataclass
 from Network.network_components import Network
 from NetworkCalculus.arrival_curve import ArrivalCurve
 from NetworkCalculus.service_curve import ServiceCurve
+from NetworkCalculus.cost_models import LinkCostModel, LinkState, DelayCostModel
 
 logger = logging.getLogger(__name__)
 
@@ -24,82 +26,166 @@ class Violation:
     edge: Tuple[int, int]
     max_allowed: float
     current: float
+    priority: int = -1
 
     def __str__(self):
         return f'{self.type} violation occurred on {self.edge}; Value: {self.current:.6f}, Max: {self.max_allowed:.6f}'
 
+
+class ViolationLog(object):
+    """
+    Counts violations by type and priority (one log per DNCAgent). Violations are expected while flows are embedded,
+    so only every ``sample``-th violation is logged.
+    """
+
+    def __init__(self, sample: int = 1):
+        self._sample = sample
+        self._total = 0
+        self._counts: Dict[str, Dict[int, int]] = {}
+
+    def set_sample(self, sample: int) -> None:
+        self._sample = max(sample, 1)
+
+    def record(self, violation: Violation) -> None:
+        by_priority = self._counts.setdefault(violation.type, {})
+        by_priority[violation.priority] = by_priority.get(violation.priority, 0) + 1
+        self._total += 1
+        if self._total % self._sample == 0:
+            logger.error('%s on network prio %s (%s violations)', violation, violation.priority, self._total)
+
+    def get_counts(self) -> Dict[str, Dict[int, int]]:
+        """ Number of violations per type and priority """
+        return {violation_type: dict(by_priority) for violation_type, by_priority in self._counts.items()}
+
+    def reset(self) -> None:
+        self._total = 0
+        self._counts.clear()
+
+
 class DNCAgent(object):
-    def __init__(self):
+    def __init__(self, cost_model: LinkCostModel = None):
         super(DNCAgent, self).__init__()
+        self._cost_model = cost_model if cost_model is not None else DelayCostModel()
+        self._violations = ViolationLog()
 
-    @staticmethod
-    def reserve_resources(reservation: ResourceReservation, networks: List[Network], q_level: int) ->  Union[Violation, None]:
-        ac_new = ArrivalCurve(rate=reservation.rate, burst=reservation.burst)
+    def get_violation_log(self) -> ViolationLog:
+        """ Violations found by this agent (copies in worker processes count their own) """
+        return self._violations
 
-        all_acs = nx.get_edge_attributes(networks[q_level].get_network_graph(), 'arrival_curve')
-        all_scs = nx.get_edge_attributes(networks[q_level].get_network_graph(), 'service_curve')
+    def set_cost_model(self, cost_model: LinkCostModel):
+        self._cost_model = cost_model
 
-        if q_level != 0:
-            acs_host = nx.get_edge_attributes(networks[0].get_network_graph(), 'arrival_curve')
-            scs_host = nx.get_edge_attributes(networks[0].get_network_graph(), 'service_curve')
-            host_threshold = networks[0].get_threshold()
+    def get_cost_model(self) -> LinkCostModel:
+        return self._cost_model
 
-        q_threshold = networks[q_level].get_threshold()
+    def reserve_resources(self, reservation: ResourceReservation, networks: List[Network], q_level: int) ->  Union[Violation, None]:
+        thresholds = [network.get_threshold() for network in networks]
+        curves = DNCAgent.hop_curves(reservation.path, reservation.rate, reservation.burst, q_level, thresholds)
+        return self.reserve_curves(curves, reservation.deadline, networks, q_level)
+
+    @staticmethod
+    def hop_curves(path: List[Tuple[int, int]], rate: float, burst: float, q_level: int,
+                   thresholds: List[float]) -> List[Tuple[int, Tuple[int, int], ArrivalCurve]]:
+        """
+        (network, edge, arrival curve) of a flow at every hop of its path. The burst grows by rate * threshold per hop
+        (conv_chameleon). The first hop of a lower priority flow is the single Q of the host (network 0).
+        """
+        curves = []
+        ac = ArrivalCurve(rate=rate, burst=burst)
+        for i, edge in enumerate(path):
+            network = 0 if q_level != 0 and i == 0 else q_level
+            curves.append((network, edge, ac))
+            ac = ArrivalCurve(rate=ac.rate, burst=ac.burst + ac.rate * thresholds[network])
+        return curves
+
+    def reserve_curves(self, curves: List[Tuple[int, Tuple[int, int], ArrivalCurve]], deadline: float,
+                       networks: List[Network], q_level: int) -> Union[Violation, None]:
+        """ Reserves the hop curves of a flow (see hop_curves) if its rate fits every hop and its deadline holds. """
+        # Only the edges on the path change. The new arrival curves are written once the whole path fits.
+        q_edges = networks[q_level].get_network_graph().edges
+        new_acs = []
 
         new_flow_delay = 0.0
 
-        for i, edge in enumerate(reservation.path):
-            if q_level != 0 and i == 0:
-                # We are on a host that has a single Q.
-                acs_host[edge] = acs_host[edge] + ac_new
-                ac_new = scs_host[edge].conv_chameleon(ac_new, host_threshold)
-            else:
-                all_acs[edge] = all_acs[edge] + ac_new
-                ac_new = all_scs[edge].conv_chameleon(ac_new, q_threshold)
+        for network, edge, ac in curves:
+            edges = networks[network].get_network_graph().edges
+            new_acs.append((edges, edge, edges[edge]['arrival_curve'] + ac))
 
-            if ac_new.rate == math.inf and ac_new.burst == math.inf:
-                violation = Violation('Rate', edge, all_scs[edge].rate, ac_new.rate)
-                logger.error(f'{violation}')
+            if ac.rate > edges[edge]['service_curve'].rate:
+                violation = Violation('Rate', edge, q_edges[edge]['service_curve'].rate, math.inf, network)
+                self._violations.record(violation)
                 return violation
 
-            if q_level != 0 and i == 0:
-                new_flow_delay += host_threshold
-            else:
-                new_flow_delay += q_threshold
+            new_flow_delay += networks[network].get_threshold()
 
-        if new_flow_delay > reservation.deadline:
-            violation = Violation('Flow Deadline', (0 , 0), reservation.deadline, new_flow_delay)
-            logger.error(f'{violation}')
+        if new_flow_delay > deadline:
+            violation = Violation('Flow Deadline', (0 , 0), deadline, new_flow_delay, q_level)
+            self._violations.record(violation)
             return violation
 
-        nx.set_edge_attributes(networks[q_level].get_network_graph(), all_acs, 'arrival_curve')
-        if q_level != 0:
-            nx.set_edge_attributes(networks[0].get_network_graph(), acs_host, 'arrival_curve')
+        for edges, edge, ac in new_acs:
+            edges[edge]['arrival_curve'] = ac
 
         return None
 
-    def remove_resources(self, reservation: ResourceReservation, networks: List[Network], q_level: int) -> None:
-        ac_to_remove = ArrivalCurve(rate=reservation.rate, burst=reservation.burst)
-
-        all_acs = nx.get_edge_attributes(networks[q_level].get_network_graph(), 'arrival_curve')
-        all_scs = nx.get_edge_attributes(networks[q_level].get_network_graph(), 'service_curve')
-        q_threshold = networks[q_level].get_threshold()
-
-
-        for edge in reservation.path:
-            all_acs[edge] = all_acs[edge] - ac_to_remove
-            ac_to_remove = all_scs[edge].conv_chameleon(ac_to_remove, q_threshold)
+    @staticmethod
+    def add_curves(curves: List[Tuple[int, Tuple[int, int], ArrivalCurve]], networks: List[Network], count: int) -> None:
+        """
+        Adds ``count`` times the hop curves of a flow (negative: removes them) without checks, e.g. for an aggregate of
+        flows with the same curves. Delays and residual service curves are not updated.
+        """
+        for network, edge, ac in curves:
+            edge_data = networks[network].get_network_graph().edges[edge]
+            edge_data['arrival_curve'] = ArrivalCurve(rate=edge_data['arrival_curve'].rate + count * ac.rate,
+                                                      burst=edge_data['arrival_curve'].burst + count * ac.burst)
 
+    @staticmethod
+    def deadline_bound(hops: int, q_level: int, thresholds: List[float]) -> float:
+        """
+        Delay of a flow with ``hops`` hops in queue ``q_level`` as it is checked against the deadline in reserve_resources.
+        The first hop (host) has a single queue and always uses the threshold of queue 0.
+        """
+        delay = 0.0
+        for i in range(hops):
+            if q_level != 0 and i == 0:
+                delay += thresholds[0]
+            else:
+                delay += thresholds[q_level]
+        return delay
 
-        nx.set_edge_attributes(networks[q_level].get_network_graph(), all_acs, 'arrival_curve')
+    def remove_resources(self, reservation: ResourceReservation, networks: List[Network], q_level: int) -> None:
+        self.subtract_reservation(reservation, networks, q_level)
 
         # Apply to networks
         self.check_and_update_network_state(networks)
 
         return None
 
+    @staticmethod
+    def subtract_reservation(reservation: ResourceReservation, networks: List[Network], q_level: int) -> None:
+        """
+        Removes the arrival curves of a reservation from the edges of its path, mirroring reserve_resources (the first
+        hop of a flow in a lower priority is reserved on the single host Q of network 0). Delays and residual service
+        curves are not updated.
+        """
+        ac_to_remove = ArrivalCurve(rate=reservation.rate, burst=reservation.burst)
+
+        for i, edge in enumerate(reservation.path):
+            network = networks[0] if q_level != 0 and i == 0 else networks[q_level]
+            edge_data = network.get_network_graph().edges[edge]
+            edge_data['arrival_curve'] = edge_data['arrival_curve'] - ac_to_remove
+            # Burst increase of conv_chameleon at reservation time. The service rate is not checked again, the rate
+            # fitted when the flow was reserved.
+            ac_to_remove = ArrivalCurve(rate=ac_to_remove.rate, burst=ac_to_remove.burst + ac_to_remove.rate * network.get_threshold())
 
     def check_and_update_network_state(self, networks: List[Network]) -> Union[Violation, None]:
+        self.update_all_network_states(networks)
+
+        violation = self.check_all_networks_for_violation(networks)
+
+        return violation
+
+    def update_all_network_states(self, networks: List[Network]) -> None:
         # Potentially there is a new AC that is not applied to Delays Buffers, and Service Curves
         residuals = None
 
@@ -109,10 +195,6 @@ class DNCAgent(object):
 
             residuals = self.update_network_state(network)
 
-        violation = self.check_all_networks_for_violation(networks)
-
-        return violation
-
     def check_all_networks_for_violation(self, networks: List[Network]) -> Union[Violation, None]:
         for i in range(len(networks)):
             violation = self.check_for_violations(networks[i])
@@ -122,55 +204,152 @@ class DNCAgent(object):
 
         return None
 
-    @staticmethod
-    def check_for_violations(network: Network) -> Union[Violation, None]:
+    def check_for_violations(self, network: Network) -> Union[Violation, None]:
         acs = nx.get_edge_attributes(network.get_network_graph(), 'arrival_curve')
         scs = nx.get_edge_attributes(network.get_network_graph(), 'service_curve')
         buffers = nx.get_edge_attributes(network.get_network_graph(), 'buffer')
         thresholds = nx.get_edge_attributes(network.get_network_graph(), 'threshold')
 
         for edge in network.get_network_graph().edges():
-            ac = acs[edge]
-            sc = scs[edge]
-            buffer = buffers[edge]
-            threshold = thresholds[edge]
-
-            if ac.rate > sc.rate:
-                violation = Violation('Rate', edge, sc.rate, ac.rate)
-                logger.error(f'{violation} on network prio {network.get_priority()}')
+            violation = self.check_edge(network, edge, acs[edge], scs[edge], buffers[edge], thresholds[edge])
+            if violation:
                 return violation
 
-            delay = sc.delay(ac)
-            buffer_used = sc.buffer_chameleon(ac, network.get_threshold())
+        return None
 
-            if delay > threshold:
-                violation = Violation('Delay', edge, threshold, delay)
-                logger.error(f'{violation} on network prio {network.get_priority()}')
-                return violation
+    def check_edge(self, network: Network, edge: Tuple[int, int], ac: ArrivalCurve, sc: ServiceCurve, buffer: float,
+                   threshold: float) -> Union[Violation, None]:
+        if ac.rate > sc.rate:
+            violation = Violation('Rate', edge, sc.rate, ac.rate, network.get_priority())
+            self._violations.record(violation)
+            return violation
 
-            if buffer_used > buffer:
-                violation = Violation('Buffer', edge, buffer, buffer_used)
-                logger.error(f'{violation} on network prio {network.get_priority()}')
-                return violation
+        delay = sc.delay(ac)
+        buffer_used = sc.buffer_chameleon(ac, network.get_threshold())
+
+        if delay > threshold:
+            violation = Violation('Delay', edge, threshold, delay, network.get_priority())
+            self._violations.record(violation)
+            return violation
+
+        if buffer_used > buffer:
+            violation = Violation('Buffer', edge, buffer, buffer_used, network.get_priority())
+            self._violations.record(violation)
+            return violation
 
         return None
 
+    """ Touched edge updates. A reservation only changes the curves of the edges on its path. """
     @staticmethod
-    def update_network_state(network: Network) -> Dict[Tuple[int, int], ServiceCurve]:
-        acs = nx.get_edge_attributes(network.get_network_graph(), 'arrival_curve')
-        scs = nx.get_edge_attributes(network.get_network_graph(), 'service_curve')
-        costs = nx.get_edge_attributes(network.get_network_graph(), 'cost')
-        delays = nx.get_edge_attributes(network.get_network_graph(), 'q_delay')
+    def snapshot_edges(networks: List[Network], edges: List[Tuple[int, int]]) -> List[Dict[Tuple[int, int], Tuple[ArrivalCurve, ServiceCurve]]]:
+        snapshot = []
+        for network in networks:
+            edge_data = network.get_network_graph().edges
+            snapshot.append({edge: (edge_data[edge]['arrival_curve'], edge_data[edge]['service_curve']) for edge in edges})
+        return snapshot
+
+    @staticmethod
+    def restore_edges(networks: List[Network], snapshot: List[Dict[Tuple[int, int], Tuple[ArrivalCurve, ServiceCurve]]]) -> None:
+        for network, curves in zip(networks, snapshot):
+            edge_data = network.get_network_graph().edges
+            for edge, (ac, sc) in curves.items():
+                edge_data[edge]['arrival_curve'] = ac
+                edge_data[edge]['service_curve'] = sc
+
+    @staticmethod
+    def update_edges(networks: List[Network], edges: List[Tuple[int, int]]) -> None:
+        """
+        Propagates the residual service curves of the edges through the priorities, like check_and_update_network_state
+        does for all edges. Delays and costs are not updated.
+        """
+        node_types = nx.get_node_attributes(networks[0].get_network_graph(), 'type')
+        # The egress Q of a host is not shared with lower priorities
+        edges = [edge for edge in edges if node_types[edge[0]] != 'host']
+
+        for network, next_network in zip(networks, networks[1:]):
+            edge_data = network.get_network_graph().edges
+            next_edge_data = next_network.get_network_graph().edges
+            for edge in edges:
+                next_edge_data[edge]['service_curve'] = edge_data[edge]['service_curve'].residual(edge_data[edge]['arrival_curve'])
+
+    def update_edges_state(self, networks: List[Network], edges: List[Tuple[int, int]]) -> Union[Violation, None]:
+        """
+        check_and_update_network_state for the given edges only, when the state of all other edges is current. Updates
+        residual service curves, delays and costs of the edges and checks them for violations.
+        """
+        for network in networks:
+            graph = network.get_network_graph()
+            if graph.graph.get('edge_costs_version', -1) != graph.graph.get('topology_version', 0):
+                # The topology changed since the last full update
+                return self.check_and_update_network_state(networks)
+
+        self.update_edges(networks, edges)
+
+        for network in networks:
+            graph = network.get_network_graph()
+            edge_data = graph.edges
+            acs = {edge: edge_data[edge]['arrival_curve'] for edge in edges}
+            scs = {edge: edge_data[edge]['service_curve'] for edge in edges}
+            delays = np.fromiter((scs[edge].delay(acs[edge]) for edge in edges), dtype=np.float64, count=len(edges))
+
+            state = LinkState(edges, delays, network.get_threshold(), acs, scs,
+                              {edge: edge_data[edge]['buffer'] for edge in edges})
+            costs = self._cost_model.compute(state)
+
+            for edge, cost, delay in zip(edges, costs.tolist(), delays.tolist()):
+                edge_data[edge]['cost'] = cost
+                edge_data[edge]['q_delay'] = delay
+
+            # The cost array is replaced, not changed in place, since the routing backend compares against it
+            positions = self.edge_positions(graph)
+            all_costs = graph.graph['edge_costs'].copy()
+            all_costs[[positions[edge] for edge in edges]] = costs
+            graph.graph['edge_costs'] = all_costs
+
+        return self.check_edges(networks, edges)
+
+    @staticmethod
+    def edge_positions(graph: nx.DiGraph) -> Dict[Tuple[int, int], int]:
+        """ Position of every edge in graph.edges() (and in the edge_costs array), cached per topology version. """
+        version = graph.graph.get('topology_version', 0)
+        if graph.graph.get('edge_positions_version') != version:
+            graph.graph['edge_positions'] = {edge: i for i, edge in enumerate(graph.edges())}
+            graph.graph['edge_positions_version'] = version
+        return graph.graph['edge_positions']
+
+    def check_edges(self, networks: List[Network], edges: List[Tuple[int, int]]) -> Union[Violation, None]:
+        for network in networks:
+            edge_data = network.get_network_graph().edges
+            for edge in edges:
+                data = edge_data[edge]
+                violation = self.check_edge(network, edge, data['arrival_curve'], data['service_curve'],
+                                            data['buffer'], data['threshold'])
+                if violation:
+                    return violation
+
+        return None
+
+    def update_network_state(self, network: Network) -> Dict[Tuple[int, int], ServiceCurve]:
+        graph = network.get_network_graph()
+        acs = nx.get_edge_attributes(graph, 'arrival_curve')
+        scs = nx.get_edge_attributes(graph, 'service_curve')
+        edges = list(graph.edges())
+        delays = {}
         residuals = {}
 
-        for edge in network.get_network_graph().edges():
-            delay = scs[edge].delay(acs[edge])
-            delays[edge] = delay
+        for edge in edges:
+            delays[edge] = scs[edge].delay(acs[edge])
             residuals[edge] = scs[edge].residual(acs[edge])
-            costs[edge] = 1 + 1e6 * delay
 
-        nx.set_edge_attributes(network.get_network_graph(), costs, 'cost')
-        nx.set_edge_attributes(network.get_network_graph(), delays, 'q_delay')
+        # Costs of all edges at once. The array is kept on the graph (in edge order) for the routing backend.
+        state = LinkState(edges, np.fromiter(delays.values(), dtype=np.float64, count=len(edges)), network.get_threshold(),
+                          acs, scs, nx.get_edge_attributes(graph, 'buffer'))
+        costs = self._cost_model.compute(state)
+        graph.graph['edge_costs'] = costs
+        graph.graph['edge_costs_version'] = graph.graph.get('topology_version', 0)
+
+        nx.set_edge_attributes(graph, dict(zip(edges, costs.tolist())), 'cost')
+        nx.set_edge_attributes(graph, delays, 'q_delay')
 
         return residuals
 
@@ -0,0 +1,115 @@
+import copy
+
+import pytest
+
+from Network.network_components import NetworkManager, Node, Edge, Host
+from NetworkCalculus.dnc import DNCAgent, ResourceReservation, Violation, ViolationLog
+
+
+def line_network() -> NetworkManager:
+    """ h10 - s0 - s1 - s2 - h11 """
+    manager = NetworkManager()
+    for i in range(3):
+        manager.add_node(Node(f's{i}', i))
+    manager.add_edge(Edge(0, 1, 100, 1e9, 7.65 / 1e6, 125000 * 8))
+    manager.add_edge(Edge(1, 2, 101, 1e9, 7.65 / 1e6, 125000 * 8))
+    manager.add_host(Host(10, 'h10', '', '', 0, 100000 * 8, 125000 * 8, 7.65 / 1e6, 1e9))
+    manager.add_host(Host(11, 'h11', '', '', 2, 100000 * 8, 125000 * 8, 7.65 / 1e6, 1e9))
+    return manager
+
+
+PATH = [(10, 0), (0, 1), (1, 2), (2, 11)]
+
+
+def curves(networks):
+    return [{(u, v): (data['arrival_curve'].rate, data['arrival_curve'].burst,
+                    data['service_curve'].rate, data['service_curve'].latency)
+             for u, v, data in network.get_network_graph().edges(data=True)} for network in networks]
+
+
+class TestTouchedEdges:
+    @pytest.mark.parametrize('q_level', [0, 1, 2])
+    def test_update_edges_matches_full_update(self, q_level):
+        dnc = DNCAgent()
+        networks = line_network().get_current_networks()
+        dnc.check_and_update_network_state(networks)
+
+        reservation = ResourceReservation(path=PATH, rate=1e7, burst=80000, deadline=0.1)
+        assert dnc.reserve_resources(reservation, networks, q_level) is None
+
+        full = copy.deepcopy(networks)
+        dnc.check_and_update_network_state(full)
+        dnc.update_edges(networks, PATH)
+
+        assert curves(networks) == curves(full)
+        assert dnc.check_edges(networks, PATH) is None
+
+    def test_restore_edges(self):
+        dnc = DNCAgent()
+        networks = line_network().get_current_networks()
+        dnc.check_and_update_network_state(networks)
+        before = curves(networks)
+
+        snapshot = dnc.snapshot_edges(networks, PATH)
+        reservation = ResourceReservation(path=PATH, rate=1e6, burst=1e6, deadline=0.1)
+        dnc.reserve_resources(reservation, networks, 0)
+        dnc.update_edges(networks, PATH)
+
+        assert dnc.check_edges(networks, PATH) is not None
+        dnc.restore_edges(networks, snapshot)
+        assert curves(networks) == before
+
+    def test_deadline_bound(self):
+        thresholds = [0.5 / 1e3, 1 / 1e3, 6 / 1e3, 24 / 1e3]
+        assert DNCAgent.deadline_bound(4, 0, thresholds) == pytest.approx(4 * thresholds[0])
+        assert DNCAgent.deadline_bound(4, 2, thresholds) == pytest.approx(thresholds[0] + 3 * thresholds[2])
+
+    def test_update_edges_state_matches_full_update(self):
+        dnc = DNCAgent()
+        networks = line_network().get_current_networks()
+        dnc.check_and_update_network_state(networks)
+
+        kept = ResourceReservation(path=PATH, rate=1e7, burst=80000, deadline=0.1)
+        removed = ResourceReservation(path=PATH[:3], rate=2e7, burst=80000, deadline=0.1)
+        dnc.reserve_resources(kept, networks, 1)
+        dnc.reserve_resources(removed, networks, 2)
+        dnc.check_and_update_network_state(networks)
+
+        dnc.subtract_reservation(removed, networks, 2)
+        full = copy.deepcopy(networks)
+        dnc.check_and_update_network_state(full)
+        assert dnc.update_edges_state(networks, removed.path) is None
+
+        assert curves(networks) == curves(full)
+        for network, network_full in zip(networks, full):
+            graph, graph_full = network.get_network_graph(), network_full.get_network_graph()
+            assert list(graph.graph['edge_costs']) == list(graph_full.graph['edge_costs'])
+            for u, v, data in graph.edges(data=True):
+                assert data['q_delay'] == graph_full[u][v]['q_delay']
+                assert data['cost'] == graph_full[u][v]['cost']
+
+
+class TestViolationLog:
+    def test_counts_and_sampling(self, caplog):
+        log = ViolationLog(sample=3)
+        with caplog.at_level('ERROR', logger='NetworkCalculus.dnc'):
+            for i in range(7):
+                log.record(Violation('Delay', (0, 1), 1e-3, 2e-3, i % 2))
+            log.record(Violation('Rate', (0, 1), 1e9, 2e9, 0))
+
+        assert log.get_counts() == {'Delay': {0: 4, 1: 3}, 'Rate': {0: 1}}
+        # Violations 3 and 6
+        assert len(caplog.records) == 2
+
+        log.reset()
+        assert log.get_counts() == {}
+
+    def test_counts_per_agent(self):
+        networks = line_network().get_current_networks()
+        agent, other = DNCAgent(), DNCAgent()
+        agent.check_and_update_network_state(networks)
+        reservation = ResourceReservation(path=PATH, rate=1e6, burst=8000, deadline=1e-6)
+
+        assert agent.reserve_resources(reservation, networks, 0).type == 'Flow Deadline'
+        assert agent.get_violation_log().get_counts() == {'Flow Deadline': {0: 1}}
+        assert other.get_violation_log().get_counts() == {}
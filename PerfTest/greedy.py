@@ -25,6 +25,7 @@ def run_single_test(parameters: Settings):
     lcdn.set_rerouting_strategy(parameters.reroute_strategy)
     lcdn.set_lcdn_strategy(parameters.strategy)
     lcdn.set_greedy_probability(parameters.greedy_p)
+    lcdn.set_random_seed(parameters.seed)
 
     topology = LCDNTestTopology(parameters.topology_path, parameters.hosts_per_node)
     flow_request_generator = LCDNTestFlowRequest(1e6, 800, 0.02, topology.get_hosts(), parameters.seed)
@@ -77,6 +78,7 @@ if __name__ == '__main__':
     with open('test_result.json', 'w') as rf:
         json.dump(result, rf)
     print(len(result))
+    print(f'Flows per queue: {lcdn.get_flows_per_queue()}')
 
     for i in range(4):
         print(f"Queue {i}")
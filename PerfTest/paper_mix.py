@@ -21,6 +21,7 @@ def run_single_test(parameters: Settings):
     lcdn.set_reroutings(parameters.reroutings)
     lcdn.set_lcdn_strategy(parameters.strategy)
     lcdn.set_greedy_probability(parameters.greedy_p)
+    lcdn.set_random_seed(parameters.seed)
     topology = LCDNTestTopology(parameters.topology_path, parameters.hosts_per_node)
     flow_request_generator = LCDNTestFlowRequest(1e6, 800, 0.02, topology.get_hosts(), parameters.seed)
 
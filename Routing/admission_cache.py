@@ -0,0 +1,79 @@
+import logging
+from typing import Dict, Hashable, List, Tuple
+
+from Routing.path_table import PathTable
+
+
+logger = logging.getLogger(__name__)
+
+
+class NegativeAdmissionCache(object):
+    """
+    Cache of rejected flow requests.
+
+    A rejection is stored under a key (e.g. the candidate paths, strategy and first queue of the request) together with
+    the flow profile (rate, burst, deadline) and the edges the rejection depends on. A later request with one of these
+    keys whose profile is at least as demanding (rate and burst not smaller, deadline not larger) is rejected without
+    DNC checks, network copies or reroute attempts. Per key only the least demanding rejected profiles are kept.
+
+    Without rerouting, adding flows only takes capacity away, so a rejection stays valid until capacity is released on
+    one of its edges (removed, moved or modified flows, see release()) or the topology or the embedding settings change.
+    With rerouting it does not: a flow added later can be the reroute candidate that makes room.
+    """
+
+    def __init__(self, path_table: PathTable, max_profiles: int = 8):
+        self._paths = path_table
+        self._max_profiles = max_profiles
+        # Key -> (edge bitset of the rejections, rejected profiles)
+        self._entries: Dict[Hashable, Tuple[int, List[Tuple[float, float, float]]]] = {}
+        self._context = None
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_statistics(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'hits': self._hits, 'misses': self._misses,
+                'invalidations': self._invalidations}
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def validate(self, context: Hashable) -> None:
+        """ Clears the cache if the context (topology version, embedding settings) changed. """
+        if context != self._context:
+            if self._entries:
+                logger.debug('Negative admission cache cleared, context changed to %s', context)
+            self._entries.clear()
+            self._context = context
+
+    def lookup(self, keys: List[Hashable], rate: float, burst: float, deadline: float) -> bool:
+        """ True if a request with this profile is known to be rejected under one of its keys (None keys are skipped). """
+        for key in keys:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                continue
+            for r, b, d in entry[1]:
+                if rate >= r and burst >= b and deadline <= d:
+                    self._hits += 1
+                    return True
+        self._misses += 1
+        return False
+
+    def store(self, key: Hashable, rate: float, burst: float, deadline: float, edges: int) -> None:
+        """ Stores a rejection. ``edges`` is the edge bitset (see PathTable) the rejection depends on. """
+        old_edges, profiles = self._entries.get(key, (0, []))
+        # Drop the profiles the new one covers
+        profiles = [(r, b, d) for r, b, d in profiles if not (r >= rate and b >= burst and d <= deadline)]
+        profiles.append((rate, burst, deadline))
+        self._entries[key] = (old_edges | edges, profiles[-self._max_profiles:])
+
+    def release(self, path_id: int) -> None:
+        """ Capacity was released on the edges of the path. Drops all rejections that tried one of them. """
+        bitset = self._paths.get_bitset(path_id)
+        stale = [key for key, (edges, _) in self._entries.items() if edges & bitset]
+        for key in stale:
+            del self._entries[key]
+        self._invalidations += len(stale)
@@ -0,0 +1,246 @@
+import copy
+import logging
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from Network.network_components import Network
+from Routing.routing import FlowManager, FlowRequest, EmbeddedFlow, LCDNStrategy
+
+
+logger = logging.getLogger(__name__)
+
+
+class PlanObjective(Enum):
+    FLOWS = 1   # Number of admitted flows
+    RATE = 2    # Total admitted rate
+
+
+@dataclass
+class AdmissionPlan:
+    flows: List[FlowRequest]
+    order: List[int]
+    # (path id, queue) of every flow in request order, None if the flow is rejected
+    assignments: List[Union[None, Tuple[int, int]]]
+    # Assignments local search forced on flows (tried before the other options of the flow)
+    forced: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+    admitted: int = 0
+    admitted_rate: float = 0.0
+    # Edge lists of the assigned path ids. The ids may be evicted from the path table before the plan is committed.
+    paths: Dict[int, List[Tuple[int, int]]] = field(default_factory=dict)
+
+
+class AdmissionPlanner(object):
+    """
+    Offline admission planning for a flow set that is known in advance.
+
+    The flows are routed once. A plan is an admission order plus the (path, queue) assignment of every flow. Plans are
+    evaluated with what-if placements on one working copy of the networks (touched edges only, undone with edge
+    snapshots). The planner evaluates a few heuristic orders (request order, tightest deadline, smallest bottleneck
+    demand, shortest path) and improves the best one with a local search that moves rejected flows in front of the
+    flows they conflict with and forces other paths or queues on conflicting flows. Only strictly better plans are
+    kept. The final plan is committed in one pass with commit().
+
+    Flows are packed like NOTGREEDY: on each of their ``paths_per_flow`` shortest paths, lowest priority queue first.
+    """
+
+    def __init__(self, flow_manager: FlowManager, objective: PlanObjective = PlanObjective.FLOWS,
+                 paths_per_flow: int = 3, iterations: int = 200, seed: int = 0):
+        self._flow_manager = flow_manager
+        self._dnc = flow_manager.get_dnc_agent()
+        self._paths = flow_manager.get_path_table()
+        self._objective = objective
+        self._paths_per_flow = paths_per_flow
+        self._iterations = iterations
+        self._rng = np.random.default_rng(seed)
+        self._evaluations = 0
+
+    def get_number_of_evaluations(self) -> int:
+        return self._evaluations
+
+    def plan(self, flows: List[FlowRequest], network: List[Network]) -> AdmissionPlan:
+        working_network = self._working_copy(network)
+
+        all_paths = self._flow_manager.route_batch(flows, working_network, k=self._paths_per_flow)
+        thresholds = [n.get_threshold() for n in working_network]
+        options = [self._flow_manager.placement_options(flow, paths or [], thresholds, LCDNStrategy.NOTGREEDY)
+                   for flow, paths in zip(flows, all_paths)]
+
+        best = None
+        for name, order in self._initial_orders(flows, options, working_network):
+            plan = self._evaluate(flows, options, order, {}, working_network)
+            logger.debug('Plan order %s: %s flows, %s rate', name, plan.admitted, plan.admitted_rate)
+            if best is None or self._score(plan) > self._score(best):
+                best = plan
+
+        best = self._local_search(best, options, working_network)
+        best.paths = {path_id: self._paths.get_path(path_id) for path_id, _ in filter(None, best.assignments)}
+        logger.info('Admission plan: %s of %s flows, %s rate, %s evaluations',
+                    best.admitted, len(flows), best.admitted_rate, self._evaluations)
+        return best
+
+    def commit(self, plan: AdmissionPlan, network: List[Network]) -> Tuple[List[Union[None, EmbeddedFlow]], List[Network]]:
+        """
+        Embeds the planned flows in plan order on a copy of the networks.
+
+        :return: The embedding (or None) of every flow in request order and the networks with all admitted flows
+        """
+        working_network = self._working_copy(network)
+        embeddings = [None for _ in plan.flows]
+
+        for i in plan.order:
+            if plan.assignments[i] is None:
+                continue
+            path_id, queue = plan.assignments[i]
+            path_id = self._paths.intern(plan.paths[path_id])
+            placed = self._flow_manager.try_place(plan.flows[i], path_id, queue, working_network)
+            if placed is None:
+                # Only happens if the network changed since planning
+                logger.warning('Planned flow %s does not fit anymore', plan.flows[i])
+                continue
+            embeddings[i] = self._flow_manager.add_placed_flow(plan.flows[i], placed[0], path_id, queue)
+
+        self._dnc.check_and_update_network_state(working_network)
+        return embeddings, working_network
+
+    def _working_copy(self, network: List[Network]) -> List[Network]:
+        working_network = copy.deepcopy(network)
+        self._dnc.check_and_update_network_state(working_network)
+        return working_network
+
+    def _score(self, plan: AdmissionPlan) -> Tuple[float, float]:
+        if self._objective == PlanObjective.RATE:
+            return plan.admitted_rate, plan.admitted
+        return plan.admitted, plan.admitted_rate
+
+    def _initial_orders(self, flows: List[FlowRequest], options: List[List[Tuple[int, int]]],
+                        network: List[Network]) -> List[Tuple[str, List[int]]]:
+        link_rates = network[0].get_network_graph().edges
+
+        def demand(i):
+            # Share of the bottleneck link of the first path the flow needs
+            if not options[i]:
+                return np.inf
+            return flows[i].rate / min(link_rates[edge]['rate'] for edge in self._paths.get_path(options[i][0][0]))
+
+        def hops(i):
+            return len(self._paths.get_path(options[i][0][0])) if options[i] else np.inf
+
+        indices = range(len(flows))
+        orders = [('given', list(indices)),
+                  ('deadline', sorted(indices, key=lambda i: flows[i].deadline)),
+                  ('demand', sorted(indices, key=demand)),
+                  ('path length', sorted(indices, key=hops))]
+
+        if self._objective == PlanObjective.RATE:
+            orders.append(('largest rate', sorted(indices, key=lambda i: -flows[i].rate)))
+
+        return orders
+
+    def _evaluate(self, flows: List[FlowRequest], options: List[List[Tuple[int, int]]], order: List[int],
+                  forced: Dict[int, Tuple[int, int]], network: List[Network]) -> AdmissionPlan:
+        """ Places the flows in order on the working network, then undoes all placements. """
+        applied = []
+        plan = self._place(AdmissionPlan(flows, order, [None for _ in flows], forced), options, network, 0, applied)
+        self._undo(network, applied, 0)
+        return plan
+
+    def _place(self, plan: AdmissionPlan, options: List[List[Tuple[int, int]]], network: List[Network], start: int,
+               applied: List) -> AdmissionPlan:
+        """
+        Places the flows plan.order[start:] on the working network, where the flows plan.order[:start] are placed
+        already. ``applied`` holds the undo snapshot (or None) of every placed position.
+        """
+        self._evaluations += 1
+        for i in plan.order[start:]:
+            plan.assignments[i] = None
+            candidates = options[i]
+            if i in plan.forced:
+                candidates = [plan.forced[i]] + [option for option in options[i] if option != plan.forced[i]]
+
+            snapshot = None
+            for path_id, queue in candidates:
+                placed = self._flow_manager.try_place(plan.flows[i], path_id, queue, network)
+                if placed is not None:
+                    snapshot = placed[1]
+                    plan.assignments[i] = (path_id, queue)
+                    break
+            applied.append(snapshot)
+
+        admitted = [i for i in plan.order if plan.assignments[i] is not None]
+        plan.admitted = len(admitted)
+        plan.admitted_rate = sum(plan.flows[i].rate for i in admitted)
+        return plan
+
+    def _undo(self, network: List[Network], applied: List, start: int) -> None:
+        """ Undoes the placements of the positions start and later. """
+        while len(applied) > start:
+            snapshot = applied.pop()
+            if snapshot is not None:
+                self._dnc.restore_edges(network, snapshot)
+
+    def _replay(self, plan: AdmissionPlan, network: List[Network], start: int, applied: List) -> None:
+        """ Places plan.order[start:] again with their known assignments. """
+        for i in plan.order[start:]:
+            snapshot = None
+            if plan.assignments[i] is not None:
+                path_id, queue = plan.assignments[i]
+                snapshot = self._flow_manager.try_place(plan.flows[i], path_id, queue, network)[1]
+            applied.append(snapshot)
+
+    def _local_search(self, plan: AdmissionPlan, options: List[List[Tuple[int, int]]],
+                      network: List[Network]) -> AdmissionPlan:
+        """
+        Moves only change the plan from some position on. The placements of the current plan stay applied on the
+        working network, so a candidate only re-evaluates the positions after the first change.
+        """
+        applied = []
+        self._replay(plan, network, 0, applied)
+
+        for _ in range(self._iterations):
+            rejected = [i for i in plan.order if plan.assignments[i] is None and options[i]]
+            if not rejected:
+                break
+
+            r = rejected[self._rng.integers(len(rejected))]
+            # Admitted flows that share an edge with one of the options of the rejected flow
+            r_paths = {path_id for path_id, _ in options[r]}
+            admitted = [i for i in plan.order if plan.assignments[i] is not None]
+            admitted_paths = np.array([plan.assignments[i][0] for i in admitted], dtype=np.int64)
+            shared = np.zeros(len(admitted), dtype=bool)
+            for path_id in r_paths:
+                shared |= self._paths.overlaps(path_id, admitted_paths) > 0
+            conflicts = [i for i, is_shared in zip(admitted, shared.tolist()) if is_shared]
+            if not conflicts:
+                continue
+
+            a = conflicts[self._rng.integers(len(conflicts))]
+            order = list(plan.order)
+            forced = dict(plan.forced)
+
+            alternatives = [option for option in options[a] if option != plan.assignments[a]]
+            if alternatives and self._rng.random() < 0.5:
+                # Another path or queue for the conflicting flow
+                forced[a] = alternatives[self._rng.integers(len(alternatives))]
+                start = order.index(a)
+            else:
+                # Admit the rejected flow before the conflicting one
+                start = min(order.index(r), order.index(a))
+                order.remove(r)
+                order.insert(order.index(a), r)
+
+            self._undo(network, applied, start)
+            candidate = self._place(AdmissionPlan(plan.flows, order, list(plan.assignments), forced),
+                                    options, network, start, applied)
+
+            if self._score(candidate) > self._score(plan):
+                logger.debug('Local search: %s -> %s flows', plan.admitted, candidate.admitted)
+                plan = candidate
+            else:
+                self._undo(network, applied, start)
+                self._replay(plan, network, start, applied)
+
+        self._undo(network, applied, 0)
+        return plan
@@ -0,0 +1,92 @@
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+from NetworkCalculus.arrival_curve import ArrivalCurve
+from NetworkCalculus.dnc import DNCAgent
+from Routing.path_table import PathTable
+
+
+logger = logging.getLogger(__name__)
+
+# (path id, priority, rate, burst)
+AggregateKey = Tuple[int, int, float, float]
+
+
+class AggregateTable(object):
+    """
+    Aggregated reservations of the embedded flows.
+
+    Flows of the same class (token bucket rate and burst) in the same queue on the same path have the same arrival curve
+    on every edge of the path. An aggregate keeps the number of its flows and the hop curves of one flow
+    (DNCAgent.hop_curves), which are computed once. Admitting another flow of an aggregate adds the curves once more and
+    updates the edges of the path only, removing k flows of an aggregate subtracts k times the curves in one pass over
+    the path. The curves are kept while the aggregate has flows.
+
+    Every flow still has its own row in the FlowTable, since flows are addressed by id (leases, queries, rerouting of
+    single flows). Aggregates save the time of reservations, not the memory of the flows.
+    """
+
+    def __init__(self, path_table: PathTable):
+        self._paths = path_table
+        self._flow_keys: Dict[int, AggregateKey] = {}
+        self._counts: Dict[AggregateKey, int] = {}
+        self._curves: Dict[AggregateKey, List[Tuple[int, Tuple[int, int], ArrivalCurve]]] = {}
+        self._thresholds = None
+
+    def __len__(self):
+        return len(self._counts)
+
+    def get_statistics(self) -> Dict[str, int]:
+        return {'aggregates': len(self._counts), 'flows': len(self._flow_keys), 'curves': len(self._curves)}
+
+    @staticmethod
+    def key(path_id: int, priority: int, rate: float, burst: float) -> AggregateKey:
+        return path_id, priority, rate, burst
+
+    def add(self, flow_id: int, key: AggregateKey) -> None:
+        self._flow_keys[flow_id] = key
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def remove(self, flow_id: int) -> AggregateKey:
+        key = self._flow_keys.pop(flow_id)
+        count = self._counts[key] - 1
+        if count:
+            self._counts[key] = count
+        else:
+            del self._counts[key]
+            self._curves.pop(key, None)
+        return key
+
+    def move(self, flow_id: int, path_id: int = None, priority: int = None, rate: float = None,
+             burst: float = None) -> None:
+        """ Moves a flow to another path, priority or class (the other parts of its key are kept) """
+        old_path_id, old_priority, old_rate, old_burst = self.remove(flow_id)
+        self.add(flow_id, self.key(old_path_id if path_id is None else path_id,
+                                   old_priority if priority is None else priority,
+                                   old_rate if rate is None else rate,
+                                   old_burst if burst is None else burst))
+
+    def count(self, key: AggregateKey) -> int:
+        return self._counts.get(key, 0)
+
+    def group(self, flow_ids: Iterable[int]) -> Dict[AggregateKey, int]:
+        """ Number of flows per aggregate """
+        groups = {}
+        for flow_id in flow_ids:
+            key = self._flow_keys[flow_id]
+            groups[key] = groups.get(key, 0) + 1
+        return groups
+
+    def curves(self, key: AggregateKey, thresholds: List[float]) -> List[Tuple[int, Tuple[int, int], ArrivalCurve]]:
+        """ Hop curves of one flow of the aggregate (also for keys without flows, which are not cached) """
+        if thresholds != self._thresholds:
+            self._curves.clear()
+            self._thresholds = list(thresholds)
+
+        curves = self._curves.get(key)
+        if curves is None:
+            path_id, priority, rate, burst = key
+            curves = DNCAgent.hop_curves(self._paths.get_path(path_id), rate, burst, priority, thresholds)
+            if key in self._counts:
+                self._curves[key] = curves
+        return curves
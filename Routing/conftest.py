@@ -0,0 +1,83 @@
+from typing import List, Tuple, Union
+
+import numpy as np
+import pytest
+
+from Network.network_components import Network, NetworkManager, Node, Edge, Host
+from NetworkCalculus.dnc import DNCAgent
+from Routing.routing import FlowManager, FlowRequest, EmbeddedFlow
+
+
+def _ring_network(switches: int = 6, hosts_per_switch: int = 2, manager=None):
+    """ Ring of switches with hosts on every switch, built on a new NetworkManager or the given manager (e.g. LCDN) """
+    manager = NetworkManager() if manager is None else manager
+    hosts = []
+    for i in range(switches):
+        manager.add_node(Node(f's{i}', i))
+    link_id = switches
+    for i in range(switches):
+        manager.add_edge(Edge(i, (i + 1) % switches, link_id, 1e9, 7.65 / 1e6, 125000 * 8))
+        link_id += 1
+    for i in range(switches):
+        for _ in range(hosts_per_switch):
+            manager.add_host(Host(link_id, f'h{link_id}', '', '', i, 100000 * 8, 125000 * 8, 7.65 / 1e6, 1e9))
+            hosts.append(link_id)
+            link_id += 1
+    return manager, hosts
+
+
+def _requests(hosts: List[int], count: int = 80, seed: int = 1) -> List[FlowRequest]:
+    rng = np.random.default_rng(seed)
+    flows = []
+    for _ in range(count):
+        src, dst = rng.choice(hosts, 2, replace=False)
+        flows.append(FlowRequest(int(src), int(dst), 0, 80000, 1e8 * rng.uniform(0.2, 1), rng.choice([0.005, 0.02])))
+    return flows
+
+
+def _idle_networks(switches: int = 6, hosts_per_switch: int = 2) -> Tuple[List[Network], List[int]]:
+    manager, hosts = _ring_network(switches, hosts_per_switch)
+    networks = manager.get_current_networks()
+    DNCAgent().check_and_update_network_state(networks)
+    return networks, hosts
+
+
+def _embed_flows(flow_manager: FlowManager, flow_requests: List[FlowRequest], networks: List[Network]) \
+        -> Tuple[List[Union[None, EmbeddedFlow]], List[Network], List[List[EmbeddedFlow]]]:
+    embeddings = []
+    rerouted = []
+    for flow_request in flow_requests:
+        embedding, networks, rerouted_flows = flow_manager.embed_new_flow(flow_request, networks)
+        embeddings.append(embedding)
+        rerouted.append(rerouted_flows or [])
+    return embeddings, networks, rerouted
+
+
+@pytest.fixture
+def ring_network():
+    """ ring_network(switches=6, hosts_per_switch=2, manager=None) returns the manager and the host ids. Hosts are
+    numbered from 0 in the returned list, two per switch by default: hosts 0, 1 are on switch 0, 2, 3 on switch 1, ...
+    """
+    return _ring_network
+
+
+@pytest.fixture
+def requests():
+    """ requests(hosts, count=80, seed=1) returns random flow requests between the hosts """
+    return _requests
+
+
+@pytest.fixture
+def idle_networks():
+    """ idle_networks(switches=6, hosts_per_switch=2) returns the networks of a ring without flows (state computed)
+    and its host ids
+    """
+    return _idle_networks
+
+
+@pytest.fixture
+def embed_flows():
+    """ embed_flows(flow_manager, flow_requests, networks) embeds the requests one after another with embed_new_flow
+    and returns the embedding (or None) of every request, the networks and the flows rerouted for every request
+    """
+    return _embed_flows
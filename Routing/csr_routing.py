@@ -0,0 +1,263 @@
+import heapq
+import logging
+from itertools import count
+from typing import List, Tuple, Union, Set, Iterator
+
+import networkx as nx
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class CSRTopology(object):
+    """
+    Read-only compressed sparse row (CSR) view of a routing graph.
+
+    The topology is stored as ``indptr``/``indices`` arrays over internal node indices. ``edge_ids`` maps every CSR slot
+    to the position of the edge in ``graph.edges()``, which is also the position of the edge in the parallel ``costs``
+    array. The structure is only rebuilt when the topology version of the graph changes; cost updates only refresh
+    ``costs``.
+
+    Ties between paths of equal cost are broken canonically: every node is reached through the shortest incoming edge
+    with the smallest edge id (see dijkstra). Repaired shortest path trees (spt_cache) use the same rule, so they give
+    the same paths as a fresh Dijkstra. networkx breaks ties in its own search order: routing results have the same
+    costs as networkx, but on graphs with ties the chosen paths (and so the placements) can differ.
+    """
+
+    def __init__(self, graph: nx.DiGraph, weight: str = 'cost'):
+        self._weight = weight
+        self.version = graph.graph.get('topology_version', 0)
+
+        self.node_ids = np.fromiter(graph.nodes(), dtype=np.int64, count=graph.number_of_nodes())
+        self._node_index = {int(node): i for i, node in enumerate(self.node_ids)}
+
+        # Edge ids follow the order of graph.edges() so costs can be read in one pass
+        self.edges = [(int(u), int(v)) for u, v in graph.edges()]
+        self._edge_index = {edge: i for i, edge in enumerate(self.edges)}
+        num_edges = len(self.edges)
+        heads = np.fromiter((self._node_index[u] for u, _ in self.edges), dtype=np.int64, count=num_edges)
+        tails = np.fromiter((self._node_index[v] for _, v in self.edges), dtype=np.int64, count=num_edges)
+
+        order = np.argsort(heads, kind='stable')
+        self.indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=len(self.node_ids)), out=self.indptr[1:])
+        self.indices = tails[order]
+        self.edge_ids = order
+        self.costs = np.ones(num_edges, dtype=np.float64)
+
+        # Reverse CSR (incoming edges) for repairing shortest path trees
+        rev_order = np.argsort(tails, kind='stable')
+        self.rev_indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=len(self.node_ids)), out=self.rev_indptr[1:])
+        self.rev_indices = heads[rev_order]
+        self.rev_edge_ids = rev_order
+        self.heads = heads
+        self.tails = tails
+
+        # Python mirrors of the arrays. Scalar access on lists is much cheaper than on NumPy arrays in the hot loop.
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._edge_ids = self.edge_ids.tolist()
+        self._costs = self.costs.tolist()
+        self._rev_indptr = self.rev_indptr.tolist()
+        self._rev_indices = self.rev_indices.tolist()
+        self._rev_edge_ids = self.rev_edge_ids.tolist()
+        self._heads = heads.tolist()
+        self._tails = tails.tolist()
+
+        self.update_costs(graph)
+
+    def matches(self, graph: nx.DiGraph) -> bool:
+        return self.version == graph.graph.get('topology_version', 0) and len(self.edges) == graph.number_of_edges()
+
+    def read_costs(self, graph: nx.DiGraph) -> np.ndarray:
+        # The cost model leaves the cost array of the last network update on the graph
+        costs = graph.graph.get('edge_costs')
+        if costs is not None and len(costs) == len(self.edges) \
+                and graph.graph.get('edge_costs_version') == graph.graph.get('topology_version', 0):
+            return costs
+        return np.fromiter((data[self._weight] for _, _, data in graph.edges(data=True)),
+                           dtype=np.float64, count=len(self.edges))
+
+    def update_costs(self, graph: nx.DiGraph) -> None:
+        self.set_costs(self.read_costs(graph))
+
+    def set_costs(self, costs: np.ndarray) -> None:
+        self.costs = np.asarray(costs, dtype=np.float64)
+        self._costs = self.costs.tolist()
+
+    def has_node(self, node: int) -> bool:
+        return node in self._node_index
+
+    def node_index(self, node: int) -> int:
+        return self._node_index[node]
+
+    def edge_index(self, edge: Tuple[int, int]) -> int:
+        return self._edge_index[edge]
+
+    def path_cost(self, path: List[int]) -> float:
+        return sum(self._costs[self._edge_index[(path[i], path[i + 1])]] for i in range(len(path) - 1))
+
+    def dijkstra(self, src: int, dst: int = None, banned_nodes: Set[int] = None, banned_edges: Set[int] = None) \
+            -> Tuple[List[float], List[int]]:
+        """
+        Single source Dijkstra on internal node indices. Stops early once ``dst`` is settled. Of several shortest
+        incoming edges, a node takes the one with the smallest edge id, so the tree does not depend on the search order.
+
+        :param src: internal index of the source node
+        :param dst: internal index of the destination node or None for the full tree
+        :param banned_nodes: internal node indices that must not be visited
+        :param banned_edges: edge ids that must not be used
+        :return: distances and predecessor edge ids (-1 if the node is not reached) per internal node index
+        """
+        indptr = self._indptr
+        indices = self._indices
+        edge_ids = self._edge_ids
+        costs = self._costs
+        num_nodes = len(indptr) - 1
+
+        dist = [float('inf')] * num_nodes
+        pred = [-1] * num_nodes
+        done = [False] * num_nodes
+        if banned_nodes:
+            for node in banned_nodes:
+                done[node] = True
+
+        dist[src] = 0.0
+        heap = [(0.0, src)]
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            if u == dst:
+                break
+
+            for slot in range(indptr[u], indptr[u + 1]):
+                v = indices[slot]
+                if done[v]:
+                    continue
+                edge_id = edge_ids[slot]
+                if banned_edges and edge_id in banned_edges:
+                    continue
+                nd = d + costs[edge_id]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = edge_id
+                    heapq.heappush(heap, (nd, v))
+                elif nd == dist[v] and edge_id < pred[v]:
+                    pred[v] = edge_id
+
+        return dist, pred
+
+    def path_from_pred(self, pred: List[int], src: int, dst: int) -> Union[None, List[int]]:
+        """Walk the predecessor edges back from ``dst`` and return the node id path."""
+        if src == dst:
+            return [int(self.node_ids[src])]
+        if pred[dst] == -1:
+            return None
+
+        path = []
+        node = dst
+        while node != src:
+            u, v = self.edges[pred[node]]
+            path.append(v)
+            node = self._node_index[u]
+        path.append(int(self.node_ids[src]))
+        path.reverse()
+
+        return path
+
+    def shortest_path(self, src: int, dst: int, banned_nodes: Set[int] = None, banned_edges: Set[int] = None) \
+            -> Union[None, List[int]]:
+        """Shortest path between the node ids ``src`` and ``dst`` as a list of node ids."""
+        src_idx = self._node_index[src]
+        dst_idx = self._node_index[dst]
+        dist, pred = self.dijkstra(src_idx, dst_idx, banned_nodes, banned_edges)
+
+        return self.path_from_pred(pred, src_idx, dst_idx)
+
+    def shortest_simple_paths(self, src: int, dst: int, first_path: List[int] = None) -> Iterator[List[int]]:
+        """
+        Yen's k shortest loopless paths in order of increasing cost. Works as a generator, like
+        nx.shortest_simple_paths, so callers only pay for the paths they actually consume.
+
+        :param first_path: shortest path if it is already known (e.g. from a maintained shortest path tree)
+        """
+        if first_path is None:
+            first_path = self.shortest_path(src, dst)
+        if first_path is None:
+            return
+
+        found_paths = [first_path]
+        found_set = {tuple(first_path)}
+        candidates = []
+        candidate_set = set()
+        tie_breaker = count()
+        yield first_path
+
+        while True:
+            last_path = found_paths[-1]
+
+            for i in range(len(last_path) - 1):
+                spur_node = last_path[i]
+                root_path = last_path[:i + 1]
+
+                # Remove the edges of all known paths that share the same root
+                banned_edges = set()
+                for path in found_paths:
+                    if len(path) > i + 1 and path[:i + 1] == root_path:
+                        banned_edges.add(self._edge_index[(path[i], path[i + 1])])
+
+                # The root path (except the spur node) must not be visited again
+                banned_nodes = {self._node_index[node] for node in root_path[:-1]}
+
+                spur_path = self.shortest_path(spur_node, dst, banned_nodes, banned_edges)
+                if spur_path is None:
+                    continue
+
+                total_path = root_path[:-1] + spur_path
+                key = tuple(total_path)
+                if key in found_set or key in candidate_set:
+                    continue
+
+                candidate_set.add(key)
+                heapq.heappush(candidates, (self.path_cost(total_path), next(tie_breaker), total_path))
+
+            if not candidates:
+                return
+
+            _, _, next_path = heapq.heappop(candidates)
+            candidate_set.discard(tuple(next_path))
+            found_paths.append(next_path)
+            found_set.add(tuple(next_path))
+            yield next_path
+
+
+def validate_paths(graph: nx.DiGraph, src: int, dst: int, paths: List[List[int]], weight: str = 'cost',
+                   tolerance: float = 1e-9) -> bool:
+    """
+    Validate CSR routing results against networkx. The first path must have the same cost as the networkx shortest
+    path and every path must exist in the graph.
+
+    Paths of equal cost are not compared: with cost ties CSR and networkx can return different (equally short) paths,
+    so the two backends are cost-equivalent but not placement-equivalent.
+    """
+    if len(paths) == 0:
+        return not nx.has_path(graph, src, dst)
+
+    for path in paths:
+        if not nx.is_simple_path(graph, path):
+            logger.warning('CSR routing returned an invalid path %s', path)
+            return False
+
+    expected = nx.shortest_path_length(graph, source=src, target=dst, weight=weight)
+    found = nx.path_weight(graph, paths[0], weight)
+
+    if abs(expected - found) > tolerance * max(1.0, abs(expected)):
+        logger.warning('CSR routing cost %s differs from networkx cost %s for %s -> %s', found, expected, src, dst)
+        return False
+
+    return True
@@ -0,0 +1,68 @@
+import heapq
+import logging
+from typing import Dict, List, Set, Tuple
+
+from Routing.path_table import PathTable
+
+
+logger = logging.getLogger(__name__)
+
+
+class EdgeFlowIndex(object):
+    """
+    Inverted index from edges to the embedded flows that use them.
+
+    Edges are the edge ids of the path table. The index is updated whenever a flow is added, removed or moved to another
+    path. Candidate selection for rerouting then only touches the flows on the edges of the new path, instead of
+    intersecting the path of every embedded flow.
+    """
+
+    def __init__(self, path_table: PathTable):
+        self._paths = path_table
+        self._flows_on_edge: Dict[int, Set[int]] = {}
+
+    def add(self, flow_id: int, path_id: int) -> None:
+        for edge_id in self._paths.get_edge_ids(path_id).tolist():
+            flows = self._flows_on_edge.get(edge_id)
+            if flows is None:
+                flows = set()
+                self._flows_on_edge[edge_id] = flows
+            flows.add(flow_id)
+
+    def remove(self, flow_id: int, path_id: int) -> None:
+        for edge_id in self._paths.get_edge_ids(path_id).tolist():
+            flows = self._flows_on_edge.get(edge_id)
+            if flows is None:
+                continue
+            flows.discard(flow_id)
+            if not flows:
+                del self._flows_on_edge[edge_id]
+
+    def move(self, flow_id: int, old_path_id: int, new_path_id: int) -> None:
+        if old_path_id == new_path_id:
+            return
+        self.remove(flow_id, old_path_id)
+        self.add(flow_id, new_path_id)
+
+    def flows_on_edge(self, edge: Tuple[int, int]) -> Set[int]:
+        edge_id = self._paths.find_edge_id(edge)
+        if edge_id is None:
+            return set()
+        return self._flows_on_edge.get(edge_id, set())
+
+    def overlap_counts(self, path_id: int) -> Dict[int, int]:
+        """Number of shared edges with the path for every flow that shares at least one edge."""
+        counts = {}
+        for edge_id in self._paths.get_edge_ids(path_id).tolist():
+            for flow_id in self._flows_on_edge.get(edge_id, ()):
+                counts[flow_id] = counts.get(flow_id, 0) + 1
+        return counts
+
+    def top_overlapping(self, path_id: int, k: int) -> List[int]:
+        """
+        The k flows that share the most edges with the path, most shared edges first. Equal counts are ordered by flow
+        id (i.e. embedding order). Flows without a shared edge are never returned.
+        """
+        counts = self.overlap_counts(path_id)
+        top = heapq.nsmallest(k, counts.items(), key=lambda item: (-item[1], item[0]))
+        return [flow_id for flow_id, _ in top]
@@ -0,0 +1,244 @@
+import logging
+from collections.abc import Mapping
+from typing import Dict, Hashable, Iterator, List, Tuple
+
+import numpy as np
+
+from NetworkCalculus.dnc import ResourceReservation
+from Routing.flows import EmbeddedFlow, FlowRequest
+from Routing.path_table import PathTable
+
+
+logger = logging.getLogger(__name__)
+
+
+class RowIndex(object):
+    """
+    Rows of a table per key, in compact int32 arrays. ``slots`` holds the position of every row in the array of its
+    key, so a row is removed in O(1) by moving the last row of the key into its place.
+    """
+
+    def __init__(self, capacity: int):
+        self._rows: Dict[Hashable, np.ndarray] = {}
+        self._sizes: Dict[Hashable, int] = {}
+        self._slots = np.zeros(capacity, dtype=np.int32)
+
+    def grow(self, capacity: int) -> None:
+        slots = np.zeros(capacity, dtype=np.int32)
+        slots[:len(self._slots)] = self._slots
+        self._slots = slots
+
+    def add(self, key: Hashable, row: int) -> None:
+        rows = self._rows.get(key)
+        size = self._sizes.get(key, 0)
+        if rows is None or size == len(rows):
+            grown = np.empty(max(8, 2 * size), dtype=np.int32)
+            if rows is not None:
+                grown[:size] = rows
+            rows = grown
+            self._rows[key] = rows
+        rows[size] = row
+        self._slots[row] = size
+        self._sizes[key] = size + 1
+
+    def remove(self, key: Hashable, row: int) -> None:
+        rows = self._rows[key]
+        size = self._sizes[key] - 1
+        slot = self._slots[row]
+        last = rows[size]
+        rows[slot] = last
+        self._slots[last] = slot
+        if size == 0:
+            del self._rows[key]
+            del self._sizes[key]
+        else:
+            self._sizes[key] = size
+
+    def get(self, key: Hashable) -> np.ndarray:
+        """ Rows of the key (a view, in no particular order) """
+        rows = self._rows.get(key)
+        if rows is None:
+            return np.empty(0, dtype=np.int32)
+        return rows[:self._sizes[key]]
+
+    def sizes(self) -> Dict[Hashable, int]:
+        return dict(self._sizes)
+
+
+class FlowTable(Mapping):
+    """
+    Columnar store of the embedded flows.
+
+    Every flow is a row in NumPy columns (id, src, dst, protocol, rate, burst, deadline, priority, path id). Paths are
+    kept once in the path table. Rows of removed flows are put on a free-list and reused. Flow ids stay unique; they
+    map to their row.
+
+    The table is a mapping from flow id to EmbeddedFlow. The EmbeddedFlow objects are created on access and are
+    snapshots: changes go through set_route and set_profile. Vectorized filters and exports use columns().
+
+    Secondary indexes (source host, destination host, priority and (first switch, last switch) of the path) map a key to
+    the rows of its flows (see RowIndex). They are kept up to date by add, pop and set_route, so find() costs O(result).
+    Hot paths that only need a few fields read them with the column accessors (get_path_id, get_priority, get_profile)
+    instead of creating an EmbeddedFlow.
+    """
+
+    DTYPES = {'id': np.int64,
+              'src': np.int64,
+              'dst': np.int64,
+              'protocol': np.int32,
+              'rate': np.float64,
+              'burst': np.float64,
+              'deadline': np.float64,
+              'priority': np.int8,
+              'path_id': np.int32}
+
+    INDEXES = ('src', 'dst', 'priority', 'switches')
+
+    def __init__(self, path_table: PathTable, capacity: int = 1024):
+        self._paths = path_table
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.DTYPES.items()}
+        self._used = np.zeros(capacity, dtype=bool)
+        self._rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._size = 0  # Rows ever used (high water mark)
+        self._indexes: Dict[str, RowIndex] = {name: RowIndex(capacity) for name in self.INDEXES}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._rows)
+
+    def __contains__(self, flow_id) -> bool:
+        return flow_id in self._rows
+
+    def __getitem__(self, flow_id: int):
+        return self._flow(self._rows[flow_id])
+
+    def add(self, embedded_flow) -> None:
+        if embedded_flow.id in self._rows:
+            raise KeyError(f'Flow {embedded_flow.id} exists already')
+
+        row = self._free.pop() if self._free else self._new_row()
+        request = embedded_flow.flow_request
+        columns = self._columns
+        columns['id'][row] = embedded_flow.id
+        columns['src'][row] = request.sourceVM
+        columns['dst'][row] = request.destinationVM
+        columns['protocol'][row] = request.protocol
+        columns['rate'][row] = request.rate
+        columns['burst'][row] = request.burst
+        columns['deadline'][row] = request.deadline
+        columns['priority'][row] = embedded_flow.priority
+        path_id = embedded_flow.path_id if embedded_flow.path_id >= 0 else self._paths.intern(embedded_flow.path)
+        columns['path_id'][row] = path_id
+        self._used[row] = True
+        self._rows[embedded_flow.id] = row
+
+        indexes = self._indexes
+        indexes['src'].add(request.sourceVM, row)
+        indexes['dst'].add(request.destinationVM, row)
+        indexes['priority'].add(embedded_flow.priority, row)
+        indexes['switches'].add(self._switches(path_id), row)
+
+    def pop(self, flow_id: int):
+        row = self._rows.pop(flow_id)
+        embedded_flow = self._flow(row)
+        indexes = self._indexes
+        indexes['src'].remove(embedded_flow.flow_request.sourceVM, row)
+        indexes['dst'].remove(embedded_flow.flow_request.destinationVM, row)
+        indexes['priority'].remove(embedded_flow.priority, row)
+        indexes['switches'].remove(self._switches(embedded_flow.path_id), row)
+        self._used[row] = False
+        self._free.append(row)
+        return embedded_flow
+
+    def get_path_id(self, flow_id: int) -> int:
+        return int(self._columns['path_id'][self._rows[flow_id]])
+
+    def get_priority(self, flow_id: int) -> int:
+        return int(self._columns['priority'][self._rows[flow_id]])
+
+    def get_profile(self, flow_id: int) -> Tuple[float, float, float]:
+        """ (rate, burst, deadline) of the flow """
+        row = self._rows[flow_id]
+        columns = self._columns
+        return float(columns['rate'][row]), float(columns['burst'][row]), float(columns['deadline'][row])
+
+    def set_route(self, flow_id: int, path_id: int, priority: int) -> None:
+        row = self._rows[flow_id]
+        old_path_id = int(self._columns['path_id'][row])
+        old_priority = int(self._columns['priority'][row])
+        if old_priority != priority:
+            self._indexes['priority'].remove(old_priority, row)
+            self._indexes['priority'].add(priority, row)
+        if old_path_id != path_id and self._switches(old_path_id) != self._switches(path_id):
+            self._indexes['switches'].remove(self._switches(old_path_id), row)
+            self._indexes['switches'].add(self._switches(path_id), row)
+
+        self._columns['path_id'][row] = path_id
+        self._columns['priority'][row] = priority
+
+    def set_profile(self, flow_id: int, rate: float, burst: float, deadline: float) -> None:
+        row = self._rows[flow_id]
+        self._columns['rate'][row] = rate
+        self._columns['burst'][row] = burst
+        self._columns['deadline'][row] = deadline
+
+    def find(self, src: int = None, dst: int = None, priority: int = None,
+             switches: Tuple[int, int] = None) -> List[int]:
+        """ Ids (ascending) of the flows that match all given keys. Without keys, all flows. """
+        keys = {'src': src, 'dst': dst, 'priority': priority, 'switches': switches}
+        matches = [self._indexes[name].get(key) for name, key in keys.items() if key is not None]
+        if not matches:
+            return sorted(self._rows)
+
+        # Intersect starting from the smallest row set
+        matches.sort(key=len)
+        rows = matches[0]
+        for other in matches[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return np.sort(self._columns['id'][rows]).tolist()
+
+    def count(self, index: str) -> Dict[Hashable, int]:
+        """ Number of flows for every key of an index, e.g. count('priority') for the flows per queue. """
+        return self._indexes[index].sizes()
+
+    def columns(self, names: List[str] = None) -> Dict[str, np.ndarray]:
+        """ Copies of the columns of all flows (in row order), e.g. for vectorized filters and exports. """
+        used = self._used[:self._size]
+        return {name: self._columns[name][:self._size][used] for name in (names or self.DTYPES)}
+
+    def _switches(self, path_id: int) -> Tuple[int, int]:
+        """ (first switch, last switch) of a host to host path. """
+        path = self._paths.get_path(path_id)
+        return path[0][1], path[-1][0]
+
+    def _new_row(self) -> int:
+        row = self._size
+        if row == len(self._used):
+            capacity = 2 * len(self._used)
+            for name, column in self._columns.items():
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:row] = column
+                self._columns[name] = grown
+            used = np.zeros(capacity, dtype=bool)
+            used[:row] = self._used
+            self._used = used
+            for index in self._indexes.values():
+                index.grow(capacity)
+        self._size += 1
+        return row
+
+    def _flow(self, row: int) -> EmbeddedFlow:
+        columns = self._columns
+        path_id = int(columns['path_id'][row])
+        path = self._paths.get_path(path_id)
+        rate = float(columns['rate'][row])
+        burst = float(columns['burst'][row])
+        deadline = float(columns['deadline'][row])
+
+        request = FlowRequest(int(columns['src'][row]), int(columns['dst'][row]), int(columns['protocol'][row]),
+                              burst, rate, deadline)
+        reservation = ResourceReservation(path=path, rate=rate, burst=burst, deadline=deadline)
+        return EmbeddedFlow(int(columns['id'][row]), request, reservation, path, int(columns['priority'][row]), path_id)
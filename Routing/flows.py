@@ -0,0 +1,23 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from NetworkCalculus.dnc import ResourceReservation
+
+
+@dataclass
+class FlowRequest:
+    sourceVM: int
+    destinationVM: int
+    protocol: int
+    burst: int
+    rate: float
+    deadline: float
+
+@dataclass
+class EmbeddedFlow:
+    id: int
+    flow_request: FlowRequest
+    flow_reservation: ResourceReservation
+    path: List[Tuple[int, int]]
+    priority: int
+    path_id: int = -1
@@ -0,0 +1,159 @@
+import copy
+import logging
+import multiprocessing as mp
+from dataclasses import dataclass
+from typing import Dict, List, Set, Tuple, Union
+
+from Network.network_components import Network
+from NetworkCalculus.dnc import DNCAgent
+from Routing.routing import FlowManager, FlowRequest, EmbeddedFlow, try_place_flow
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Proposal:
+    # Index of the first option that fit on the snapshot, None if no option fit
+    option: Union[None, int]
+    # Edges of all options that were tried. The proposal is only valid if none of them changed since the snapshot.
+    read_edges: Set[Tuple[int, int]]
+
+
+def evaluate_options(dnc: DNCAgent, flow: FlowRequest, options: List[Tuple[int, List[Tuple[int, int]], int]],
+                     network: List[Network]) -> Proposal:
+    """ First fit of the options (path id, path, queue) of a flow. The network is unchanged afterwards. """
+    read_edges = set()
+    for i, (_, path, queue) in enumerate(options):
+        read_edges.update(path)
+        placed = try_place_flow(dnc, flow, path, queue, network)
+        if placed is not None:
+            dnc.restore_edges(network, placed[1])
+            return Proposal(i, read_edges)
+    return Proposal(None, read_edges)
+
+
+# Snapshot of an evaluation worker
+_worker_dnc = None
+_worker_network = None
+
+
+def _init_evaluate_worker(dnc: DNCAgent, network: List[Network]):
+    global _worker_dnc, _worker_network
+    _worker_dnc = dnc
+    _worker_network = network
+
+
+def _evaluate_worker(task) -> Proposal:
+    flow, options = task
+    return evaluate_options(_worker_dnc, flow, options, _worker_network)
+
+
+class OptimisticAdmission(object):
+    """
+    Batch admission with optimistic concurrency.
+
+    The flows are evaluated against an immutable snapshot of the networks (NetworkManager.get_snapshot), every flow on
+    its own, with the same first fit options as embed_flow_batch. The evaluations only read the snapshot, so they run
+    in a pool of ``workers`` processes and need no lock. commit() replays the proposals in request order on the current
+    state and validates each one: a proposal is kept if none of the edges it tried changed since the snapshot (by other
+    commits or by earlier flows of the batch). Otherwise the flow is evaluated again on the current state. Placements
+    only depend on the edges of their path, so the result is the same as embed_flow_batch on the current state, while
+    flows on disjoint parts of the network are evaluated in parallel.
+
+    Only batches (embed_flow_batch semantics: first fit, no rerouting) are admitted this way. Single embeddings
+    (FlowManager.embed_new_flow) may reroute embedded flows, which changes the flow bookkeeping and the edges of other
+    flows, so LCDN.embed_flow stays serialized under the lock.
+    """
+
+    def __init__(self, flow_manager: FlowManager, workers: int = None, min_parallel: int = 64):
+        self._flow_manager = flow_manager
+        self._dnc = flow_manager.get_dnc_agent()
+        self._paths = flow_manager.get_path_table()
+        self._workers = workers
+        self._min_parallel = min_parallel
+        self._proposals = 0
+        self._conflicts = 0
+
+    def get_statistics(self) -> Dict[str, int]:
+        return {'proposals': self._proposals, 'conflicts': self._conflicts}
+
+    def prepare(self, flows: List[FlowRequest], network: List[Network]) -> List[List[Tuple[int, List[Tuple[int, int]], int]]]:
+        """ Routes the flows and returns their options (path id, path, queue). Uses the flow manager state. """
+        all_paths = self._flow_manager.route_batch(flows, network)
+        thresholds = [n.get_threshold() for n in network]
+        ksp = self._flow_manager.get_init_ksp()
+
+        all_options = []
+        for flow, paths in zip(flows, all_paths):
+            if not paths:
+                logger.info('No Path exists between %s and %s!', flow.sourceVM, flow.destinationVM)
+            options = self._flow_manager.placement_options(flow, (paths or [])[:ksp], thresholds,
+                                                           self._flow_manager.strategy_for_flow())
+            all_options.append([(path_id, self._paths.get_path(path_id), queue) for path_id, queue in options])
+        return all_options
+
+    def evaluate(self, flows: List[FlowRequest], options: List[List], snapshot: List[Network]) -> List[Proposal]:
+        """ Proposals of all flows on the snapshot. Does not use the flow manager state, the snapshot is not changed. """
+        tasks = list(zip(flows, options))
+        if self._workers == 1 or len(tasks) < self._min_parallel:
+            network = copy.deepcopy(snapshot)
+            proposals = [evaluate_options(self._dnc, flow, flow_options, network) for flow, flow_options in tasks]
+        else:
+            chunksize = max(1, len(tasks) // (4 * (self._workers or mp.cpu_count())))
+            with mp.Pool(self._workers, initializer=_init_evaluate_worker, initargs=(self._dnc, snapshot)) as pool:
+                proposals = pool.map(_evaluate_worker, tasks, chunksize)
+
+        self._proposals += len(proposals)
+        return proposals
+
+    def commit(self, flows: List[FlowRequest], options: List[List], proposals: List[Proposal], network: List[Network],
+               changed_edges: Union[None, Set[Tuple[int, int]]]) -> Tuple[List[Union[None, EmbeddedFlow]], List[Network]]:
+        """
+        Validates and commits the proposals on a copy of the current networks. ``changed_edges`` are the edges that
+        changed since the snapshot (NetworkManager.get_changed_edges), None if the topology changed. After a topology
+        change every flow is placed again with its prepared options that still exist, so the flows are not routed
+        again and the strategy of each flow is the one of prepare().
+
+        :return: The embedding (or None) of every flow in request order and the networks with all admitted flows
+        """
+        working_network = copy.deepcopy(network)
+        self._dnc.check_and_update_network_state(working_network)
+
+        if changed_edges is None:
+            logger.info('Topology changed since the snapshot, placing the batch again')
+            graph = working_network[0].get_network_graph()
+            options = [[option for option in flow_options if all(graph.has_edge(*edge) for edge in option[1])]
+                       for flow_options in options]
+
+        written = set(changed_edges or ())
+        embeddings = [None for _ in flows]
+        for i, (flow, flow_options, proposal) in enumerate(zip(flows, options, proposals)):
+            if changed_edges is not None and written.isdisjoint(proposal.read_edges):
+                if proposal.option is None:
+                    continue
+                embedding = self._place(flow, flow_options[proposal.option:proposal.option + 1], working_network)
+                if embedding is None:
+                    # Only happens if the snapshot was changed
+                    logger.warning('Validated proposal of %s does not fit', flow)
+                    embedding = self._place(flow, flow_options, working_network)
+            else:
+                self._conflicts += 1
+                embedding = self._place(flow, flow_options, working_network)
+
+            if embedding is not None:
+                written.update(embedding.path)
+            embeddings[i] = embedding
+
+        self._dnc.check_and_update_network_state(working_network)
+        logger.info('Optimistic admission: %s of %s flows embedded, %s conflicts',
+                    sum(e is not None for e in embeddings), len(flows), self._conflicts)
+        return embeddings, working_network
+
+    def _place(self, flow: FlowRequest, options: List, network: List[Network]) -> Union[None, EmbeddedFlow]:
+        for _, path, queue in options:
+            placed = try_place_flow(self._dnc, flow, path, queue, network)
+            if placed is not None:
+                # The path may have been evicted from the path table since prepare()
+                return self._flow_manager.add_placed_flow(flow, placed[0], self._paths.intern(path), queue)
+        return None
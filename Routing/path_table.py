@@ -0,0 +1,136 @@
+import logging
+from typing import List, Tuple, Dict, Union
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class PathTable(object):
+    """
+    Interns every distinct path once.
+
+    Each path gets an integer id, a canonical edge list (shared by all flows and reservations on that path), a NumPy
+    array of edge ids and an edge bitset (Python int, bit i set if edge i is on the path). Path equality becomes an id
+    comparison and the overlap of two paths is a popcount of the AND of their bitsets.
+
+    Holders of a path id that must outlive the current call (embedded flows, demotions) take a reference with
+    acquire() and drop it with release(). collect() evicts the paths without references, which are mostly candidate
+    paths of the routing. It only runs once the table has grown to twice its size after the last collection (and at
+    least ``min_collect`` paths), so the table holds at most max(2 * referenced paths, min_collect) paths plus the paths
+    interned since. Ids are never reused: the id of an evicted path is invalid, interning the path again gives a new id.
+    Edge ids are kept, there is one per edge of the topology.
+    """
+
+    def __init__(self, min_collect: int = 4096):
+        self._path_ids: Dict[Tuple[Tuple[int, int], ...], int] = {}
+        self._paths: Dict[int, List[Tuple[int, int]]] = {}
+        self._edge_arrays: Dict[int, np.ndarray] = {}
+        self._bitsets: Dict[int, int] = {}
+        self._edge_ids: Dict[Tuple[int, int], int] = {}
+        self._edges: List[Tuple[int, int]] = []
+        self._next_path_id = 0
+        self._references: Dict[int, int] = {}
+        self._min_collect = min_collect
+        self._collect_at = min_collect
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path_id: int) -> bool:
+        return path_id in self._paths
+
+    def edge_id(self, edge: Tuple[int, int]) -> int:
+        edge_id = self._edge_ids.get(edge)
+        if edge_id is None:
+            edge_id = len(self._edges)
+            self._edge_ids[edge] = edge_id
+            self._edges.append(edge)
+        return edge_id
+
+    def find_edge_id(self, edge: Tuple[int, int]) -> Union[None, int]:
+        """Edge id without registering unknown edges."""
+        return self._edge_ids.get(edge)
+
+    def get_edge(self, edge_id: int) -> Tuple[int, int]:
+        return self._edges[edge_id]
+
+    def intern(self, path: List[Tuple[int, int]]) -> int:
+        key = tuple(path)
+        path_id = self._path_ids.get(key)
+        if path_id is not None:
+            return path_id
+
+        path_id = self._next_path_id
+        self._next_path_id += 1
+        edge_array = np.fromiter((self.edge_id(edge) for edge in key), dtype=np.int32, count=len(key))
+        bitset = 0
+        for edge_id in edge_array.tolist():
+            bitset |= 1 << edge_id
+
+        self._path_ids[key] = path_id
+        self._paths[path_id] = list(key)
+        self._edge_arrays[path_id] = edge_array
+        self._bitsets[path_id] = bitset
+
+        return path_id
+
+    def acquire(self, path_id: int) -> None:
+        """Keeps the path until the reference is released."""
+        self._references[path_id] = self._references.get(path_id, 0) + 1
+
+    def release(self, path_id: int) -> None:
+        count = self._references[path_id] - 1
+        if count:
+            self._references[path_id] = count
+        else:
+            del self._references[path_id]
+
+    def references(self, path_id: int) -> int:
+        return self._references.get(path_id, 0)
+
+    def collect(self, force: bool = False) -> int:
+        """
+        Evicts the paths without references if the table has grown enough since the last collection (always with
+        ``force``). Ids of unreferenced paths that are still in use are invalid afterwards, so this is only called
+        between embeddings.
+
+        :return: The number of evicted paths
+        """
+        if not force and len(self._paths) < self._collect_at:
+            return 0
+
+        unreferenced = [path_id for path_id in self._paths if path_id not in self._references]
+        for path_id in unreferenced:
+            del self._path_ids[tuple(self._paths.pop(path_id))]
+            del self._edge_arrays[path_id]
+            del self._bitsets[path_id]
+
+        self._collect_at = max(2 * len(self._paths), self._min_collect)
+        logger.debug('Evicted %s of %s paths', len(unreferenced), len(unreferenced) + len(self._paths))
+        return len(unreferenced)
+
+    def canonical(self, path: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Returns the shared edge list of the path."""
+        return self._paths[self.intern(path)]
+
+    def get_path(self, path_id: int) -> List[Tuple[int, int]]:
+        return self._paths[path_id]
+
+    def get_edge_ids(self, path_id: int) -> np.ndarray:
+        return self._edge_arrays[path_id]
+
+    def get_bitset(self, path_id: int) -> int:
+        return self._bitsets[path_id]
+
+    def overlap(self, path_a: int, path_b: int) -> int:
+        """Number of edges both paths share."""
+        return (self._bitsets[path_a] & self._bitsets[path_b]).bit_count()
+
+    def overlaps(self, path_id: int, other_ids: np.ndarray) -> np.ndarray:
+        """Number of shared edges between one path and many paths."""
+        bitset = self._bitsets[path_id]
+        bitsets = self._bitsets
+        return np.fromiter(((bitset & bitsets[other]).bit_count() for other in other_ids.tolist()),
+                           dtype=np.int64, count=len(other_ids))
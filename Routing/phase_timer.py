@@ -0,0 +1,128 @@
+import logging
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseHistogram(object):
+    """ Durations of one phase in power of two nanosecond buckets (bucket i holds durations below 2^i ns). """
+
+    BUCKETS = 64
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, duration_ns: int) -> None:
+        self.counts[min(duration_ns.bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+
+    def percentile(self, p: float) -> int:
+        """ Upper bound (ns) of the bucket that holds the p-th percentile. """
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(1 << i, self.max_ns)
+        return self.max_ns
+
+    def summary(self) -> Dict:
+        return {'count': self.count,
+                'total_ns': self.total_ns,
+                'mean_ns': self.total_ns // self.count if self.count else 0,
+                'p50_ns': self.percentile(50),
+                'p99_ns': self.percentile(99),
+                'max_ns': self.max_ns,
+                'buckets': {1 << i: count for i, count in enumerate(self.counts) if count}}
+
+
+class _Phase(object):
+    __slots__ = ('_timer', '_name', '_start')
+
+    def __init__(self, timer: 'PhaseTimer', name: str):
+        self._timer = timer
+        self._name = name
+
+    def __enter__(self):
+        self._timer._enter(self._name)
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self._timer._exit(time.perf_counter_ns() - self._start)
+        return False
+
+
+class PhaseTimer(object):
+    """
+    Hierarchical phase timing.
+
+    ``with timer.phase('routing'):`` times a phase. Nested phases are named by their path, e.g. 'embed/reroute/check',
+    and every phase path gets its own histogram. With tracing, the phase durations of the last request (outermost
+    phase) are kept as well. A disabled timer hands out a shared no-op context, so the instrumentation can stay in
+    place.
+    """
+
+    _DISABLED = nullcontext()
+
+    def __init__(self, enabled: bool = False, trace: bool = False):
+        self._enabled = enabled
+        self._trace = trace
+        self._stack: List[str] = []
+        self._histograms: Dict[str, PhaseHistogram] = {}
+        self._current_trace: List[Tuple[str, int]] = []
+        self._last_trace: List[Tuple[str, int]] = []
+
+    def set_enabled(self, enabled: bool, trace: bool = False) -> None:
+        self._enabled = enabled
+        self._trace = trace
+        self._stack.clear()
+        self._current_trace = []
+
+    def is_tracing(self) -> bool:
+        return self._enabled and self._trace
+
+    def phase(self, name: str):
+        if not self._enabled:
+            return self._DISABLED
+        return _Phase(self, name)
+
+    def reset(self) -> None:
+        self._histograms.clear()
+        self._last_trace = []
+
+    def get_histograms(self) -> Dict[str, Dict]:
+        """ Summary and buckets of every phase path """
+        return {path: histogram.summary() for path, histogram in sorted(self._histograms.items())}
+
+    def get_last_trace(self) -> Dict[str, int]:
+        """ Total time (ns) per phase path of the last request """
+        trace = {}
+        for path, duration_ns in self._last_trace:
+            trace[path] = trace.get(path, 0) + duration_ns
+        return trace
+
+    def _enter(self, name: str) -> None:
+        self._stack.append(f'{self._stack[-1]}/{name}' if self._stack else name)
+
+    def _exit(self, duration_ns: int) -> None:
+        path = self._stack.pop()
+        histogram = self._histograms.get(path)
+        if histogram is None:
+            histogram = PhaseHistogram()
+            self._histograms[path] = histogram
+        histogram.add(duration_ns)
+
+        if self._trace:
+            self._current_trace.append((path, duration_ns))
+            if not self._stack:
+                self._last_trace = self._current_trace
+                self._current_trace = []
@@ -0,0 +1,172 @@
+import copy
+import logging
+import math
+import time
+from typing import Dict, List, Tuple, Union
+
+from Network.network_components import Network
+from NetworkCalculus.dnc import ResourceReservation
+from Routing.routing import FlowManager, EmbeddedFlow
+
+
+logger = logging.getLogger(__name__)
+
+
+class Rebalancer(object):
+    """
+    Incremental rebalancing of the embedded flows.
+
+    The load of an (edge, priority) slot is its largest utilization of rate, delay threshold and buffer. A step
+    repeatedly takes the most loaded slot and tries to move its largest flows to a lower priority queue on the same
+    path or to one of their other shortest paths. Moves are what-if evaluations on one working copy of the networks
+    (only the edges of the old and new path are updated and checked). A move is committed only if it strictly lowers
+    the highest load of the slots it touches; the loads of all other slots do not change, so the network never gets
+    worse and moves cannot cycle. A step ends when its time slice is spent or no slot can be improved.
+    """
+
+    def __init__(self, flow_manager: FlowManager, candidates_per_slot: int = 8, paths_per_flow: int = 2):
+        self._flow_manager = flow_manager
+        self._dnc = flow_manager.get_dnc_agent()
+        self._paths = flow_manager.get_path_table()
+        self._candidates_per_slot = candidates_per_slot
+        self._paths_per_flow = paths_per_flow
+        self._steps = 0
+        self._evaluations = 0
+        self._moves = 0
+
+    def get_statistics(self) -> Dict[str, int]:
+        return {'steps': self._steps, 'evaluations': self._evaluations, 'moves': self._moves}
+
+    def step(self, networks: List[Network], time_slice: float = 0.01) -> Tuple[List[EmbeddedFlow], List[Network]]:
+        """
+        One rebalancing step of about ``time_slice`` seconds (at least one evaluation).
+
+        :return: The moved flows and the networks with the moves (``networks`` if nothing moved)
+        """
+        end = time.perf_counter() + time_slice
+        self._steps += 1
+
+        working_network = copy.deepcopy(networks)
+        thresholds = [n.get_threshold() for n in working_network]
+        loads = {(edge, priority): self._load(network, edge)
+                 for priority, network in enumerate(working_network) for edge in network.get_network_graph().edges}
+
+        moved = {}
+        exhausted = set()
+        while True:
+            slots = [(load, slot) for slot, load in loads.items() if load > 0 and slot not in exhausted]
+            if not slots:
+                break
+            _, slot = max(slots)
+
+            embedded_flow = self._improve_slot(slot, working_network, thresholds, loads, end)
+            if embedded_flow is None:
+                exhausted.add(slot)
+            else:
+                moved[embedded_flow.id] = embedded_flow
+                # Other slots may be improvable after the move
+                exhausted.clear()
+
+            if time.perf_counter() >= end:
+                break
+
+        if not moved:
+            return [], networks
+
+        logger.info('Rebalancing moved %s flows', len(moved))
+        return list(moved.values()), working_network
+
+    def _improve_slot(self, slot: Tuple[Tuple[int, int], int], network: List[Network], thresholds: List[float],
+                      loads: Dict, end: float) -> Union[None, EmbeddedFlow]:
+        """ Commits the first strictly improving move of a flow in the slot. """
+        edge, priority = slot
+        flow_table = self._flow_manager.get_flow_table()
+
+        # Rank by the columns, only the candidates are materialized
+        flows = []
+        for flow_id in self._flow_manager.flows_on_edge(edge):
+            path = self._paths.get_path(flow_table.get_path_id(flow_id))
+            flow_priority = flow_table.get_priority(flow_id)
+            if self._queue_on_edge(path, flow_priority, edge) == priority:
+                rate, burst, _ = flow_table.get_profile(flow_id)
+                flows.append((self._share(path, flow_priority, rate, burst, edge, thresholds), flow_id))
+        flows.sort(key=lambda flow: (-flow[0], flow[1]))
+
+        for _, flow_id in flows[:self._candidates_per_slot]:
+            embedded_flow = flow_table[flow_id]
+            for path, queue in self._options(embedded_flow, network, thresholds):
+                if self._try_move(embedded_flow, path, queue, network, loads):
+                    self._moves += 1
+                    logger.debug('Rebalancing moved flow %s to Q %s, path %s', embedded_flow.id, queue, path)
+                    return self._flow_manager.move_flow(embedded_flow.id, path, queue)
+                if time.perf_counter() >= end:
+                    return None
+
+        return None
+
+    def _options(self, embedded_flow: EmbeddedFlow, network: List[Network],
+                 thresholds: List[float]) -> List[Tuple[List[Tuple[int, int]], int]]:
+        """ Lower priority queues on the current path first, then the other shortest paths (current queue first). """
+        deadline = embedded_flow.flow_request.deadline
+        path = embedded_flow.path
+        options = [(path, queue) for queue in range(embedded_flow.priority + 1, len(thresholds))
+                   if self._dnc.deadline_bound(len(path), queue, thresholds) <= deadline]
+
+        for other_path in self._flow_manager.alternative_paths(embedded_flow, network, self._paths_per_flow):
+            queues = [queue for queue in range(len(thresholds))
+                      if self._dnc.deadline_bound(len(other_path), queue, thresholds) <= deadline]
+            queues.sort(key=lambda queue: (queue != embedded_flow.priority, -queue))
+            options.extend((other_path, queue) for queue in queues)
+
+        return options
+
+    def _try_move(self, embedded_flow: EmbeddedFlow, path: List[Tuple[int, int]], queue: int, network: List[Network],
+                  loads: Dict) -> bool:
+        """ What-if move on the working network. Kept (and loads updated) only if it strictly improves. """
+        self._evaluations += 1
+        touched = list(dict.fromkeys(embedded_flow.path + path))
+        before = max(loads[(edge, priority)] for edge in touched for priority in range(len(network)))
+
+        snapshot = self._dnc.snapshot_edges(network, touched)
+        request = embedded_flow.flow_request
+        reservation = ResourceReservation(path=path, rate=request.rate, burst=request.burst, deadline=request.deadline)
+
+        self._dnc.subtract_reservation(embedded_flow.flow_reservation, network, embedded_flow.priority)
+        violation = self._dnc.reserve_resources(reservation, network, queue)
+        if not violation:
+            violation = self._dnc.update_edges_state(network, touched)
+
+        if not violation:
+            after = {(edge, priority): self._load(network[priority], edge)
+                     for edge in touched for priority in range(len(network))}
+            if max(after.values()) < before * (1 - 1e-9):
+                loads.update(after)
+                return True
+
+        self._dnc.restore_edges(network, snapshot)
+        self._dnc.update_edges_state(network, touched)
+        return False
+
+    @staticmethod
+    def _load(network: Network, edge: Tuple[int, int]) -> float:
+        edge_data = network.get_network_graph().edges[edge]
+        ac = edge_data['arrival_curve']
+        sc = edge_data['service_curve']
+        if ac.rate == 0 and ac.burst == 0:
+            return 0.0
+        if ac.rate >= sc.rate:
+            return math.inf
+        return max(ac.rate / sc.rate,
+                   sc.delay(ac) / edge_data['threshold'],
+                   sc.buffer_chameleon(ac, network.get_threshold()) / edge_data['buffer'])
+
+    @staticmethod
+    def _queue_on_edge(path: List[Tuple[int, int]], priority: int, edge: Tuple[int, int]) -> int:
+        # The first hop of a flow is the single host queue
+        return 0 if edge == path[0] else priority
+
+    @staticmethod
+    def _share(path: List[Tuple[int, int]], priority: int, rate: float, burst: float, edge: Tuple[int, int],
+               thresholds: List[float]) -> float:
+        """ Burst of the flow at the edge (it grows by rate * threshold per hop) """
+        return burst + rate * thresholds[priority] * path.index(edge)
@@ -1,16 +1,29 @@
 import copy
-from dataclasses import dataclass
-from typing import List, Tuple, Union, Dict
+from dataclasses import dataclass, replace
+from typing import List, Set, Tuple, Union, Dict
 import networkx as nx
 import logging
 from enum import Enum
 import time
+import heapq
 from itertools import islice
 import numpy as np
+import multiprocessing as mp
 
 from Network.network_components import Network
 from NetworkCalculus.arrival_curve import ArrivalCurve
 from NetworkCalculus.dnc import DNCAgent, ResourceReservation, Violation
+from NetworkCalculus.cost_models import LinkCostModel
+from Routing.csr_routing import CSRTopology, validate_paths
+from Routing.spt_cache import ShortestPathTreeCache
+from Routing.path_table import PathTable
+from Routing.flow_index import EdgeFlowIndex
+from Routing.timer_wheel import TimerWheel
+from Routing.flows import FlowRequest, EmbeddedFlow
+from Routing.flow_table import FlowTable
+from Routing.admission_cache import NegativeAdmissionCache
+from Routing.phase_timer import PhaseTimer
+from Routing.aggregate_table import AggregateTable
 
 
 logger = logging.getLogger(__name__)
@@ -25,23 +38,25 @@ class LCDNStrategy(Enum):
     NOTGREEDY = 2
     GREEDYMIX = 3
 
-@dataclass
-class FlowRequest:
-    sourceVM: int
-    destinationVM: int
-    protocol: int
-    burst: int
-    rate: float
-    deadline: float
+class RoutingBackend(Enum):
+    NETWORKX = 1
+    CSR = 2
 
-@dataclass
-class EmbeddedFlow:
-    id: int
-    flow_request: FlowRequest
-    flow_reservation: ResourceReservation
-    path: List[Tuple[int, int]]
-    priority: int
+class RerouteSelection(Enum):
+    OVERLAP = 1
+    BOTTLENECK = 2
+
+class QueueSearch(Enum):
+    # Queue search of NOTGREEDY embeddings. Feasibility is not monotone across queues: a flow in a higher priority
+    # queue also delays every lower priority queue on its path, so it can fail in a queue while a lower priority queue
+    # still fits. BISECT can then pick another queue than LINEAR or reject a flow that LINEAR embeds.
+    LINEAR = 1      # Lowest priority queue that fits, exact
+    BISECT = 2      # log2(queues) checks, only equivalent to LINEAR where feasibility is monotone
 
+class AdmissionOrder(Enum):
+    GIVEN = 1       # Request order
+    DEADLINE = 2    # Tightest deadline first
+    RATE = 3        # Smallest rate first
 
 @dataclass
 class EmbeddingRequest:
@@ -55,33 +70,60 @@ class RoutingModule(object):
         self._network = None
         self._all_networks = []
         self._ksp_offset = 0
+        self._backend = RoutingBackend.NETWORKX
+        self._csr = None
+        self._validate = False
+        self._incremental_trees = False
+        self._max_trees = 256
+        self._spt = None
+        self._path_table = PathTable()
 
     def set_ksp_offset(self, offset: int):
         self._ksp_offset = offset
 
+    def get_ksp_offset(self) -> int:
+        return self._ksp_offset
+
+    def get_path_table(self) -> PathTable:
+        return self._path_table
+
+    def set_backend(self, backend: RoutingBackend):
+        self._backend = backend
+        self._csr = None
+        self._spt = None
+
+    def set_incremental_trees(self, enabled: bool, max_trees: int = 256):
+        """ Answer shortest path queries from incrementally repaired shortest path trees (CSR backend only). """
+        self._incremental_trees = enabled
+        self._max_trees = max_trees
+        self._spt = None
+
+    def get_tree_statistics(self):
+        if self._spt is None:
+            return {}
+        return self._spt.get_statistics()
+
+    def set_validation(self, validate: bool):
+        """ Cross check the CSR results with networkx and fall back to networkx on a mismatch. """
+        self._validate = validate
+
     def update_network(self, network: nx.DiGraph) -> None:
         self._network = network
 
+        if self._backend == RoutingBackend.CSR:
+            if self._csr is None or not self._csr.matches(network):
+                logger.debug('Building CSR topology for version %s', network.graph.get("topology_version", 0))
+                self._csr = CSRTopology(network)
+                self._spt = ShortestPathTreeCache(self._csr, self._max_trees) if self._incremental_trees else None
+            elif self._spt is not None:
+                self._spt.update_costs(self._csr.read_costs(network))
+            else:
+                self._csr.update_costs(network)
+
     def update_all_networks(self, networks: List[Network]) -> None:
         for network in networks:
             self._all_networks.append(network.get_network_graph())
 
-    @staticmethod    
-    def sorted_flow_list_by_edges(all_flows_dict, new_flow_path: List[Tuple[int, int]]):
-        result = {}
-        set_new_flwo = set(new_flow_path)
-        all_flow_paths = {}
-        for flow_id, flow_e in all_flows_dict.items():
-            all_flow_paths[flow_id] = flow_e.path
-
-        for f_id, e_flow in all_flow_paths.items():
-            set_a = set(e_flow)
-            result[f_id] = len(set_a & set_new_flwo)
-        # Should return a List of the Flow IDs in order of the most common edges
-        sorted_flows = sorted(result, key=lambda k: result[k], reverse=True)
-
-        return sorted_flows
-
     @staticmethod
     def get_edges_from_node_list(path: List[int]) -> List[Tuple[int, int]]:
         edges = []
@@ -92,21 +134,28 @@ class RoutingModule(object):
 
         return edges
 
-    def get_shortest_path(self, src: int, dst: int) -> Union[None, List[List[Tuple[int, int]]]]:
+    def get_shortest_path(self, src: int, dst: int, k: int = 10) -> Union[None, List[List[Tuple[int, int]]]]:
+        """
+        Returns the k shortest paths (as edge lists) starting at the configured offset. Callers that only use the
+        first few paths should ask for exactly those, since every further path costs a full Yen iteration.
+        """
         if self._network is None:
             logger.critical('No Network has been initialized.')
             return None
 
+        if self._backend == RoutingBackend.CSR:
+            return self._get_shortest_path_csr(src, dst, k)
+
         # Get up-to-date shortest path based on queue delay
         shortest_path = nx.shortest_path(self._network, source=src, target=dst, weight='cost')
 
-        k_shortest_paths = list(islice(nx.shortest_simple_paths(self._network, source=src, target=dst, weight='cost'), 10))
+        k_shortest_paths = list(islice(nx.shortest_simple_paths(self._network, source=src, target=dst, weight='cost'), min(k, 10)))
 
         shortest_path_length = nx.shortest_path_length(self._network, source=src, target=dst, weight='cost')
 
         k_shortest_edge_paths = []
         for s_path in k_shortest_paths:
-            k_shortest_edge_paths.append(self.get_edges_from_node_list(s_path))
+            k_shortest_edge_paths.append(self._path_table.canonical(self.get_edges_from_node_list(s_path)))
 
         # TODO: Remove TMP Return
         tmp_return = None
@@ -116,29 +165,221 @@ class RoutingModule(object):
         else:
             tmp_return =  k_shortest_edge_paths[self._ksp_offset:]
 
-        logger.debug(f'SP return {tmp_return}')
+        logger.debug('SP return %s', tmp_return)
         return tmp_return
 
+    def _get_shortest_path_csr(self, src: int, dst: int, k: int) -> List[List[Tuple[int, int]]]:
+        if not self._csr.has_node(src) or not self._csr.has_node(dst):
+            logger.error('%s or %s is not part of the routing topology.', src, dst)
+            return []
+
+        first_path = None
+        if self._spt is not None:
+            first_path = self._spt.shortest_path(src, dst)
+            if first_path is None:
+                return []
+
+        k_shortest_paths = list(islice(self._csr.shortest_simple_paths(src, dst, first_path), min(k, 10)))
+
+        if self._validate and not validate_paths(self._network, src, dst, k_shortest_paths):
+            logger.warning('CSR routing failed validation for %s -> %s. Falling back to networkx.', src, dst)
+            k_shortest_paths = list(islice(nx.shortest_simple_paths(self._network, source=src, target=dst, weight='cost'), min(k, 10)))
+
+        return self._select_paths(k_shortest_paths)
+
+    def _select_paths(self, k_shortest_paths: List[List[int]]) -> List[List[Tuple[int, int]]]:
+        if len(k_shortest_paths) == 0:
+            return []
+
+        k_shortest_edge_paths = [self._path_table.canonical(self.get_edges_from_node_list(s_path)) for s_path in k_shortest_paths]
+
+        if len(k_shortest_edge_paths) <= self._ksp_offset:
+            return [k_shortest_edge_paths[-1]]
+
+        return k_shortest_edge_paths[self._ksp_offset:]
+
+    def route_batch(self, requests: List[FlowRequest], k: int = 10, processes: int = None,
+                    min_parallel: int = 64) -> List[List[List[Tuple[int, int]]]]:
+        """
+        Compute the candidate paths of many flow requests on a frozen snapshot of the current costs.
+
+        The KSP calls are independent, so they are spread over a process pool. Every worker receives the read-only CSR
+        topology once when it starts. Small batches are routed in this process, because starting the pool costs more
+        than it saves. The result has the same format as get_shortest_path for every request, in request order.
+        """
+        if self._network is None:
+            logger.critical('No Network has been initialized.')
+            return [None for _ in requests]
+
+        if self._csr is not None and self._csr.matches(self._network):
+            topology = self._csr
+        else:
+            topology = CSRTopology(self._network)
+
+        tasks = [(request.sourceVM, request.destinationVM, min(k, 10)) for request in requests]
+
+        if processes == 1 or len(tasks) < min_parallel:
+            node_paths = [_route_on_topology(topology, task) for task in tasks]
+        else:
+            chunksize = max(1, len(tasks) // (4 * (processes or mp.cpu_count())))
+            with mp.Pool(processes, initializer=_init_route_worker, initargs=(topology,)) as pool:
+                node_paths = pool.map(_route_worker, tasks, chunksize)
+
+        return [self._select_paths(paths) for paths in node_paths]
+
+
+# Read-only topology of a route_batch worker
+_worker_topology = None
+
+
+def _init_route_worker(topology: CSRTopology):
+    global _worker_topology
+    _worker_topology = topology
+
+
+def _route_worker(task: Tuple[int, int, int]) -> List[List[int]]:
+    return _route_on_topology(_worker_topology, task)
+
+
+def _route_on_topology(topology: CSRTopology, task: Tuple[int, int, int]) -> List[List[int]]:
+    src, dst, k = task
+    if not topology.has_node(src) or not topology.has_node(dst):
+        return []
+    return list(islice(topology.shortest_simple_paths(src, dst), k))
+
+
+def try_reroute(dnc: DNCAgent, strategy: LCDNStrategy, embedded_flow: EmbeddedFlow, networks: List[Network],
+                alternative_path: List[Tuple[int, int]] = None) -> Union[None, Tuple[List[Tuple[int, int]], int, List[Network]]]:
+    """
+    What-if reroute of an embedded flow. Neither the flow nor ``networks`` are changed.
+
+    GREEDY keeps the path and tries the lower priorities. NOTGREEDY moves the flow to ``alternative_path`` and tries the
+    lowest queue first. Returns the new path, the new priority and the networks with the moved flow, or None.
+    """
+    if strategy == LCDNStrategy.GREEDY:
+        path = embedded_flow.path
+        queues = range(embedded_flow.priority + 1, 4)
+    elif strategy == LCDNStrategy.NOTGREEDY and alternative_path is not None:
+        path = alternative_path
+        # Queues whose thresholds alone exceed the deadline cannot fit
+        thresholds = [n.get_threshold() for n in networks]
+        queues = [q for q in reversed(range(len(networks)))
+                  if dnc.deadline_bound(len(path), q, thresholds) <= embedded_flow.flow_request.deadline]
+    else:
+        return None
+
+    # Remove the reservation from the reroute candidate
+    working_network = copy.deepcopy(networks)
+    dnc.remove_resources(embedded_flow.flow_reservation, working_network, embedded_flow.priority)
+
+    request = embedded_flow.flow_request
+    for q in queues:
+        attempt = copy.deepcopy(working_network)
+        reservation = ResourceReservation(burst=request.burst,
+                                          rate=request.rate,
+                                          deadline=request.deadline,
+                                          path=path)
+
+        # Violation means either current reroute does not work or new flow wont fit.
+        violation = dnc.reserve_resources(reservation, attempt, q) or dnc.check_and_update_network_state(attempt)
+        if violation:
+            logger.debug('Rerouting did not work on Flow %s to prio %s, path %s', embedded_flow.id, q, path)
+        else:
+            logger.info('Rerouting worked for flow %s to Q %s, path %s', embedded_flow.id, q, path)
+            return path, q, attempt
+
+    return None
+
+
+def try_place_flow(dnc: DNCAgent, flow: FlowRequest, path: List[Tuple[int, int]], queue: int, network: List[Network],
+                   curves: List = None):
+    """
+    What-if placement of a flow on a working network. Only the edges of the path are updated and checked. ``curves``
+    are the precomputed hop curves of the flow (see AggregateTable). Returns the reservation and the snapshot to undo it
+    (restore_edges), or None if the flow does not fit (the network is left unchanged).
+    """
+    reservation = ResourceReservation(burst=flow.burst,
+                                      rate=flow.rate,
+                                      deadline=flow.deadline,
+                                      path=path)
+    snapshot = dnc.snapshot_edges(network, path)
+    if curves is None:
+        violation = dnc.reserve_resources(reservation, network, queue)
+    else:
+        violation = dnc.reserve_curves(curves, flow.deadline, network, queue)
+    if not violation:
+        dnc.update_edges(network, path)
+        violation = dnc.check_edges(network, path)
+
+    if violation:
+        dnc.restore_edges(network, snapshot)
+        return None
+
+    return reservation, snapshot
+
+
+def _reroute_worker(chunk):
+    """ Evaluates a chunk of ranked reroute candidates and returns the first success (rank, reroute) or None. """
+    dnc, strategy, networks, tasks = chunk
+    for rank, embedded_flow, alternative_path in tasks:
+        rerouted = try_reroute(dnc, strategy, embedded_flow, networks, alternative_path)
+        if rerouted is not None:
+            return rank, rerouted
+    return None
+
 
 class FlowManager(object):
-    def __init__(self):
+    # Number of GREEDYMIX strategy decisions that are sampled at once
+    STRATEGY_BLOCK = 1024
+
+    def __init__(self, seed: int = None):
         self._test = 0
         self._reroutes = 10
         self._routing = RoutingModule()
         self._dnc = DNCAgent()
-        self._all_flows = {}
+        self._paths = self._routing.get_path_table()
+        self._edge_index = EdgeFlowIndex(self._paths)
+        self._all_flows = FlowTable(self._paths)
+        self._aggregates = AggregateTable(self._paths)
         self._last_flow_id = 1
         self._init_ksp = 1
         self._flow_reroutes = 0
         self._first_queue = 0
         self._reroute_strat = RerouteStrategy.SINGLE_FLOW
+        self._reroute_selection = RerouteSelection.OVERLAP
+        self._queue_search = QueueSearch.LINEAR
         self._strategy = LCDNStrategy.GREEDY
         self._is_greedy_mix = False
         self._greedy_p = 1.0
+        # Own random state, independent of the global NumPy state and of other instances in the process
+        self._rng = np.random.default_rng(seed)
+        self._greedy_draws = np.empty(0, dtype=bool)
+        self._next_draw = 0
+        self._reroute_workers = 0
+        self._reroute_pool = None
+        self._leases = TimerWheel()
+        self._lease_ttls = {}
+        self._rejections = None
+        self._timer = PhaseTimer()
+        self._time_budget = None
+        self._budget_end = None
+        self._budget_spent = False
+        self._budget_exhaustions = 0
+        # Flow id -> (path id, priority) of demoted flows before their first reroute
+        self._demotions: Dict[int, Tuple[int, int]] = {}
+        self._promotion = False
+        self._promotions = 0
 
     def set_reroute_strat(self, strategy: RerouteStrategy):
         self._reroute_strat = strategy
 
+    def set_reroute_selection(self, selection: RerouteSelection):
+        self._reroute_selection = selection
+
+    def set_queue_search(self, search: QueueSearch):
+        """ LINEAR (default) or BISECT. BISECT is not equivalent to LINEAR, see QueueSearch. """
+        self._queue_search = search
+
     def set_strategy(self, strategy: LCDNStrategy):
         self._strategy = strategy
         if self._strategy == LCDNStrategy.GREEDYMIX:
@@ -146,31 +387,352 @@ class FlowManager(object):
 
     def set_greedy_p(self, p: float):
         self._greedy_p = p
+        # Drop the decisions sampled with the old probability
+        self._next_draw = len(self._greedy_draws)
+
+    def set_seed(self, seed: int = None):
+        """ Reseeds the random state of the strategy decisions """
+        self._rng = np.random.default_rng(seed)
+        self._next_draw = len(self._greedy_draws)
+
+    def strategy_for_flow(self) -> LCDNStrategy:
+        """ Strategy of the next flow. GREEDYMIX samples GREEDY or NOTGREEDY with the greedy probability. """
+        if self._is_greedy_mix:
+            if self._next_draw == len(self._greedy_draws):
+                self._greedy_draws = self._rng.random(self.STRATEGY_BLOCK) < self._greedy_p
+                self._next_draw = 0
+            self._strategy = LCDNStrategy.GREEDY if self._greedy_draws[self._next_draw] else LCDNStrategy.NOTGREEDY
+            self._next_draw += 1
+        return self._strategy
 
     def set_init_ksp(self, ksp: int):
         self._init_ksp = ksp
 
+    def get_init_ksp(self) -> int:
+        return self._init_ksp
+
     def set_reroutes(self, reroutes: int):
         self._reroutes = reroutes
 
     def set_ksp_offset(self, offset: int):
         self._routing.set_ksp_offset(offset)
 
+    def set_routing_backend(self, backend: RoutingBackend, validate: bool = False):
+        """
+        NETWORKX or CSR. Both return paths of the same cost, but with cost ties they can pick different paths, so
+        embeddings are only the same on topologies without ties.
+        """
+        self._routing.set_backend(backend)
+        self._routing.set_validation(validate)
+
+    def set_incremental_trees(self, enabled: bool, max_trees: int = 256):
+        self._routing.set_incremental_trees(enabled, max_trees)
+
+    def set_cost_model(self, cost_model: LinkCostModel):
+        self._dnc.set_cost_model(cost_model)
+
     def set_first_queue(self, q_level: int):
         self._first_queue = q_level
-        
+
+    def set_negative_cache(self, enabled: bool, max_profiles: int = 8):
+        """
+        Reject requests that are known to fail without DNC checks. See NegativeAdmissionCache. The cache is only used
+        without rerouting (set_reroutes(0)): a reroute candidate added later can make room for a rejected request.
+        """
+        self._rejections = NegativeAdmissionCache(self._paths, max_profiles) if enabled else None
+
+    def get_negative_cache_statistics(self):
+        if self._rejections is None:
+            return {}
+        return self._rejections.get_statistics()
+
+    def set_time_budget(self, budget: float = None):
+        """
+        Time budget (seconds) of a single embedding. Once it is spent, no further paths, queues or reroute candidates
+        are tried and the best embedding found so far (or a rejection) is returned. None disables the budget.
+        """
+        self._time_budget = budget
+
+    def get_budget_exhaustions(self) -> int:
+        """ Number of embeddings that ran out of time budget """
+        return self._budget_exhaustions
+
+    def _start_budget(self) -> None:
+        self._budget_end = None if self._time_budget is None else time.perf_counter() + self._time_budget
+        self._budget_spent = False
+
+    def _out_of_time(self) -> bool:
+        if self._budget_end is None or time.perf_counter() < self._budget_end:
+            return False
+        if not self._budget_spent:
+            self._budget_spent = True
+            self._budget_exhaustions += 1
+            logger.info('Embedding ran out of its time budget of %s s', self._time_budget)
+        return True
+
+    def set_parallel_reroutes(self, workers: int):
+        """ Evaluate SINGLE_FLOW reroute candidates in a pool of ``workers`` processes. 0 or 1 disables the pool. """
+        self.close()
+        self._reroute_workers = workers
+
+    def close(self):
+        """ Shuts the reroute pool down. Parallel reroutes start a new pool when they need one. """
+        if self._reroute_pool is not None:
+            self._reroute_pool.close()
+            self._reroute_pool.join()
+            self._reroute_pool = None
+
+    def __getstate__(self):
+        # The reroute pool belongs to this process: copies and unpickled managers start their own
+        state = self.__dict__.copy()
+        state['_reroute_pool'] = None
+        return state
+
     def get_number_of_reroutes(self):
         return self._flow_reroutes
 
+    def set_promotion(self, enabled: bool):
+        """ Run a promotion pass (see _promote_flows) whenever flows are removed """
+        self._promotion = enabled
+
+    def get_number_of_promotions(self) -> int:
+        return self._promotions
+
+    def get_demoted_flows(self) -> Dict[int, Tuple[List[Tuple[int, int]], int]]:
+        """ Path and priority before the first reroute of every flow that was rerouted and not promoted back """
+        return {flow_id: (self._paths.get_path(path_id), priority) for flow_id, (path_id, priority) in self._demotions.items()}
+
+    def get_dnc_agent(self) -> DNCAgent:
+        return self._dnc
+
+    def get_path_table(self) -> PathTable:
+        return self._paths
+
+    def get_flow_table(self) -> FlowTable:
+        return self._all_flows
+
+    def get_aggregate_table(self) -> AggregateTable:
+        return self._aggregates
+
+    def _hop_curves(self, flow: FlowRequest, path_id: int, queue: int, network: List[Network]):
+        """ Hop curves of a flow, shared with the embedded flows of its aggregate """
+        key = AggregateTable.key(path_id, queue, flow.rate, flow.burst)
+        return self._aggregates.curves(key, [n.get_threshold() for n in network])
+
+    def get_phase_timer(self) -> PhaseTimer:
+        return self._timer
+
+    def _add_flow(self, embedded_flow: EmbeddedFlow) -> None:
+        self._all_flows.add(embedded_flow)
+        path_id = self._all_flows.get_path_id(embedded_flow.id)
+        self._paths.acquire(path_id)
+        self._edge_index.add(embedded_flow.id, path_id)
+        request = embedded_flow.flow_request
+        self._aggregates.add(embedded_flow.id, AggregateTable.key(path_id, embedded_flow.priority, request.rate, request.burst))
+
+    def _pop_flow(self, flow_id: int) -> EmbeddedFlow:
+        embedded_flow = self._all_flows.pop(flow_id)
+        self._edge_index.remove(flow_id, embedded_flow.path_id)
+        self._aggregates.remove(flow_id)
+        self._paths.release(embedded_flow.path_id)
+        self._drop_demotion(flow_id)
+        # The lease may have expired already
+        self._leases.cancel(flow_id)
+        self._lease_ttls.pop(flow_id, None)
+        return embedded_flow
+
+    def flows_on_edge(self, edge: Tuple[int, int]) -> Set[int]:
+        return self._edge_index.flows_on_edge(edge)
+
+    def move_flow(self, flow_id: int, path: List[Tuple[int, int]], priority: int) -> EmbeddedFlow:
+        """ Moves an embedded flow whose move was already applied to the networks (e.g. by the Rebalancer). """
+        # The new placement is deliberate, the flow is not promoted back
+        self._drop_demotion(flow_id)
+        self._move_flow(flow_id, path, priority)
+        return self._all_flows[flow_id]
+
+    def _move_flow(self, flow_id: int, path: List[Tuple[int, int]], priority: int) -> None:
+        path_id = self._paths.intern(path)
+        old_path_id = self._all_flows.get_path_id(flow_id)
+        self._paths.acquire(path_id)
+        self._edge_index.move(flow_id, old_path_id, path_id)
+        self._all_flows.set_route(flow_id, path_id, priority)
+        self._aggregates.move(flow_id, path_id, priority)
+        self._paths.release(old_path_id)
+        self._released(old_path_id)
+
+    def _set_demotion(self, flow_id: int, demotion: Tuple[int, int]) -> None:
+        """ Remembers the (path id, priority) a flow was demoted from. The path is kept in the path table. """
+        self._paths.acquire(demotion[0])
+        self._drop_demotion(flow_id)
+        self._demotions[flow_id] = demotion
+
+    def _drop_demotion(self, flow_id: int) -> None:
+        demotion = self._demotions.pop(flow_id, None)
+        if demotion is not None:
+            self._paths.release(demotion[0])
+
+    def _released(self, path_id: int) -> None:
+        """ Capacity was released on the path """
+        if self._rejections is not None:
+            self._rejections.release(path_id)
+
+    def _rejection_keys(self, flow: FlowRequest, network: List[Network],
+                        shortest_paths: List[List[Tuple[int, int]]]) -> List[Tuple]:
+        """
+        Negative cache keys of a routed request: the candidate paths, the source host and the destination host (with
+        the length of the shortest path, the burst of a flow grows with every hop). Hosts with more than one link have
+        no host key.
+        """
+        graph = network[0].get_network_graph()
+        self._rejections.validate((graph.graph.get('topology_version', 0), self._init_ksp, self._reroutes,
+                                   self._reroute_strat, self._reroute_selection, self._routing.get_ksp_offset()))
+        hops = len(shortest_paths[0])
+        path_ids = tuple(self._paths.intern(path) for path in shortest_paths[:max(self._init_ksp, 1)])
+
+        keys = [('paths', path_ids, self._strategy, self._first_queue)]
+        keys.append(('source', flow.sourceVM, hops, self._strategy, self._first_queue)
+                    if graph.out_degree(flow.sourceVM) == 1 else None)
+        keys.append(('destination', flow.destinationVM, hops, self._strategy, self._first_queue)
+                    if graph.in_degree(flow.destinationVM) == 1 else None)
+        return keys
+
+    def _reject(self, flow: FlowRequest, rejection_keys: List[Tuple], shortest_paths: List[List[Tuple[int, int]]],
+                bottleneck: Violation, network: List[Network]) -> Tuple[None, List[Network], None]:
+        """
+        Rejects the flow and remembers the rejection. A violation on the first (last) link of the shortest path is
+        stored for the source (destination) host and only depends on that link. Every other violation is stored for
+        the candidate paths.
+        """
+        if rejection_keys is None or bottleneck is None or self._budget_spent:
+            return None, network, None
+
+        host_links = {shortest_paths[0][0]: rejection_keys[1], shortest_paths[0][-1]: rejection_keys[2]}
+        if bottleneck.edge in host_links:
+            key = host_links[bottleneck.edge]
+            edges = 1 << self._paths.find_edge_id(bottleneck.edge)
+        else:
+            key = rejection_keys[0]
+            edges = 0
+            for path_id in key[1]:
+                edges |= self._paths.get_bitset(path_id)
+
+        if key is not None:
+            self._rejections.store(key, flow.rate, flow.burst, flow.deadline, edges)
+        return None, network, None
+
+    """ Leases. A flow with a lease is removed when the lease is not renewed within its ttl (seconds). """
+    def set_lease_wheel(self, tick: float, slots: int = 512, now: float = 0.0):
+        """ Resolution of the lease expiry. Existing leases are rescheduled. """
+        leases = {flow_id: self._leases.get_expiry(flow_id) for flow_id in self._lease_ttls}
+        self._leases = TimerWheel(tick, slots, now)
+        for flow_id, expires_at in leases.items():
+            if expires_at is not None:
+                self._leases.schedule(flow_id, expires_at)
+
+    def set_lease(self, flow_id: int, ttl: float, now: float) -> bool:
+        if flow_id not in self._all_flows:
+            logger.error('Lease: Flow with ID %s does not exist', flow_id)
+            return False
+        self._lease_ttls[flow_id] = ttl
+        self._leases.schedule(flow_id, now + ttl)
+        return True
+
+    def renew_lease(self, flow_id: int, now: float, ttl: float = None) -> bool:
+        """ Extends the lease of the flow by its ttl (or a new ``ttl``) from ``now``. """
+        if flow_id not in self._lease_ttls:
+            logger.error('Lease: Flow with ID %s has no lease', flow_id)
+            return False
+        return self.set_lease(flow_id, self._lease_ttls[flow_id] if ttl is None else ttl, now)
+
+    def get_lease_expiry(self, flow_id: int) -> Union[None, float]:
+        return self._leases.get_expiry(flow_id)
+
+    def expired_leases(self, now: float) -> List[int]:
+        """ Flows whose leases expired at ``now``. The flows are not removed. """
+        if len(self._leases) == 0:
+            return []
+        expired = self._leases.advance(now)
+        for flow_id in expired:
+            self._lease_ttls.pop(flow_id, None)
+        return expired
+
+    def reroute_candidates(self, path: List[Tuple[int, int]], violation: Violation = None,
+                           thresholds: List[float] = None) -> List[int]:
+        """
+        The (at most _reroutes) embedded flows to try for rerouting.
+
+        OVERLAP ranks the flows by the number of edges they share with the path. BOTTLENECK ranks the flows that cross
+        the violating (edge, priority) of the failed embedding first, by the relief moving them would give. The
+        remaining slots are filled by overlap.
+        """
+        path_id = self._paths.intern(path)
+
+        if self._reroute_selection != RerouteSelection.BOTTLENECK or violation is None or violation.priority < 0:
+            return self._edge_index.top_overlapping(path_id, self._reroutes)
+
+        relief = {}
+        for flow_id in self._edge_index.flows_on_edge(violation.edge):
+            priority = self._all_flows.get_priority(flow_id)
+            # GREEDY demotes the flow by one queue, which only relieves its own queue. NOTGREEDY moves it off the path.
+            if priority == violation.priority or \
+                    (self._strategy == LCDNStrategy.NOTGREEDY and priority < violation.priority):
+                relief[flow_id] = self._relief(flow_id, priority, violation, thresholds)
+
+        ranked = heapq.nsmallest(self._reroutes, relief.items(), key=lambda item: (-item[1], item[0]))
+        candidates = [flow_id for flow_id, _ in ranked]
+        logger.debug('Bottleneck candidates for %s: %s', violation, candidates)
+
+        if len(candidates) < self._reroutes:
+            for flow_id in self._edge_index.top_overlapping(path_id, self._reroutes + len(candidates)):
+                if flow_id not in relief:
+                    candidates.append(flow_id)
+                    if len(candidates) == self._reroutes:
+                        break
+
+        return candidates
+
+    def _relief(self, flow_id: int, priority: int, violation: Violation, thresholds: List[float]) -> float:
+        """ Share of the violating resource on the edge that belongs to the flow. """
+        rate, burst, _ = self._all_flows.get_profile(flow_id)
+        if violation.type == 'Rate':
+            return rate
+
+        # Delay and buffer grow with the burst of the flow at that hop (burst increases by rate * threshold per hop)
+        hop = self._paths.get_path(self._all_flows.get_path_id(flow_id)).index(violation.edge)
+        threshold = thresholds[priority] if thresholds else 0.0
+        return burst + rate * threshold * hop
+
     def get_all_flows(self):
+        columns = self._all_flows.columns(['id', 'priority', 'src', 'dst', 'path_id'])
+        order = np.argsort(columns['id'], kind='stable')
+        ids, priorities, srcs, dsts, path_ids = (columns[name][order].tolist() for name in ['id', 'priority', 'src', 'dst', 'path_id'])
+
         all_flows = []
-        for key, flow in self._all_flows.items():
-            all_flows.append({"id": flow.id, "embed_time": 0, "path": flow.path, "priority": flow.priority, "src": flow.flow_request.sourceVM, "dst": flow.flow_request.destinationVM})
+        for flow_id, priority, src, dst, path_id in zip(ids, priorities, srcs, dsts, path_ids):
+            all_flows.append(self._flow_information(flow_id, priority, src, dst, path_id))
         return all_flows
 
+    def get_flows(self, flow_ids: List[int]):
+        """ Same information as get_all_flows for the given (existing) flows """
+        flows = []
+        for flow_id in flow_ids:
+            embedded_flow = self._all_flows[flow_id]
+            flows.append(self._flow_information(flow_id, embedded_flow.priority, embedded_flow.flow_request.sourceVM,
+                                                embedded_flow.flow_request.destinationVM, embedded_flow.path_id))
+        return flows
+
+    def _flow_information(self, flow_id: int, priority: int, src: int, dst: int, path_id: int):
+        return {"id": flow_id, "embed_time": 0, "path": self._paths.get_path(path_id), "priority": priority, "src": src, "dst": dst}
+
+    def find_flows(self, src: int = None, dst: int = None, priority: int = None,
+                   switches: Tuple[int, int] = None) -> List[int]:
+        """ Ids of the flows from host src, to host dst, in queue priority and between the switches (first, last) """
+        return self._all_flows.find(src, dst, priority, switches)
+
     def get_delay_of_flow(self, flow_id: int, networks: List[Network]) -> float:
         if not flow_id in self._all_flows:
-            logger.error(f'Delay Request: Flow with ID {flow_id} does not exist')
+            logger.error('Delay Request: Flow with ID %s does not exist', flow_id)
             return 0.0
 
         path = self._all_flows[flow_id].path
@@ -189,22 +751,117 @@ class FlowManager(object):
 
         return flow_delay
 
-    def embed_new_flow(self, flow: FlowRequest, network: List[Network]) -> Tuple[Union[None, EmbeddedFlow], List[Network], List[EmbeddedFlow]]:
-        # Update with the current highest priority network
+    def route_batch(self, flows: List[FlowRequest], network: List[Network], processes: int = None,
+                    k: int = None) -> List[List[List[Tuple[int, int]]]]:
+        """
+        Candidate paths for a batch of flow requests on the current costs. See RoutingModule.route_batch. ``k`` paths
+        per flow (default: the initial ksp).
+        """
         self._routing.update_network(network[0].get_network_graph())
+        k = max(self._init_ksp, 1) if k is None else k
+        return self._routing.route_batch(flows, self._routing.get_ksp_offset() + k, processes)
+
+    def embed_flow_batch(self, flows: List[FlowRequest], network: List[Network], order: AdmissionOrder = AdmissionOrder.GIVEN,
+                         processes: int = None) -> Tuple[List[Union[None, EmbeddedFlow]], List[Network]]:
+        """
+        Admits many flows against one working copy of the networks.
+
+        The candidate paths of all flows are computed up front on the current costs. Every reservation only updates and
+        checks the edges on its path and is rolled back on a violation. The full network state (delays and costs) is
+        updated once at the end. There is no rerouting; flows that do not fit are rejected.
+
+        :return: The embedding (or None) of every flow in request order and the networks with all admitted flows
+        """
+        self._paths.collect()
+        working_network = copy.deepcopy(network)
+        self._dnc.check_and_update_network_state(working_network)
+
+        all_paths = self.route_batch(flows, working_network, processes)
+        thresholds = [n.get_threshold() for n in working_network]
+
+        if order == AdmissionOrder.DEADLINE:
+            admission_order = sorted(range(len(flows)), key=lambda i: flows[i].deadline)
+        elif order == AdmissionOrder.RATE:
+            admission_order = sorted(range(len(flows)), key=lambda i: flows[i].rate)
+        else:
+            admission_order = range(len(flows))
+
+        embeddings = [None for _ in flows]
+        for i in admission_order:
+            embeddings[i] = self._embed_on_working_network(flows[i], all_paths[i], working_network, thresholds)
+
+        self._dnc.check_and_update_network_state(working_network)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('Batch admission: %s of %s flows embedded', sum(e is not None for e in embeddings), len(flows))
+
+        return embeddings, working_network
+
+    def _embed_on_working_network(self, flow: FlowRequest, shortest_paths: List[List[Tuple[int, int]]],
+                                  network: List[Network], thresholds: List[float]) -> Union[None, EmbeddedFlow]:
+        if not shortest_paths:
+            logger.info('No Path exists between %s and %s!', flow.sourceVM, flow.destinationVM)
+            return None
+
+        strategy = self.strategy_for_flow()
+        for path_id, queue in self.placement_options(flow, shortest_paths[:self._init_ksp], thresholds, strategy):
+            placed = self.try_place(flow, path_id, queue, network)
+            if placed is not None:
+                return self.add_placed_flow(flow, placed[0], path_id, queue)
+
+        return None
+
+    def placement_options(self, flow: FlowRequest, shortest_paths: List[List[Tuple[int, int]]], thresholds: List[float],
+                          strategy: LCDNStrategy) -> List[Tuple[int, int]]:
+        """ The (path id, queue) pairs to try for a flow in order. Queues that cannot meet the deadline are left out. """
+        options = []
+        for path in shortest_paths:
+            path_id = self._paths.intern(path)
+            if strategy == LCDNStrategy.GREEDY:
+                queues = [self._first_queue]
+            else:
+                queues = [q for q in reversed(range(len(thresholds)))
+                          if self._dnc.deadline_bound(len(path), q, thresholds) <= flow.deadline]
+            options.extend((path_id, queue) for queue in queues)
+        return options
+
+    def try_place(self, flow: FlowRequest, path_id: int, queue: int, network: List[Network]):
+        """
+        What-if placement of a flow on a working network; the flow bookkeeping is not changed. See try_place_flow.
+        """
+        return try_place_flow(self._dnc, flow, self._paths.get_path(path_id), queue, network,
+                              self._hop_curves(flow, path_id, queue, network))
+
+    def add_placed_flow(self, flow: FlowRequest, reservation: ResourceReservation, path_id: int, queue: int) -> EmbeddedFlow:
+        """ Adds a flow that was placed with try_place to the embedded flows. """
+        embedded_flow = EmbeddedFlow(self._last_flow_id, flow, reservation, self._paths.get_path(path_id), queue, path_id)
+        self._add_flow(embedded_flow)
+        self._last_flow_id += 1
+        logger.info('Flow %s is now embedded', embedded_flow.id)
+        return embedded_flow
+
+    def embed_new_flow(self, flow: FlowRequest, network: List[Network], shortest_paths: List[List[Tuple[int, int]]] = None) -> Tuple[Union[None, EmbeddedFlow], List[Network], List[EmbeddedFlow]]:
+        """
+        Embeds a new flow. ``shortest_paths`` can hold candidate paths that were computed up front (route_batch);
+        otherwise the paths are computed on the current network state.
+        """
+        self._paths.collect()
+        self._start_budget()
 
         # If we use the mix strategy, we randomly sample which strat to use based on p_greedy
-        if self._is_greedy_mix:
-            strategy_for_flow = np.random.choice([LCDNStrategy.GREEDY, LCDNStrategy.NOTGREEDY], p=[self._greedy_p, 1 - self._greedy_p])
-            self._strategy = strategy_for_flow
+        self.strategy_for_flow()
 
         # Get Source and Destination Nodes
         source = flow.sourceVM
         destination = flow.destinationVM
-        logger.info(f'Flow Request from {source} to {destination} with {flow.rate} Bps, {flow.burst} Bits, {flow.deadline}s. Looking for path')
+        logger.info('Flow Request from %s to %s with %s Bps, %s Bits, %ss. Looking for path', source, destination, flow.rate, flow.burst, flow.deadline)
 
-        # Find the shortest path based on cost (1 + 1e6 * q_delay)
-        shortest_paths = self._routing.get_shortest_path(source, destination)
+        with self._timer.phase('routing'):
+            # Update with the current highest priority network
+            self._routing.update_network(network[0].get_network_graph())
+
+            # Find the shortest path based on cost (1 + 1e6 * q_delay). Only the first _init_ksp paths are ever used.
+            if shortest_paths is None:
+                shortest_paths = self._routing.get_shortest_path(source, destination, self._routing.get_ksp_offset() + max(self._init_ksp, 1))
 
 
         if shortest_paths is None:
@@ -215,291 +872,431 @@ class FlowManager(object):
             logger.info('No Path exists between Source and Destination!')
             return None, network, None
 
+        rejection_keys = None
+        # With rerouting a rejection is not certain: every new flow on the path is another reroute candidate
+        if self._rejections is not None and self._reroutes == 0:
+            rejection_keys = self._rejection_keys(flow, network, shortest_paths)
+            if self._rejections.lookup(rejection_keys, flow.rate, flow.burst, flow.deadline):
+                logger.info('Flow Request %s rejected by the negative admission cache', flow)
+                return None, network, None
+
         # Store Network State before Embedding
-        clean_network = copy.deepcopy(network)
+        with self._timer.phase('copy'):
+            clean_network = copy.deepcopy(network)
         found_path = False
         embed_result = None
+        # Violation of the last attempt on the shortest path. It drives the reroute candidate selection.
+        bottleneck = None
 
         # Embed on the first Queue on the shortest path when greedy:
         if self._strategy == LCDNStrategy.GREEDY:
             for i in range(min(len(shortest_paths), self._init_ksp)): 
+                if i > 0 and self._out_of_time():
+                    break
                 embed_result, network_with_new_flow = self.embed_flow_on_path(flow, shortest_paths[i], self._first_queue, network)
 
                 if type(embed_result) is Violation:
-                    logger.error(f'Flow could not be embedded on shortest path. Checking next shortest path (if any exist).')
+                    if i == 0:
+                        bottleneck = embed_result
+                    logger.debug('Flow could not be embedded on shortest path. Checking next shortest path (if any exist).')
                 else:
                     found_path = True
                     break
         # Embed on the shortest path in the lowest queue it still fits
         elif self._strategy == LCDNStrategy.NOTGREEDY:
-            queues = [i for i in range(len(network))]
-            queues.reverse()
+            thresholds = [n.get_threshold() for n in network]
             for i in range(min(len(shortest_paths), self._init_ksp)): 
-                # Go through all the qs from the back
-                for queue in queues:
-                    embed_result, network_with_new_flow = self.embed_flow_on_path(flow, shortest_paths[i], queue, network)
+                if i > 0 and self._out_of_time():
+                    break
+                embed_result, network_with_new_flow = self._embed_in_lowest_queue(flow, shortest_paths[i], network, thresholds)
 
-                    if type(embed_result) is Violation:
-                        logger.error(f'Flow could not be embedded on shortest path. Checking next shortest path (if any exist).')
-                    else:
-                        found_path = True
-                        break
+                if type(embed_result) is Violation:
+                    if i == 0:
+                        bottleneck = embed_result
+                    logger.debug('Flow could not be embedded on shortest path. Checking next shortest path (if any exist).')
+                else:
+                    found_path = True
+                    break
 
         if found_path:
             # Successful embedding, no rerouting required.
             return embed_result, network_with_new_flow, None
         else:
-            if self._reroutes == 0:
-                return None, clean_network, None    
-            # Rerouting required
-            # Reserve resources for the new flow again. Start with clean network again
-            # Rerouting for Greedy Embed Strategy:
-            reservation = ResourceReservation(burst=flow.burst,
-                                              rate=flow.rate,
-                                              deadline=flow.deadline,
-                                              path=shortest_paths[0])
-            reroute_network = copy.deepcopy(clean_network)
-            sorted_flows = self._routing.sorted_flow_list_by_edges(self._all_flows, shortest_paths[0])
-
-            if self._strategy == LCDNStrategy.GREEDY: 
-                if self._reroute_strat == RerouteStrategy.SINGLE_FLOW:
-                    logger.debug(f'--- Rerouting (Greedy, single flow) ---')
-                    # place new flow request into the network
-                    self._dnc.reserve_resources(reservation, reroute_network, 0)
-                    # Make Checkpoint Network with New Flow Reservation:
-                    reroute_with_flow_reservation = copy.deepcopy(reroute_network)
-
-                    # go through candidate flows and embed 1 Q lower. Rerouting only stays if 
-                    for i in range(min(len(sorted_flows), self._reroutes)):
-                        logger.debug(f'Reroute {i} with {sorted_flows[i]} of {len(sorted_flows)}')
-                        net_to_check_reroute = copy.deepcopy(reroute_with_flow_reservation)
-                        success, network_with_reroute = self.reroute_embedded_flow(sorted_flows[i], net_to_check_reroute)
-
-                        # If we found a valid embedding, we can return it
-                        if success:
-                            logger.info(f'Found valid reroute with Flow {sorted_flows[i]}')
-                            # Add new flow to List of all Flows
-                            logger.info(f'Flow {self._last_flow_id} is now embedded')
-                            new_flow_embedding = EmbeddedFlow(self._last_flow_id, flow, reservation, shortest_paths[0], 0)
-                            self._all_flows[self._last_flow_id] = new_flow_embedding
-                            self._last_flow_id += 1
-
-                            # Increase reroute Counter
-                            self._flow_reroutes += 1
-                            return new_flow_embedding, network_with_reroute, [self._all_flows[sorted_flows[i]]]
-
-                elif self._reroute_strat == RerouteStrategy.COMPOUND_FLOWS:
-                    # Instead of one by one rerouting, we compound the rerouting
-                    logger.debug(f'--- Rerouting (Greedy, coumpound flows) ---')
-                    compound_net = copy.deepcopy(reroute_network)
-                    # Reroute the Candidate Flow and check if it fits
-                    rerouted_flows = []
-                    for i in range(min(len(sorted_flows), self._reroutes)):
-                        logger.debug(f'Reroute {i} with {sorted_flows[i]} of {len(sorted_flows)}')
-                        success, compound_net = self.reroute_embedded_flow(sorted_flows[i], compound_net)
-
-                        if success:
-                            logger.debug(f'Flow {sorted_flows[i]} is rerouted, Checking if the flow fits')
-                            rerouted_flows.append(self._all_flows[sorted_flows[i]])
-                            self._flow_reroutes += 1
-                            result, compound_net = self.embed_flow_on_path(flow, shortest_paths[0], 0, compound_net)
-                            
-                            if type(result) is Violation:
-                                logger.debug(f'New Flow could not be embedded yet.')
-                            else: 
-                                # Flow Embeddign for new Flow worked
-                                logger.info(f'Flow {self._last_flow_id} is now embedded')
-                                return result, compound_net, rerouted_flows
-
-                        else:
-                            logger.debug(f'Flow {sorted_flows[i]} could not be rerouted.')
-
-
-            elif self._strategy == LCDNStrategy.NOTGREEDY:
-                if self._reroute_strat == RerouteStrategy.SINGLE_FLOW:
-                    logger.debug(f'--- Rerouting (Not Greedy, single flow) ---')
-
-                    self._dnc.reserve_resources(reservation, reroute_network, 0)
-                    reroute_with_flow_reservation = copy.deepcopy(reroute_network)
-
-                    # go through candidate flows and embed 1 Q lower. Rerouting only stays if 
-                    for i in range(min(len(sorted_flows), self._reroutes)):
-                        logger.debug(f'Reroute {i} with {sorted_flows[i]} of {len(sorted_flows)}')
-                        success, reroute_with_flow_reservation = self.reroute_embedded_flow(sorted_flows[i], reroute_with_flow_reservation)
-
-                        # If we found a valid embedding, we can return it
-                        if success:
-                            logger.info(f'Found valid reroute with Flow {sorted_flows[i]}')
-                            # Add new flow to List of all Flows
-                            logger.info(f'Flow {self._last_flow_id} is now embedded')
-                            new_flow_embedding = EmbeddedFlow(self._last_flow_id, flow, reservation, shortest_paths[0], 0)
-                            self._all_flows[self._last_flow_id] = new_flow_embedding
-                            self._last_flow_id += 1
-
-                            # Increase reroute Counter
-                            self._flow_reroutes += 1
-                            return new_flow_embedding, reroute_with_flow_reservation, [self._all_flows[sorted_flows[i]]]
-
-                elif self._reroute_strat == RerouteStrategy.COMPOUND_FLOWS:
-                    # Instead of one by one rerouting, we compound the rerouting
-                    logger.debug(f'--- Rerouting (Not Greedy, coumpound flows) ---')
-                    compound_net = copy.deepcopy(reroute_network)
-                    # Reroute the Candidate Flow and check if it fits
-                    rerouted_flows = []
-                    for i in range(min(len(sorted_flows), self._reroutes)):
-                        logger.debug(f'Reroute {i} with {sorted_flows[i]} of {len(sorted_flows)}')
-                        success, compound_net = self.reroute_embedded_flow(sorted_flows[i], compound_net)
-
-                        if success:
-                            logger.debug(f'Flow {sorted_flows[i]} is rerouted, Checking if the flow fits')
-                            rerouted_flows.append(self._all_flows[sorted_flows[i]])
-                            self._flow_reroutes += 1
-                            result, compound_net = self.embed_flow_on_path(flow, shortest_paths[0], 0, compound_net)
-                            
-                            if type(result) is Violation:
-                                logger.debug(f'New Flow could not be embedded yet.')
-                            else: 
-                                # Flow Embeddign for new Flow worked
-                                logger.info(f'Flow {self._last_flow_id} is now embedded')
-                                return result, compound_net, rerouted_flows
-
-                        else:
-                            logger.debug(f'Flow {sorted_flows[i]} could not be rerouted.')
-
-            #  reroute_network = copy.deepcopy(clean_network)
-          #  reservation = ResourceReservation(burst=flow.burst,
-          #                                    rate=flow.rate,
-          #                                    deadline=flow.deadline,
-          #                                    path=shortest_paths[0])
-          #  self._dnc.reserve_resources(reservation, reroute_network, self._first_queue)
-
-          #  # Get a List of Flows sorted by most common edges for first kSP
-          #  all_flow_paths = {}
-          #  for flow_id, flow_e in self._all_flows.items():
-          #      all_flow_paths[flow_id] = flow_e.path
-
-          #  sorted_flows = self._routing.sorted_flow_list_by_edges(all_flow_paths, shortest_paths[0])
-
-          #  rerouted_flows = []
-          #  for i in range(min(len(sorted_flows), self._reroutes)):
-          #      logger.info(f'Trying Reroute {i} with Flow {sorted_flows[i]}.')
-          #      reroute_result = self.reroute_embedded_flow(sorted_flows[i], reroute_networks)
-
-          #      if reroute_result is not None:
-          #          result_net, rerouted_flow = reroute_result
-          #          reroute_networks = result_net
-          #          # Found a working reroute. We can return the network and flow
-          #          logger.info(f'Found a working reroute for Flow {sorted_flows[i]}')
-          #          flow_emb = EmbeddedFlow(self._last_flow_id, flow, reservation, shortest_path[0], 0)
-          #          self._all_flows[self._last_flow_id] = flow_emb
-          #          self._last_flow_id += 1
-          #          logger.info(f'Flow {flow_emb.id} is now embedded.')
-          #          self._flow_reroutes += 1
-          #          return flow_emb, reroute_networks, 
-
-           # # Reroute on First Flow SP did not work. We can try on the next SP  
-           # if self._reroute_strat == RerouteStrategy.INITFLOW_NSP_QCHANGES or self._reroute_strat == RerouteStrategy.INITFLOW_QCHANGE_NEXTFLOW:
-           #     if len(shortest_path) < 2:
-           #         return None, network
-           #     reroute_networks = copy.deepcopy(network)
-           #     reservation = ResourceReservation(burst=flow.burst,
-           #                                       rate=flow.rate,
-           #                                       deadline=flow.deadline,
-           #                                       path=shortest_path[1])
-           #     self._dnc.reserve_resources(reservation, reroute_networks, self._first_queue)
-
-           #     # Get a List of Flows sorted by most common edges for first kSP
-           #     all_flow_paths = {}
-           #     for flow_id, flow_e in self._all_flows.items():
-           #         all_flow_paths[flow_id] = flow_e.path
-
-           #     sorted_flows = self._routing.sorted_flow_list_by_edges(all_flow_paths, shortest_path[1])
-           #     for i in range(min(len(sorted_flows), self._reroutes)):
-           #         logger.info(f'Trying Reroute {i} with Flow {sorted_flows[i]}.')
-           #         result_net = self.reroute_embedded_flow(sorted_flows[i], reroute_networks)
-
-           #         if result_net is not None:
-           #             reroute_networks = result_net
-           #             # Found a working reroute. We can return the network and flow
-           #             logger.info(f'Found a working reroute for Flow {sorted_flows[i]}')
-           #             flow_emb = EmbeddedFlow(self._last_flow_id, flow, reservation, shortest_path[0], 0)
-           #             self._all_flows[self._last_flow_id] = flow_emb
-           #             self._last_flow_id += 1
-           #             logger.info(f'Flow {flow_emb.id} is now embedded.')
-           #             return flow_emb, reroute_networks
-
-
-            return None, clean_network, None
+            if self._reroutes == 0 or self._out_of_time():
+                return self._reject(flow, rejection_keys, shortest_paths, bottleneck, clean_network)
+            with self._timer.phase('reroute'):
+                return self._embed_with_reroutes(flow, shortest_paths, clean_network, bottleneck, rejection_keys)
+
+    def _embed_with_reroutes(self, flow: FlowRequest, shortest_paths: List[List[Tuple[int, int]]], clean_network: List[Network],
+                             bottleneck: Violation, rejection_keys: List[Tuple]) -> Tuple[Union[None, EmbeddedFlow], List[Network], List[EmbeddedFlow]]:
+        """ Embeds the flow on its shortest path after making room by rerouting embedded flows (reroute strategy). """
+        # Rerouting required
+        # Reserve resources for the new flow again. Start with clean network again
+        # Rerouting for Greedy Embed Strategy:
+        reservation = ResourceReservation(burst=flow.burst,
+                                          rate=flow.rate,
+                                          deadline=flow.deadline,
+                                          path=shortest_paths[0])
+        reroute_network = copy.deepcopy(clean_network)
+        sorted_flows = self.reroute_candidates(shortest_paths[0], bottleneck, [n.get_threshold() for n in clean_network])
+
+        if self._strategy == LCDNStrategy.GREEDY: 
+            if self._reroute_strat == RerouteStrategy.SINGLE_FLOW:
+                logger.debug('--- Rerouting (Greedy, single flow) ---')
+                # place new flow request into the network. If it does not fit on its own, no reroute can help.
+                if self._dnc.reserve_resources(reservation, reroute_network, 0):
+                    return self._reject(flow, rejection_keys, shortest_paths, bottleneck, clean_network)
+                # Make Checkpoint Network with New Flow Reservation:
+                reroute_with_flow_reservation = copy.deepcopy(reroute_network)
+
+                # go through candidate flows and embed 1 Q lower. The first candidate that makes room is kept.
+                rerouted = self._reroute_single_flow(sorted_flows, reroute_with_flow_reservation)
+                if rerouted is not None:
+                    rerouted_flow, network_with_reroute = rerouted
+                    logger.info('Found valid reroute with Flow %s', rerouted_flow.id)
+                    # Add new flow to List of all Flows
+                    logger.info('Flow %s is now embedded', self._last_flow_id)
+                    new_flow_embedding = EmbeddedFlow(self._last_flow_id, flow, reservation, shortest_paths[0], 0, self._paths.intern(shortest_paths[0]))
+                    self._add_flow(new_flow_embedding)
+                    self._last_flow_id += 1
+                    return new_flow_embedding, network_with_reroute, [rerouted_flow]
+
+            elif self._reroute_strat == RerouteStrategy.COMPOUND_FLOWS:
+                # Instead of one by one rerouting, we compound the rerouting
+                logger.debug('--- Rerouting (Greedy, coumpound flows) ---')
+                compound_net = copy.deepcopy(reroute_network)
+                # Reroute the Candidate Flow and check if it fits
+                # Reroutes are only committed once the new flow fits
+                moves = []
+                for i in range(min(len(sorted_flows), self._reroutes)):
+                    if i > 0 and self._out_of_time():
+                        break
+                    logger.debug('Reroute %s with %s of %s', i, sorted_flows[i], len(sorted_flows))
+                    rerouted = self._evaluate_reroute(sorted_flows[i], compound_net)
+
+                    if rerouted is not None:
+                        logger.debug('Flow %s is rerouted, Checking if the flow fits', sorted_flows[i])
+                        path, priority, compound_net = rerouted
+                        moves.append((sorted_flows[i], path, priority))
+                        result, compound_net = self.embed_flow_on_path(flow, shortest_paths[0], 0, compound_net)
+                        
+                        if type(result) is Violation:
+                            logger.debug('New Flow could not be embedded yet.')
+                        else: 
+                            # Flow Embeddign for new Flow worked
+                            logger.info('Flow %s is now embedded', self._last_flow_id)
+                            return result, compound_net, self._commit_reroutes(moves)
+
+                    else:
+                        logger.debug('Flow %s could not be rerouted.', sorted_flows[i])
+
+
+        elif self._strategy == LCDNStrategy.NOTGREEDY:
+            if self._reroute_strat == RerouteStrategy.SINGLE_FLOW:
+                logger.debug('--- Rerouting (Not Greedy, single flow) ---')
+
+                if self._dnc.reserve_resources(reservation, reroute_network, 0):
+                    return self._reject(flow, rejection_keys, shortest_paths, bottleneck, clean_network)
+                reroute_with_flow_reservation = copy.deepcopy(reroute_network)
+
+                # go through candidate flows and move them to another path. The first candidate that makes room is kept.
+                rerouted = self._reroute_single_flow(sorted_flows, reroute_with_flow_reservation)
+                if rerouted is not None:
+                    rerouted_flow, network_with_reroute = rerouted
+                    logger.info('Found valid reroute with Flow %s', rerouted_flow.id)
+                    # Add new flow to List of all Flows
+                    logger.info('Flow %s is now embedded', self._last_flow_id)
+                    new_flow_embedding = EmbeddedFlow(self._last_flow_id, flow, reservation, shortest_paths[0], 0, self._paths.intern(shortest_paths[0]))
+                    self._add_flow(new_flow_embedding)
+                    self._last_flow_id += 1
+                    return new_flow_embedding, network_with_reroute, [rerouted_flow]
+
+            elif self._reroute_strat == RerouteStrategy.COMPOUND_FLOWS:
+                # Instead of one by one rerouting, we compound the rerouting
+                logger.debug('--- Rerouting (Not Greedy, coumpound flows) ---')
+                compound_net = copy.deepcopy(reroute_network)
+                # Reroute the Candidate Flow and check if it fits
+                # Reroutes are only committed once the new flow fits
+                moves = []
+                for i in range(min(len(sorted_flows), self._reroutes)):
+                    if i > 0 and self._out_of_time():
+                        break
+                    logger.debug('Reroute %s with %s of %s', i, sorted_flows[i], len(sorted_flows))
+                    rerouted = self._evaluate_reroute(sorted_flows[i], compound_net)
+
+                    if rerouted is not None:
+                        logger.debug('Flow %s is rerouted, Checking if the flow fits', sorted_flows[i])
+                        path, priority, compound_net = rerouted
+                        moves.append((sorted_flows[i], path, priority))
+                        result, compound_net = self.embed_flow_on_path(flow, shortest_paths[0], 0, compound_net)
+                        
+                        if type(result) is Violation:
+                            logger.debug('New Flow could not be embedded yet.')
+                        else: 
+                            # Flow Embeddign for new Flow worked
+                            logger.info('Flow %s is now embedded', self._last_flow_id)
+                            return result, compound_net, self._commit_reroutes(moves)
+
+                    else:
+                        logger.debug('Flow %s could not be rerouted.', sorted_flows[i])
+
+        #  reroute_network = copy.deepcopy(clean_network)
+      #  reservation = ResourceReservation(burst=flow.burst,
+      #                                    rate=flow.rate,
+      #                                    deadline=flow.deadline,
+      #                                    path=shortest_paths[0])
+      #  self._dnc.reserve_resources(reservation, reroute_network, self._first_queue)
+
+      #  # Get a List of Flows sorted by most common edges for first kSP
+      #  all_flow_paths = {}
+      #  for flow_id, flow_e in self._all_flows.items():
+      #      all_flow_paths[flow_id] = flow_e.path
+
+      #  sorted_flows = self._routing.sorted_flow_list_by_edges(all_flow_paths, shortest_paths[0])
+
+      #  rerouted_flows = []
+      #  for i in range(min(len(sorted_flows), self._reroutes)):
+      #      logger.info(f'Trying Reroute {i} with Flow {sorted_flows[i]}.')
+      #      reroute_result = self.reroute_embedded_flow(sorted_flows[i], reroute_networks)
+
+      #      if reroute_result is not None:
+      #          result_net, rerouted_flow = reroute_result
+      #          reroute_networks = result_net
+      #          # Found a working reroute. We can return the network and flow
+      #          logger.info(f'Found a working reroute for Flow {sorted_flows[i]}')
+      #          flow_emb = EmbeddedFlow(self._last_flow_id, flow, reservation, shortest_path[0], 0)
+      #          self._all_flows[self._last_flow_id] = flow_emb
+      #          self._last_flow_id += 1
+      #          logger.info(f'Flow {flow_emb.id} is now embedded.')
+      #          self._flow_reroutes += 1
+      #          return flow_emb, reroute_networks, 
+
+       # # Reroute on First Flow SP did not work. We can try on the next SP  
+       # if self._reroute_strat == RerouteStrategy.INITFLOW_NSP_QCHANGES or self._reroute_strat == RerouteStrategy.INITFLOW_QCHANGE_NEXTFLOW:
+       #     if len(shortest_path) < 2:
+       #         return None, network
+       #     reroute_networks = copy.deepcopy(network)
+       #     reservation = ResourceReservation(burst=flow.burst,
+       #                                       rate=flow.rate,
+       #                                       deadline=flow.deadline,
+       #                                       path=shortest_path[1])
+       #     self._dnc.reserve_resources(reservation, reroute_networks, self._first_queue)
+
+       #     # Get a List of Flows sorted by most common edges for first kSP
+       #     all_flow_paths = {}
+       #     for flow_id, flow_e in self._all_flows.items():
+       #         all_flow_paths[flow_id] = flow_e.path
+
+       #     sorted_flows = self._routing.sorted_flow_list_by_edges(all_flow_paths, shortest_path[1])
+       #     for i in range(min(len(sorted_flows), self._reroutes)):
+       #         logger.info(f'Trying Reroute {i} with Flow {sorted_flows[i]}.')
+       #         result_net = self.reroute_embedded_flow(sorted_flows[i], reroute_networks)
+
+       #         if result_net is not None:
+       #             reroute_networks = result_net
+       #             # Found a working reroute. We can return the network and flow
+       #             logger.info(f'Found a working reroute for Flow {sorted_flows[i]}')
+       #             flow_emb = EmbeddedFlow(self._last_flow_id, flow, reservation, shortest_path[0], 0)
+       #             self._all_flows[self._last_flow_id] = flow_emb
+       #             self._last_flow_id += 1
+       #             logger.info(f'Flow {flow_emb.id} is now embedded.')
+       #             return flow_emb, reroute_networks
+
+
+        return self._reject(flow, rejection_keys, shortest_paths, bottleneck, clean_network)
+
+    def _embed_in_lowest_queue(self, flow: FlowRequest, path: List[Tuple[int, int]], network: List[Network],
+                               thresholds: List[float]) -> Tuple[Union[Violation, EmbeddedFlow], List[Network]]:
+        """
+        Embeds the flow on the path in the lowest priority queue it still fits (NOTGREEDY). Queues whose thresholds
+        alone exceed the deadline of the flow on this path are skipped without a DNC check.
+
+        LINEAR checks the remaining queues from the back. BISECT assumes that a flow that fits a queue also fits all
+        higher priority queues and bisects for the lowest priority one, which needs log2(queues) checks. That does not
+        hold in general (see QueueSearch), so BISECT is a heuristic that can pick another queue than LINEAR.
+        """
+        violation = None
+        queues = []
+        for queue in range(len(network)):
+            delay = self._dnc.deadline_bound(len(path), queue, thresholds)
+            if delay > flow.deadline:
+                # Same violation reserve_resources would report
+                violation = Violation('Flow Deadline', (0, 0), flow.deadline, delay, queue)
+            else:
+                queues.append(queue)
+
+        if self._queue_search != QueueSearch.BISECT:
+            # Go through all the qs from the back
+            for n, queue in enumerate(reversed(queues)):
+                if n > 0 and self._out_of_time():
+                    break
+                embed_result, network_with_new_flow = self.embed_flow_on_path(flow, path, queue, network)
+                if type(embed_result) is not Violation:
+                    return embed_result, network_with_new_flow
+                violation = embed_result
+            return violation, network
+
+        best = None
+        lo, hi = 0, len(queues) - 1
+        while lo <= hi:
+            # Out of time after the first check: keep the lowest priority queue found so far
+            if (lo, hi) != (0, len(queues) - 1) and self._out_of_time():
+                break
+            mid = (lo + hi) // 2
+            embed_result, network_with_new_flow = self.embed_flow_on_path(flow, path, queues[mid], network, True)
+            if type(embed_result) is Violation:
+                violation = embed_result
+                hi = mid - 1
+            else:
+                best = embed_result, network_with_new_flow
+                lo = mid + 1
+
+        if best is None:
+            return violation, network
+
+        self._add_flow(best[0])
+        self._last_flow_id += 1
+        return best
 
     def reroute_embedded_flow(self, flow_to_reroute: int, networks: List[Network]) -> Tuple[bool, List[Network]]:
         """
-        The Rerouting tries to first move the flow a priority down. If unsuccessful it tries another simple shortest
-        path and all
+        The Rerouting tries to first move the flow a priority down (GREEDY) or to the next shortest path (NOTGREEDY).
 
         :param flow_to_reroute: Which Flow ID
         :param networks: List of Networks to keep track of resources
-        :return:
+        :return: Whether the flow was moved and the networks with the moved flow
         """
-        working_network = copy.deepcopy(networks) 
-        flow_path = self._all_flows[flow_to_reroute].path
-        flow_prio = self._all_flows[flow_to_reroute].priority
+        rerouted = self._evaluate_reroute(flow_to_reroute, networks)
+        if rerouted is None:
+            return False, networks
 
-        # Remove the reservation from the reroute candidate
-        self._dnc.remove_resources(self._all_flows[flow_to_reroute].flow_reservation,
-                                   working_network,
-                                   self._all_flows[flow_to_reroute].priority)
-        
-        if self._strategy == LCDNStrategy.GREEDY:
-            # The flow we are trying to reroute is removed from the network. try to embed in a lower prioriy 
-            for new_prio in range(flow_prio + 1, 4):
-                result, working_network = self.embed_flow_on_path(self._all_flows[flow_to_reroute].flow_request, 
-                                                                  flow_path, new_prio, working_network, True)
-                
-                # Violation means either current reroute does not work or new flow wont fit.
-                if type(result) is Violation:
-                    logger.error(f'Rerouting did not work on Flow {flow_to_reroute} to prio {new_prio}')
-                else:
-                    # Reroute was successful; Both flows are embedded now.
-                    logger.info(f'Rerouting worked for flow {flow_to_reroute} to Q {new_prio}')
-                    self._all_flows[flow_to_reroute].priority = new_prio
-                    return True, working_network
-        
-        elif self._strategy == LCDNStrategy.NOTGREEDY:
-            # Select the next shortest path:
-            flow_src = self._all_flows[flow_to_reroute].flow_request.sourceVM
-            flow_dst = self._all_flows[flow_to_reroute].flow_request.destinationVM
-            shortest_paths = self._routing.get_shortest_path(flow_src, flow_dst)
-            sp = None
-            for path in shortest_paths:
-                if path != flow_path:
-                    sp = path
+        path, priority, working_network = rerouted
+        self._commit_reroutes([(flow_to_reroute, path, priority)])
+        return True, working_network
+
+    def alternative_paths(self, embedded_flow: EmbeddedFlow, network: List[Network], k: int) -> List[List[Tuple[int, int]]]:
+        """ Up to k shortest paths of the flow on the network, other than its current path. """
+        self._routing.update_network(network[0].get_network_graph())
+        flow_request = embedded_flow.flow_request
+        shortest_paths = self._routing.get_shortest_path(flow_request.sourceVM, flow_request.destinationVM,
+                                                         self._routing.get_ksp_offset() + k + 1)
+        return [path for path in shortest_paths or [] if self._paths.intern(path) != embedded_flow.path_id][:k]
+
+    def _alternative_path(self, embedded_flow: EmbeddedFlow) -> Union[None, List[Tuple[int, int]]]:
+        """ The shortest path of the flow that differs from its current path (NOTGREEDY rerouting). """
+        flow_src = embedded_flow.flow_request.sourceVM
+        flow_dst = embedded_flow.flow_request.destinationVM
+        # Paths are distinct, so one of the first two differs from the current path
+        shortest_paths = self._routing.get_shortest_path(flow_src, flow_dst, self._routing.get_ksp_offset() + 2)
+        for path in shortest_paths or []:
+            if self._paths.intern(path) != embedded_flow.path_id:
+                return path
+
+        logger.debug('No other SP found for %s', embedded_flow.id)
+        return None
+
+    def _evaluate_reroute(self, flow_to_reroute: int,
+                          networks: List[Network]) -> Union[None, Tuple[List[Tuple[int, int]], int, List[Network]]]:
+        """ What-if reroute of an embedded flow on the networks. The flow itself is not changed. See try_reroute. """
+        embedded_flow = self._all_flows[flow_to_reroute]
+        alternative_path = None
+        if self._strategy == LCDNStrategy.NOTGREEDY:
+            alternative_path = self._alternative_path(embedded_flow)
+            if alternative_path is None:
+                return None
+
+        with self._timer.phase('evaluate'):
+            return try_reroute(self._dnc, self._strategy, embedded_flow, networks, alternative_path)
+
+    def _commit_reroutes(self, moves: List[Tuple[int, List[Tuple[int, int]], int]]) -> List[EmbeddedFlow]:
+        """ Applies evaluated reroutes (flow id, path, priority) to the flows and returns the moved flows. """
+        with self._timer.phase('commit'):
+            for flow_id, path, priority in moves:
+                if flow_id not in self._demotions:
+                    self._set_demotion(flow_id, (self._all_flows.get_path_id(flow_id), self._all_flows.get_priority(flow_id)))
+                self._move_flow(flow_id, path, priority)
+        self._flow_reroutes += len(moves)
+        return [self._all_flows[flow_id] for flow_id, _, _ in moves]
+
+    def _reroute_single_flow(self, candidates: List[int],
+                             networks: List[Network]) -> Union[None, Tuple[EmbeddedFlow, List[Network]]]:
+        """
+        Reroutes the first candidate (in candidate order) whose reroute makes room for the new flow that is already
+        reserved on ``networks``. All candidates are evaluated on the same networks, so with parallel reroutes they are
+        evaluated concurrently and the best ranked success is committed. The result is the same as sequentially.
+        """
+        candidates = candidates[:self._reroutes]
+
+        if self._reroute_workers > 1 and len(candidates) > 1:
+            found = self._evaluate_reroutes_parallel(candidates, networks)
+        else:
+            found = None
+            for i, flow_id in enumerate(candidates):
+                if i > 0 and self._out_of_time():
+                    break
+                logger.debug('Reroute %s with %s of %s', i, flow_id, len(candidates))
+                rerouted = self._evaluate_reroute(flow_id, networks)
+                if rerouted is not None:
+                    found = flow_id, rerouted
                     break
 
-            if sp == None: # No alternative was found
-                logger.debug(f'No other SP found for {flow_to_reroute}')
-                return False, networks
-            
-            # Try the lowest Queue first
-            queues = [i for i in range(len(networks))]
-            queues.reverse()
-            
-            for q in queues:
-                result, working_network = self.embed_flow_on_path(self._all_flows[flow_to_reroute].flow_request, 
-                                                                  sp, q, working_network, True)
-                if type(result) is Violation:
-                    logger.error(f'Rerouting did not work on Flow {flow_to_reroute} to prio {q}, path {sp}')
-                else:
-                    # Reroute was successful; Both flows are embedded now.
-                    logger.info(f'Rerouting worked for flow {flow_to_reroute} to Q {q}, path {sp}')
-                    self._all_flows[flow_to_reroute].priority = q
-                    self._all_flows[flow_to_reroute].path = sp  
-                    return True, working_network
-                
+        if found is None:
+            return None
 
-        return False, networks
+        flow_id, (path, priority, rerouted_networks) = found
+        return self._commit_reroutes([(flow_id, path, priority)])[0], rerouted_networks
+
+    def _evaluate_reroutes_parallel(self, candidates: List[int], networks: List[Network]):
+        """
+        Evaluates the candidates on the reroute pool and returns the best ranked success. With a time budget the
+        candidates go to the pool in batches of one candidate per worker and the budget is checked before each batch.
+        """
+        batch = len(candidates) if self._budget_end is None else self._reroute_workers
+        for start in range(0, len(candidates), batch):
+            if self._out_of_time():
+                return None
+            found = self._evaluate_reroute_batch(candidates, range(start, min(start + batch, len(candidates))), networks)
+            if found is not None:
+                return found
+        return None
+
+    def _evaluate_reroute_batch(self, candidates: List[int], ranks: range, networks: List[Network]):
+        # Alternative paths need the routing state of this process
+        tasks = []
+        for rank in ranks:
+            embedded_flow = self._all_flows[candidates[rank]]
+            alternative_path = None
+            if self._strategy == LCDNStrategy.NOTGREEDY:
+                alternative_path = self._alternative_path(embedded_flow)
+                if alternative_path is None:
+                    continue
+            tasks.append((rank, embedded_flow, alternative_path))
+
+        if not tasks:
+            return None
+
+        # Round robin chunks: every worker starts with one of the best ranked candidates and gets the snapshot once
+        workers = min(self._reroute_workers, len(tasks))
+        chunks = [(self._dnc, self._strategy, networks, tasks[w::workers]) for w in range(workers)]
+        with self._timer.phase('evaluate'):
+            results = [result for result in self._get_reroute_pool().map(_reroute_worker, chunks, 1) if result is not None]
+        if not results:
+            return None
+
+        rank, rerouted = min(results, key=lambda result: result[0])
+        logger.debug('Parallel reroute: %s of %s workers found a reroute, best rank %s', len(results), workers, rank)
+        return candidates[rank], rerouted
+
+    def _get_reroute_pool(self):
+        if self._reroute_pool is None:
+            self._reroute_pool = mp.Pool(self._reroute_workers)
+        return self._reroute_pool
 
     def embed_flow_on_path(self, flow: FlowRequest, path: List[Tuple[int, int]], q_level: int, networks: List[Network], reroute: bool = False) -> Tuple[Union[Violation, EmbeddedFlow], List[Network]]:
-        current_networks = copy.deepcopy(networks)
+        with self._timer.phase('copy'):
+            current_networks = copy.deepcopy(networks)
+        path_id = self._paths.intern(path)
+        path = self._paths.get_path(path_id)
 
         # Create Reservation
         reservation = ResourceReservation(burst=flow.burst,
@@ -508,13 +1305,27 @@ class FlowManager(object):
                                           path=path)
 
         # Reserve the Resource (burst increase etc...), check if flw fits thresholds...
-        violation = self._dnc.reserve_resources(reservation, current_networks, q_level)
+        key = AggregateTable.key(path_id, q_level, flow.rate, flow.burst)
+        curves = self._hop_curves(flow, path_id, q_level, current_networks)
+        with self._timer.phase('reserve'):
+            if self._aggregates.count(key):
+                # The flow joins an aggregate on this path: one more time its curves. Only the deadline depends on the
+                # flow, the rates are checked on the sums below.
+                delay = self._dnc.deadline_bound(len(path), q_level, [n.get_threshold() for n in current_networks])
+                if delay > flow.deadline:
+                    # Same violation reserve_curves would report
+                    return Violation('Flow Deadline', (0, 0), flow.deadline, delay, q_level), networks
+                self._dnc.add_curves(curves, current_networks, 1)
+                violation = None
+            else:
+                violation = self._dnc.reserve_curves(curves, flow.deadline, current_networks, q_level)
         if violation:
             # Flow could not fit in the best path. Based on Deadline
             return violation, networks
 
-        # Check whole Network
-        violation = self._dnc.check_and_update_network_state(current_networks)
+        # Only the edges of the path changed
+        with self._timer.phase('update'):
+            violation = self._dnc.update_edges_state(current_networks, path)
 
         if violation:
             return violation, networks
@@ -524,22 +1335,204 @@ class FlowManager(object):
                                 flow_request=flow,
                                 flow_reservation=reservation,
                                 path=path,
-                                priority=q_level)
+                                priority=q_level,
+                                path_id=path_id)
 
         if not reroute:
-            self._all_flows[new_flow.id] = new_flow
+            self._add_flow(new_flow)
             self._last_flow_id += 1
 
         return new_flow, current_networks
 
-    def remove_flow(self, flow_id: int, networks: List[Network]) -> List[Network]:
+    def modify_flow(self, flow_id: int, networks: List[Network], rate: float = None, burst: float = None,
+                    deadline: float = None) -> Tuple[Union[None, EmbeddedFlow], List[Network], List[EmbeddedFlow]]:
+        """
+        Changes the traffic profile of an embedded flow. The new profile is first reserved in place of the old one on
+        the current path and priority, and only the edges of the path are updated and checked. If it does not fit
+        there, the flow is embedded again with the new profile (same id, rerouting as for new flows).
+
+        :return: The modified flow (None if the new profile does not fit; the flow is unchanged then), the networks and
+                 the flows that were rerouted for it
+        """
+        if flow_id not in self._all_flows:
+            logger.error('Modify: Flow with ID %s does not exist', flow_id)
+            return None, networks, None
+
+        embedded_flow = self._all_flows[flow_id]
+        old_reservation = embedded_flow.flow_reservation
+        new_request = replace(embedded_flow.flow_request,
+                              rate=old_reservation.rate if rate is None else rate,
+                              burst=old_reservation.burst if burst is None else burst,
+                              deadline=old_reservation.deadline if deadline is None else deadline)
+        new_reservation = ResourceReservation(path=embedded_flow.path,
+                                              rate=new_request.rate,
+                                              burst=new_request.burst,
+                                              deadline=new_request.deadline)
+
+        # Delta on the current path and priority
+        working_network = copy.deepcopy(networks)
+        snapshot = self._dnc.snapshot_edges(working_network, embedded_flow.path)
+        self._dnc.subtract_reservation(old_reservation, working_network, embedded_flow.priority)
+        violation = self._dnc.reserve_resources(new_reservation, working_network, embedded_flow.priority)
+        if not violation:
+            violation = self._dnc.update_edges_state(working_network, embedded_flow.path)
+
+        if not violation:
+            logger.info('Flow %s modified in place', flow_id)
+            self._all_flows.set_profile(flow_id, new_request.rate, new_request.burst, new_request.deadline)
+            self._aggregates.move(flow_id, rate=new_request.rate, burst=new_request.burst)
+            self._released(embedded_flow.path_id)
+            return self._all_flows[flow_id], working_network, None
+
+        # Embed the flow again on the network without it
+        logger.info('Modified flow %s does not fit on its path and priority (%s). Embedding again.', flow_id, violation)
+        self._dnc.restore_edges(working_network, snapshot)
+        self._dnc.subtract_reservation(old_reservation, working_network, embedded_flow.priority)
+        self._dnc.update_edges_state(working_network, embedded_flow.path)
+
+        lease_ttl = self._lease_ttls.get(flow_id)
+        lease_expiry = self._leases.get_expiry(flow_id)
+        demotion = self._demotions.get(flow_id)
+        # The old path and the demotion are restored afterwards, they must survive path collection in embed_new_flow
+        held = [embedded_flow.path_id] + ([demotion[0]] if demotion is not None else [])
+        for path_id in held:
+            self._paths.acquire(path_id)
+        self._pop_flow(flow_id)
+        self._released(embedded_flow.path_id)
+
+        # The new embedding keeps the id of the flow
+        next_flow_id = self._last_flow_id
+        self._last_flow_id = flow_id
+        try:
+            new_embedding, new_network, rerouted_flows = self.embed_new_flow(new_request, working_network)
+        finally:
+            self._last_flow_id = next_flow_id
+
+        if new_embedding is None:
+            logger.info('Modified flow %s could not be embedded. Keeping the old profile.', flow_id)
+            self._add_flow(embedded_flow)
+            new_network = networks
+            if demotion is not None:
+                self._set_demotion(flow_id, demotion)
+        elif demotion is not None and demotion != (new_embedding.path_id, new_embedding.priority):
+            # Still away from the placement it was demoted from
+            self._set_demotion(flow_id, demotion)
+        for path_id in held:
+            self._paths.release(path_id)
+        if lease_ttl is not None and lease_expiry is not None:
+            self._lease_ttls[flow_id] = lease_ttl
+            self._leases.schedule(flow_id, lease_expiry)
+
+        return new_embedding, new_network, rerouted_flows
+
+    def remove_flow(self, flow_id: int, networks: List[Network]) -> Tuple[bool, List[Network]]:
+        removed, new_network = self.remove_flows([flow_id], networks)
+        return len(removed) > 0, new_network
+
+    def remove_flows(self, flow_ids: List[int], networks: List[Network]) -> Tuple[List[int], List[Network]]:
+        """
+        Removes many flows with one copy of the networks. All reservations are subtracted first, then the state of the
+        edges on their paths is updated once.
+
+        :return: The ids of the removed flows (unknown ids are skipped) and the networks without them
+        """
+        unique_ids = list(dict.fromkeys(flow_ids))
+        removed = [flow_id for flow_id in unique_ids if flow_id in self._all_flows]
+        if len(removed) < len(unique_ids):
+            logger.error('Flows with IDs %s do not exist!', [flow_id for flow_id in unique_ids if flow_id not in self._all_flows])
+        if not removed:
+            return removed, networks
+
         new_network = copy.deepcopy(networks)
-        if not flow_id in self._all_flows.keys():
-            logger.error(f'Flow with ID {flow_id} does not exist!')
-            return False, networks
+        # Flows of the same aggregate are subtracted at once
+        thresholds = [n.get_threshold() for n in new_network]
+        groups = self._aggregates.group(removed)
+        curves = {key: self._aggregates.curves(key, thresholds) for key in groups}
+
+        for flow_id in removed:
+            self._pop_flow(flow_id)
+
+        touched = set()
+        for key, count in groups.items():
+            self._dnc.add_curves(curves[key], new_network, -count)
+            touched.update(self._paths.get_path(key[0]))
+            self._released(key[0])
+
+        self._dnc.update_edges_state(new_network, list(touched))
+
+        if self._promotion:
+            self._promote_flows(list(touched), new_network)
 
-        flow = self._all_flows.pop(flow_id)
-        self._dnc.remove_resources(flow.flow_reservation, new_network, flow.priority)
+        return removed, new_network
+
+    def _promote_flows(self, edges: List[Tuple[int, int]], network: List[Network]) -> List[EmbeddedFlow]:
+        """
+        Promotion pass after capacity was released on ``edges``. The demoted flows that cross one of the edges (oldest
+        first) are moved back towards their placement before the first reroute: for every queue from the original
+        priority up to the current one, the original path and then the current path. The first move that fits is kept.
+        Only the edges of the old and new path are updated and checked. Changes ``network`` in place.
+
+        :return: The promoted flows
+        """
+        affected = set()
+        for edge in edges:
+            affected.update(self._edge_index.flows_on_edge(edge))
+        affected = sorted(affected.intersection(self._demotions))
+        if not affected:
+            return []
+
+        thresholds = [n.get_threshold() for n in network]
+        promoted = []
+        for flow_id in affected:
+            original_path_id, original_priority = self._demotions[flow_id]
+            current_priority = self._all_flows.get_priority(flow_id)
+
+            for path_id, priority in self._promotion_options(flow_id, original_path_id, original_priority, thresholds):
+                if self._try_promotion(flow_id, self._paths.get_path(path_id), priority, network):
+                    logger.info('Promoted flow %s from Q %s to Q %s, path %s', flow_id, current_priority, priority,
+                                self._paths.get_path(path_id))
+                    self._move_flow(flow_id, self._paths.get_path(path_id), priority)
+                    if (path_id, priority) == (original_path_id, original_priority):
+                        self._drop_demotion(flow_id)
+                    promoted.append(self._all_flows[flow_id])
+                    break
 
-        return True, new_network
+        self._promotions += len(promoted)
+        return promoted
+
+    def _promotion_options(self, flow_id: int, original_path_id: int, original_priority: int,
+                           thresholds: List[float]) -> List[Tuple[int, int]]:
+        """ (path id, priority) placements that are better than the current one and can meet the deadline """
+        current_path_id = self._all_flows.get_path_id(flow_id)
+        current_priority = self._all_flows.get_priority(flow_id)
+        options = []
+        for priority in range(original_priority, current_priority + 1):
+            options.append((original_path_id, priority))
+            if priority < current_priority and current_path_id != original_path_id:
+                options.append((current_path_id, priority))
+
+        _, _, deadline = self._all_flows.get_profile(flow_id)
+        return [(path_id, priority) for path_id, priority in options
+                if (path_id, priority) != (current_path_id, current_priority)
+                and self._dnc.deadline_bound(len(self._paths.get_path(path_id)), priority, thresholds) <= deadline]
+
+    def _try_promotion(self, flow_id: int, path: List[Tuple[int, int]], priority: int, network: List[Network]) -> bool:
+        """ Moves the reservation of the flow on the network if no touched edge is violated, otherwise keeps it """
+        current_path = self._paths.get_path(self._all_flows.get_path_id(flow_id))
+        rate, burst, deadline = self._all_flows.get_profile(flow_id)
+        touched = list(dict.fromkeys(current_path + path))
+        snapshot = self._dnc.snapshot_edges(network, touched)
+        current = ResourceReservation(path=current_path, rate=rate, burst=burst, deadline=deadline)
+        reservation = ResourceReservation(path=path, rate=rate, burst=burst, deadline=deadline)
+
+        self._dnc.subtract_reservation(current, network, self._all_flows.get_priority(flow_id))
+        violation = self._dnc.reserve_resources(reservation, network, priority)
+        if not violation:
+            violation = self._dnc.update_edges_state(network, touched)
+        if not violation:
+            return True
+
+        self._dnc.restore_edges(network, snapshot)
+        self._dnc.update_edges_state(network, touched)
+        return False
 
@@ -0,0 +1,206 @@
+import heapq
+import logging
+from collections import OrderedDict
+from typing import List, Union
+
+import numpy as np
+
+from Routing.csr_routing import CSRTopology
+
+
+logger = logging.getLogger(__name__)
+
+
+class ShortestPathTree(object):
+    """Shortest path tree of one root on a CSR topology. Distances and predecessor edge ids per internal node index."""
+
+    def __init__(self, root: int, dist: List[float], pred: List[int]):
+        self.root = root
+        self.dist = dist
+        self.pred = pred
+
+
+class ShortestPathTreeCache(object):
+    """
+    Maintains shortest path trees for the routing sources and repairs them when edge costs change.
+
+    Embedding a flow only raises the cost of the edges on its path and removing a flow only lowers them. Instead of
+    running Dijkstra from scratch for every request, the trees are repaired with a dynamic SSSP update
+    (Ramalingam/Reps style):
+
+    - A cost increase on a tree edge invalidates the subtree below it. The subtree is re-attached through the best
+      incoming edge from the rest of the tree and the distances are settled with a Dijkstra limited to the changed area.
+    - A cost decrease seeds the head of the edge if it now offers a shorter distance.
+
+    Ties are broken like in CSRTopology.dijkstra (smallest edge id among the shortest incoming edges), so a repaired
+    tree is the tree a fresh Dijkstra would build.
+
+    Hosts only have a single uplink, so trees are rooted at the switch a host is connected to. The number of trees is
+    bounded by ``max_trees`` (least recently used trees are dropped).
+    """
+
+    def __init__(self, topology: CSRTopology, max_trees: int = 256):
+        self._topology = topology
+        self._max_trees = max_trees
+        self._trees = OrderedDict()
+        self._repairs = 0
+        self._builds = 0
+
+    def get_topology(self) -> CSRTopology:
+        return self._topology
+
+    def get_statistics(self):
+        return {'trees': len(self._trees), 'builds': self._builds, 'repairs': self._repairs}
+
+    def clear(self):
+        self._trees.clear()
+
+    def _tree_root(self, src: int) -> int:
+        topo = self._topology
+        src_idx = topo.node_index(src)
+        if topo._indptr[src_idx + 1] - topo._indptr[src_idx] == 1:
+            # Single uplink (host): the tree of the connected switch answers the query
+            return topo._indices[topo._indptr[src_idx]]
+        return src_idx
+
+    def _get_tree(self, root: int) -> ShortestPathTree:
+        tree = self._trees.get(root)
+        if tree is not None:
+            self._trees.move_to_end(root)
+            return tree
+
+        dist, pred = self._topology.dijkstra(root)
+        tree = ShortestPathTree(root, dist, pred)
+        self._trees[root] = tree
+        self._builds += 1
+
+        if len(self._trees) > self._max_trees:
+            self._trees.popitem(last=False)
+
+        return tree
+
+    def shortest_path(self, src: int, dst: int) -> Union[None, List[int]]:
+        """Shortest path between the node ids ``src`` and ``dst`` answered from the maintained tree."""
+        if src == dst:
+            return [src]
+
+        topo = self._topology
+        src_idx = topo.node_index(src)
+        dst_idx = topo.node_index(dst)
+        root = self._tree_root(src)
+        path = topo.path_from_pred(self._get_tree(root).pred, root, dst_idx)
+
+        if root != src_idx and path is not None:
+            if src in path:
+                # The uplink target routes back through the source. Use a tree of the source itself.
+                return topo.path_from_pred(self._get_tree(src_idx).pred, src_idx, dst_idx)
+            path.insert(0, src)
+
+        return path
+
+    def update_costs(self, costs: np.ndarray) -> None:
+        """Set new edge costs on the topology and repair all maintained trees."""
+        topo = self._topology
+        old_costs = topo.costs
+        changed = np.flatnonzero(old_costs != costs)
+        topo.set_costs(costs)
+
+        if len(changed) == 0 or len(self._trees) == 0:
+            return
+
+        increased = changed[costs[changed] > old_costs[changed]].tolist()
+        decreased = changed[costs[changed] < old_costs[changed]].tolist()
+
+        for tree in self._trees.values():
+            self._repair(tree, increased, decreased)
+            self._repairs += 1
+
+    def _repair(self, tree: ShortestPathTree, increased: List[int], decreased: List[int]) -> None:
+        topo = self._topology
+        indptr = topo._indptr
+        indices = topo._indices
+        edge_ids = topo._edge_ids
+        rev_indptr = topo._rev_indptr
+        rev_indices = topo._rev_indices
+        rev_edge_ids = topo._rev_edge_ids
+        heads = topo._heads
+        tails = topo._tails
+        costs = topo._costs
+        dist = tree.dist
+        pred = tree.pred
+
+        heap = []
+
+        # Increased tree edges invalidate the subtree below their tail
+        affected = set()
+        for edge_id in increased:
+            v = tails[edge_id]
+            if pred[v] != edge_id or v in affected:
+                continue
+            stack = [v]
+            affected.add(v)
+            while stack:
+                u = stack.pop()
+                for slot in range(indptr[u], indptr[u + 1]):
+                    w = indices[slot]
+                    if pred[w] == edge_ids[slot] and w not in affected:
+                        affected.add(w)
+                        stack.append(w)
+
+        if affected:
+            for v in affected:
+                dist[v] = float('inf')
+                pred[v] = -1
+
+            # Re-attach the invalidated nodes through their best incoming edge from the valid part of the tree
+            for v in affected:
+                best = float('inf')
+                best_edge = -1
+                for slot in range(rev_indptr[v], rev_indptr[v + 1]):
+                    u = rev_indices[slot]
+                    if u in affected:
+                        continue
+                    edge_id = rev_edge_ids[slot]
+                    nd = dist[u] + costs[edge_id]
+                    if nd < best or (nd == best and edge_id < best_edge):
+                        best = nd
+                        best_edge = edge_id
+                if best_edge != -1:
+                    dist[v] = best
+                    pred[v] = best_edge
+                    heap.append((best, v))
+
+        # Decreased edges can only shorten the distance of their tail
+        for edge_id in decreased:
+            u = heads[edge_id]
+            v = tails[edge_id]
+            if v == tree.root:
+                continue
+            nd = dist[u] + costs[edge_id]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = edge_id
+                heap.append((nd, v))
+            elif nd == dist[v] and edge_id < pred[v]:
+                pred[v] = edge_id
+
+        if not heap:
+            return
+
+        heapq.heapify(heap)
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for slot in range(indptr[u], indptr[u + 1]):
+                w = indices[slot]
+                if w == tree.root:
+                    continue
+                edge_id = edge_ids[slot]
+                nd = d + costs[edge_id]
+                if nd < dist[w]:
+                    dist[w] = nd
+                    pred[w] = edge_id
+                    heapq.heappush(heap, (nd, w))
+                elif nd == dist[w] and edge_id < pred[w]:
+                    pred[w] = edge_id
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from Routing.admission_cache import NegativeAdmissionCache
+from Routing.path_table import PathTable
+from Routing.routing import FlowManager, FlowRequest, LCDNStrategy
+
+
+class TestNegativeAdmissionCache:
+    def test_dominated_profiles(self):
+        paths = PathTable()
+        cache = NegativeAdmissionCache(paths)
+        path_id = paths.intern([(10, 0), (0, 1), (1, 11)])
+        cache.store((0, 1), 1e6, 8000, 0.01, paths.get_bitset(path_id))
+
+        # At least as demanding
+        assert cache.lookup([(0, 1)], 1e6, 8000, 0.01)
+        assert cache.lookup([(0, 1)], 2e6, 16000, 0.005)
+        # Less demanding or other switch pair
+        assert not cache.lookup([(0, 1)], 5e5, 8000, 0.01)
+        assert not cache.lookup([(0, 1)], 1e6, 8000, 0.02)
+        assert not cache.lookup([(1, 0)], 1e6, 8000, 0.01)
+
+        # A less demanding rejection replaces the profiles it covers
+        cache.store((0, 1), 5e5, 8000, 0.01, paths.get_bitset(path_id))
+        assert cache.lookup([(0, 1)], 5e5, 8000, 0.01)
+        assert cache.get_statistics()['hits'] == 3
+
+    def test_release_and_context(self):
+        paths = PathTable()
+        cache = NegativeAdmissionCache(paths)
+        path_a = paths.intern([(10, 0), (0, 1), (1, 11)])
+        path_b = paths.intern([(12, 2), (2, 3), (3, 13)])
+        path_c = paths.intern([(14, 0), (0, 1), (1, 15)])
+        cache.validate(0)
+        cache.store((0, 1), 1e6, 8000, 0.01, paths.get_bitset(path_a))
+        cache.store((2, 3), 1e6, 8000, 0.01, paths.get_bitset(path_b))
+
+        # Released capacity on another path that shares the edge (0, 1)
+        cache.release(path_c)
+        assert not cache.lookup([(0, 1)], 1e6, 8000, 0.01)
+        assert cache.lookup([(2, 3)], 1e6, 8000, 0.01)
+
+        cache.validate(0)
+        assert len(cache) == 1
+        cache.validate(1)
+        assert len(cache) == 0
+
+
+@pytest.fixture
+def replay(ring_network):
+    def replay(strategy, reroutes, cache, seed=5, count=150):
+        """ Admissions of a saturating workload with removals """
+        manager, hosts = ring_network(8, 2)
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(strategy)
+        flow_manager.set_reroutes(reroutes)
+        flow_manager.set_negative_cache(cache)
+        networks = manager.get_current_networks()
+
+        rng = np.random.default_rng(seed)
+        admissions = []
+        flow_ids = []
+        for i in range(count):
+            if i % 25 == 24:
+                _, networks = flow_manager.remove_flows([flow_ids.pop(int(rng.integers(len(flow_ids))))], networks)
+            src, dst = rng.choice(hosts, 2, replace=False)
+            request = FlowRequest(int(src), int(dst), 0, 80000, 1e8 * float(rng.choice([0.5, 1])), float(rng.choice([0.005, 0.02])))
+            embedding, networks, _ = flow_manager.embed_new_flow(request, networks)
+            admissions.append(None if embedding is None else (embedding.path, embedding.priority))
+            if embedding is not None:
+                flow_ids.append(embedding.id)
+        return admissions, flow_manager.get_negative_cache_statistics()
+    return replay
+
+
+class TestNegativeAdmissionCacheReplay:
+    @pytest.mark.parametrize('strategy', [LCDNStrategy.GREEDY, LCDNStrategy.NOTGREEDY])
+    def test_same_admissions_without_rerouting(self, replay, strategy):
+        expected, _ = replay(strategy, 0, False)
+        admissions, statistics = replay(strategy, 0, True)
+        assert admissions == expected
+        assert statistics['hits'] > 0
+
+    def test_not_used_with_rerouting(self, replay):
+        expected, _ = replay(LCDNStrategy.GREEDY, 2, False, count=60)
+        admissions, statistics = replay(LCDNStrategy.GREEDY, 2, True, count=60)
+        assert admissions == expected
+        assert statistics['hits'] == 0 and statistics['entries'] == 0
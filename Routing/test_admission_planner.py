@@ -0,0 +1,34 @@
+import copy
+
+from NetworkCalculus.dnc import DNCAgent
+from Routing.admission_planner import AdmissionPlanner, PlanObjective
+from Routing.routing import FlowManager, LCDNStrategy
+
+
+class TestAdmissionPlanner:
+    def test_plan_is_committed_as_planned(self, ring_network, requests):
+        manager, hosts = ring_network()
+        flows = requests(hosts)
+
+        batch_manager = FlowManager()
+        batch_manager.set_strategy(LCDNStrategy.NOTGREEDY)
+        batch, _ = batch_manager.embed_flow_batch(flows, manager.get_current_networks())
+
+        flow_manager = FlowManager()
+        planner = AdmissionPlanner(flow_manager, PlanObjective.FLOWS, iterations=30)
+        plan = planner.plan(flows, manager.get_current_networks())
+        assert plan.admitted >= sum(embedding is not None for embedding in batch)
+
+        embeddings, networks = planner.commit(plan, manager.get_current_networks())
+        assert [embedding is not None for embedding in embeddings] == [a is not None for a in plan.assignments]
+        assert DNCAgent().check_and_update_network_state(copy.deepcopy(networks)) is None
+        assert len(flow_manager.get_all_flows()) == plan.admitted
+
+    def test_planning_does_not_change_the_network(self, idle_networks, requests):
+        networks, hosts = idle_networks()
+        before = copy.deepcopy(networks)
+
+        AdmissionPlanner(FlowManager(), iterations=10).plan(requests(hosts, 30), networks)
+        for network, network_before in zip(networks, before):
+            for u, v, data in network.get_network_graph().edges(data=True):
+                assert data['arrival_curve'].rate == network_before.get_network_graph()[u][v]['arrival_curve'].rate
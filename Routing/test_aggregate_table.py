@@ -0,0 +1,117 @@
+import copy
+from dataclasses import replace
+
+from NetworkCalculus.dnc import DNCAgent, ResourceReservation
+from Routing.aggregate_table import AggregateTable
+from Routing.path_table import PathTable
+from Routing.routing import FlowManager, FlowRequest, LCDNStrategy
+
+
+class TestAggregateTable:
+    def test_counts_and_curves(self):
+        paths = PathTable()
+        path_id = paths.intern([(10, 0), (0, 1), (1, 11)])
+        table = AggregateTable(paths)
+        key = AggregateTable.key(path_id, 2, 1e6, 800)
+        thresholds = [0.1, 0.2, 0.3, 0.4]
+
+        table.add(1, key)
+        table.add(2, key)
+        table.add(3, AggregateTable.key(path_id, 1, 1e6, 800))
+        assert len(table) == 2 and table.count(key) == 2
+        assert table.group([1, 2, 3]) == {key: 2, AggregateTable.key(path_id, 1, 1e6, 800): 1}
+
+        curves = table.curves(key, thresholds)
+        assert table.curves(key, thresholds) is curves
+        # First hop on the host Q (network 0), then the burst grows by rate * threshold per hop
+        assert [(network, edge) for network, edge, _ in curves] == [(0, (10, 0)), (2, (0, 1)), (2, (1, 11))]
+        assert [ac.burst for _, _, ac in curves] == [800, 800 + 1e6 * 0.1, 800 + 1e6 * 0.1 + 1e6 * 0.3]
+
+        table.move(1, priority=1)
+        table.remove(2)
+        assert table.count(key) == 0 and table.get_statistics()['curves'] == 0
+        assert table.count(AggregateTable.key(path_id, 1, 1e6, 800)) == 2
+
+    def test_hop_curves_match_reservation(self, idle_networks):
+        networks, hosts = idle_networks()
+        dnc = DNCAgent()
+        path = [(hosts[0], 0), (0, 1), (1, 2), (2, hosts[4])]
+
+        reserved = copy.deepcopy(networks)
+        assert dnc.reserve_resources(ResourceReservation(path, 1e7, 8000, 0.1), reserved, 2) is None
+        aggregated = copy.deepcopy(networks)
+        thresholds = [n.get_threshold() for n in networks]
+        dnc.add_curves(dnc.hop_curves(path, 1e7, 8000, 2, thresholds), aggregated, 1)
+
+        for a, b in zip(reserved, aggregated):
+            for u, v, ac in a.get_network_graph().edges(data='arrival_curve'):
+                other = b.get_network_graph()[u][v]['arrival_curve']
+                assert (ac.rate, ac.burst) == (other.rate, other.burst)
+
+    def test_removing_aggregated_flows(self, ring_network):
+        manager, hosts = ring_network()
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(LCDNStrategy.NOTGREEDY)
+        flows = [FlowRequest(hosts[i % 3], hosts[6 + i % 3], 0, 800, 1e6, 0.02) for i in range(60)]
+        embeddings, networks = flow_manager.embed_flow_batch(flows, manager.get_current_networks())
+        assert len(flow_manager.get_aggregate_table()) < len(flow_manager.get_flow_table())
+
+        removed, networks = flow_manager.remove_flows([e.id for e in embeddings if e is not None][::2], networks)
+        assert flow_manager.get_aggregate_table().get_statistics()['flows'] == len(flow_manager.get_flow_table())
+
+        fresh = manager.get_current_networks()
+        dnc = DNCAgent()
+        for flow in flow_manager.get_flow_table().values():
+            assert dnc.reserve_resources(flow.flow_reservation, fresh, flow.priority) is None
+        dnc.check_and_update_network_state(fresh)
+        for a, b in zip(networks, fresh):
+            for u, v, ac in a.get_network_graph().edges(data='arrival_curve'):
+                other = b.get_network_graph()[u][v]['arrival_curve']
+                assert abs(ac.rate - other.rate) <= 1e-6 and abs(ac.burst - other.burst) <= 1e-6
+
+    def test_removing_duplicate_and_unknown_ids(self, ring_network, caplog):
+        manager, hosts = ring_network()
+        flow_manager = FlowManager()
+        flows = [FlowRequest(hosts[i], hosts[6 + i], 0, 800, 1e6, 0.02) for i in range(3)]
+        embeddings, networks = flow_manager.embed_flow_batch(flows, manager.get_current_networks())
+        first, second, third = [e.id for e in embeddings]
+
+        # Duplicates are removed once and are not reported as unknown
+        removed, networks = flow_manager.remove_flows([first, second, first, second], networks)
+        assert removed == [first, second]
+        assert 'do not exist' not in caplog.text
+        assert flow_manager.get_aggregate_table().get_statistics()['flows'] == len(flow_manager.get_flow_table()) == 1
+
+        removed, networks = flow_manager.remove_flows([first, third, third], networks)
+        assert removed == [third]
+        assert caplog.text.count('do not exist') == 1
+        assert 'Flows with IDs [%s] do not exist' % first in caplog.text
+        assert len(flow_manager.get_flow_table()) == 0
+
+    def test_joining_an_aggregate_updates_the_path(self, idle_networks):
+        networks, hosts = idle_networks()
+        flow_manager = FlowManager()
+        path = [(hosts[0], 0), (0, 1), (1, 2), (2, hosts[4])]
+        flow = FlowRequest(hosts[0], hosts[4], 0, 8000, 1e7, 0.02)
+        first, networks = flow_manager.embed_flow_on_path(flow, path, 2, networks)
+        second, joined = flow_manager.embed_flow_on_path(flow, path, 2, networks)
+        assert flow_manager.get_aggregate_table().count(AggregateTable.key(first.path_id, 2, 1e7, 8000)) == 2
+
+        fresh, _ = idle_networks()
+        dnc = DNCAgent()
+        for embedded_flow in (first, second):
+            assert dnc.reserve_resources(embedded_flow.flow_reservation, fresh, 2) is None
+        dnc.check_and_update_network_state(fresh)
+        def state(data):
+            return (data['arrival_curve'].rate, data['arrival_curve'].burst, data['service_curve'].rate,
+                    data['service_curve'].latency, data['q_delay'], data['cost'])
+
+        for before, after, expected in zip(networks, joined, fresh):
+            for u, v, data in after.get_network_graph().edges(data=True):
+                assert state(data) == state(expected.get_network_graph()[u][v])
+                if (u, v) not in path:
+                    assert state(data) == state(before.get_network_graph()[u][v])
+
+        # The deadline still depends on the joining flow
+        late, unchanged = flow_manager.embed_flow_on_path(replace(flow, deadline=1e-6), path, 2, joined)
+        assert late.type == 'Flow Deadline' and unchanged is joined
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from NetworkCalculus.arrival_curve import ArrivalCurve
+from NetworkCalculus.service_curve import ServiceCurve
+from NetworkCalculus.cost_models import LinkState, DelayCostModel, SlackCostModel, UtilizationCostModel, HopCountCostModel
+from Routing.routing import FlowManager, FlowRequest
+
+THRESHOLD = 1e-3
+CAPACITY = 1e9
+
+
+def link_state(loads) -> LinkState:
+    """ One edge per load (share of the capacity). The delay grows with the load and reaches the threshold at 1. """
+    edges = [(i, i + 1) for i in range(len(loads))]
+    acs = {edge: ArrivalCurve(rate=load * CAPACITY, burst=8000) for edge, load in zip(edges, loads)}
+    scs = {edge: ServiceCurve(latency=1e-6, rate=CAPACITY) for edge in edges}
+    buffers = {edge: 1e6 for edge in edges}
+    return LinkState(edges, np.array(loads, dtype=np.float64) * THRESHOLD, THRESHOLD, acs, scs, buffers)
+
+
+MODELS = [DelayCostModel(), SlackCostModel(), UtilizationCostModel(), HopCountCostModel()]
+
+
+class TestLinkCostModels:
+    @pytest.mark.parametrize('model', MODELS, ids=lambda model: type(model).__name__)
+    def test_monotone_in_load(self, model):
+        costs = model.compute(link_state([0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]))
+        assert costs[0] == 1.0
+        assert np.all(np.diff(costs) > 0)
+        assert np.all(np.isfinite(costs))
+
+    def test_full_load(self):
+        state = link_state([1.0])
+        assert DelayCostModel(scale=1e6).compute(state)[0] == pytest.approx(1 + 1e6 * THRESHOLD)
+        assert HopCountCostModel(epsilon=1e-3).compute(state)[0] == pytest.approx(1 + 1e-3)
+        assert SlackCostModel().compute(state)[0] == np.inf
+        assert UtilizationCostModel().compute(state)[0] == np.inf
+
+    def test_over_threshold(self):
+        state = link_state([1.5])
+        assert HopCountCostModel(epsilon=1e-3).compute(state)[0] == pytest.approx(1 + 1e-3)
+        assert SlackCostModel().compute(state)[0] == np.inf
+
+    def test_weights(self):
+        state = link_state([0.5])
+        assert SlackCostModel(weight=2.0).compute(state)[0] == pytest.approx(1 + 2.0 * (1 / 0.5 - 1))
+        assert UtilizationCostModel(weight=2.0).compute(state)[0] == pytest.approx(1 + 2.0 * 0.5 / 0.5)
+
+    def test_model_changes_path_choice(self, ring_network, embed_flows):
+        # Flows between switch 0 and switch 2 of a ring: two switch hops one way, four the other way
+        lengths = {}
+        for model in (DelayCostModel(), HopCountCostModel()):
+            manager, hosts = ring_network()
+            networks = manager.get_current_networks()
+            flow_manager = FlowManager()
+            flow_manager.set_cost_model(model)
+            flow_manager.get_dnc_agent().check_and_update_network_state(networks)
+            flow_requests = [FlowRequest(hosts[i % 2], hosts[4 + i % 2], 0, 80000, 5e7, 0.02) for i in range(5)]
+            embeddings, _, _ = embed_flows(flow_manager, flow_requests, networks)
+            lengths[type(model)] = [len(embedding.path) for embedding in embeddings]
+
+        # The hop count keeps the short way, the queueing delay of the loaded short way sends flows around the ring
+        assert lengths[HopCountCostModel] == [4] * 5
+        assert lengths[DelayCostModel][0] == 4
+        assert 6 in lengths[DelayCostModel]
@@ -0,0 +1,101 @@
+from itertools import islice
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from Routing.csr_routing import CSRTopology, validate_paths
+from Routing.routing import RoutingModule, FlowRequest, FlowManager, LCDNStrategy, RoutingBackend
+
+
+def random_graph(seed: int, nodes: int = 40) -> nx.DiGraph:
+    rng = np.random.default_rng(seed)
+    graph = nx.DiGraph(nx.connected_watts_strogatz_graph(nodes, 4, 0.3, seed=seed))
+    graph.graph['topology_version'] = 1
+    for u, v in graph.edges():
+        graph[u][v]['cost'] = 1.0 + rng.random()
+    return graph
+
+
+class TestCSRTopology:
+    def test_csr_structure(self):
+        graph = random_graph(1)
+        csr = CSRTopology(graph)
+        assert csr.indptr[-1] == graph.number_of_edges()
+        for slot, edge_id in enumerate(csr.edge_ids):
+            u, v = csr.edges[edge_id]
+            assert csr.node_ids[csr.indices[slot]] == v
+            assert csr.indptr[csr.node_index(u)] <= slot < csr.indptr[csr.node_index(u) + 1]
+
+    @pytest.mark.parametrize('seed', [1, 2, 3])
+    def test_shortest_path_matches_networkx(self, seed):
+        graph = random_graph(seed)
+        csr = CSRTopology(graph)
+        for dst in range(1, 20):
+            path = csr.shortest_path(0, dst)
+            expected = nx.shortest_path_length(graph, 0, dst, weight='cost')
+            assert nx.path_weight(graph, path, 'cost') == pytest.approx(expected)
+
+    @pytest.mark.parametrize('seed', [4, 5])
+    def test_yen_matches_networkx(self, seed):
+        graph = random_graph(seed)
+        csr = CSRTopology(graph)
+        paths = list(islice(csr.shortest_simple_paths(0, 17), 10))
+        expected = list(islice(nx.shortest_simple_paths(graph, 0, 17, weight='cost'), 10))
+        assert [nx.path_weight(graph, p, 'cost') for p in paths] == \
+               pytest.approx([nx.path_weight(graph, p, 'cost') for p in expected])
+        assert len({tuple(p) for p in paths}) == len(paths)
+        assert validate_paths(graph, 0, 17, paths)
+
+    def test_cost_update(self):
+        graph = random_graph(6)
+        csr = CSRTopology(graph)
+        path = csr.shortest_path(0, 10)
+        graph[path[0]][path[1]]['cost'] = 1e6
+        assert csr.matches(graph)
+        csr.update_costs(graph)
+        assert csr.shortest_path(0, 10)[:2] != path[:2]
+
+    def test_no_path(self):
+        graph = nx.DiGraph(topology_version=0)
+        graph.add_edge(0, 1, cost=1.0)
+        graph.add_node(2)
+        csr = CSRTopology(graph)
+        assert csr.shortest_path(0, 2) is None
+        assert list(csr.shortest_simple_paths(0, 2)) == []
+
+
+class TestRouteBatch:
+    def test_route_batch_matches_single_queries(self):
+        graph = random_graph(7)
+        routing = RoutingModule()
+        routing.update_network(graph)
+        requests = [FlowRequest(src, (src * 7 + 3) % 40, 0, 800, 1e6, 0.02) for src in range(0, 40, 5)]
+
+        sequential = routing.route_batch(requests, k=3, processes=1)
+        parallel = routing.route_batch(requests, k=3, processes=2, min_parallel=0)
+
+        assert sequential == parallel
+        for request, paths in zip(requests, sequential):
+            single = routing.get_shortest_path(request.sourceVM, request.destinationVM, 3)
+            assert [nx.path_weight(graph, [e[0] for e in p] + [p[-1][1]], 'cost') for p in paths] == \
+                   pytest.approx([nx.path_weight(graph, [e[0] for e in p] + [p[-1][1]], 'cost') for p in single])
+
+
+class TestBackendEquivalence:
+    @pytest.mark.parametrize('strategy', [LCDNStrategy.GREEDY, LCDNStrategy.NOTGREEDY])
+    def test_same_embeddings_without_ties(self, idle_networks, requests, embed_flows, strategy):
+        # On a ring with an odd number of switches the two directions never have the same length
+        placements = {}
+        for backend in (RoutingBackend.NETWORKX, RoutingBackend.CSR):
+            networks, hosts = idle_networks(7, 2)
+            flow_manager = FlowManager()
+            flow_manager.set_strategy(strategy)
+            flow_manager.set_routing_backend(backend)
+            embeddings, _, rerouted = embed_flows(flow_manager, requests(hosts, 40, 2), networks)
+            placements[backend] = [None if embedding is None else
+                                   (embedding.path, embedding.priority, [(f.id, f.path, f.priority) for f in moved])
+                                   for embedding, moved in zip(embeddings, rerouted)]
+
+        assert placements[RoutingBackend.CSR] == placements[RoutingBackend.NETWORKX]
+        assert any(placement is not None for placement in placements[RoutingBackend.CSR])
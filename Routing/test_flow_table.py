@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from Routing.flow_table import FlowTable
+from Routing.path_table import PathTable
+from Routing.routing import EmbeddedFlow, FlowRequest
+from NetworkCalculus.dnc import ResourceReservation
+
+
+def embedded_flow(flow_id: int, path, priority: int = 0, rate: float = 1e6) -> EmbeddedFlow:
+    request = FlowRequest(path[0][0], path[-1][1], 0, 8000, rate, 0.02)
+    reservation = ResourceReservation(path=path, rate=rate, burst=8000, deadline=0.02)
+    return EmbeddedFlow(flow_id, request, reservation, path, priority)
+
+
+class TestFlowTable:
+    def test_roundtrip(self):
+        paths = PathTable()
+        table = FlowTable(paths)
+        path = [(10, 0), (0, 1), (1, 11)]
+        table.add(embedded_flow(5, path, priority=2, rate=3e6))
+
+        flow = table[5]
+        assert 5 in table and len(table) == 1
+        assert flow.path == path and flow.path_id == paths.intern(path)
+        assert flow.priority == 2
+        assert flow.flow_request == FlowRequest(10, 11, 0, 8000, 3e6, 0.02)
+        assert flow.flow_reservation == ResourceReservation(path=path, rate=3e6, burst=8000, deadline=0.02)
+
+    def test_updates_and_free_list(self):
+        paths = PathTable()
+        table = FlowTable(paths, capacity=2)
+        path_a = [(10, 0), (0, 11)]
+        path_b = [(10, 1), (1, 11)]
+        for flow_id in range(1, 6):
+            table.add(embedded_flow(flow_id, path_a))
+
+        table.set_route(3, paths.intern(path_b), 1)
+        table.set_profile(3, 2e6, 16000, 0.01)
+        assert table[3].path == path_b and table[3].priority == 1
+        assert table[3].flow_request.rate == 2e6 and table[3].flow_reservation.burst == 16000
+
+        removed = table.pop(2)
+        assert removed.id == 2 and 2 not in table
+        with pytest.raises(KeyError):
+            table[2]
+
+        # The free row is reused, ids stay unique
+        table.add(embedded_flow(6, path_b))
+        assert table._size == 5
+        assert sorted(table) == [1, 3, 4, 5, 6]
+
+        columns = table.columns(['id', 'priority'])
+        assert sorted(columns['id'].tolist()) == [1, 3, 4, 5, 6]
+        assert np.count_nonzero(columns['priority'] == 1) == 1
+
+    def test_duplicate_id(self):
+        table = FlowTable(PathTable())
+        table.add(embedded_flow(1, [(10, 0), (0, 11)]))
+        with pytest.raises(KeyError):
+            table.add(embedded_flow(1, [(10, 0), (0, 11)]))
+
+    def test_indexes(self):
+        paths = PathTable()
+        table = FlowTable(paths)
+        path_a = [(10, 0), (0, 1), (1, 11)]
+        path_b = [(10, 0), (0, 2), (2, 1), (1, 11)]
+        path_c = [(12, 2), (2, 1), (1, 11)]
+        table.add(embedded_flow(1, path_a, priority=0))
+        table.add(embedded_flow(2, path_b, priority=1))
+        table.add(embedded_flow(3, path_c, priority=1))
+
+        assert table.find(src=10) == [1, 2]
+        assert table.find(dst=11) == [1, 2, 3]
+        assert table.find(priority=1) == [2, 3]
+        assert table.find(switches=(0, 1)) == [1, 2]
+        assert table.find(src=10, priority=1) == [2]
+        assert table.find(src=13) == []
+        assert table.find() == [1, 2, 3]
+
+        table.set_route(1, paths.intern(path_c), 2)
+        assert table.find(priority=0) == []
+        assert table.find(priority=2) == [1]
+        assert table.find(switches=(2, 1)) == [1, 3]
+        assert table.count('priority') == {1: 2, 2: 1}
+
+        table.pop(3)
+        assert table.find(switches=(2, 1)) == [1]
+        assert table.find(dst=11) == [1, 2]
+
+    def test_indexes_after_many_changes(self):
+        # Rows are reused and the index arrays grow, shrink and move rows around
+        rng = np.random.default_rng(4)
+        paths = PathTable()
+        table = FlowTable(paths, capacity=4)
+        routes = [[(10 + i, i), (i, (i + 1) % 4), ((i + 1) % 4, 20 + i)] for i in range(4)]
+        expected = {}
+        for flow_id in range(1, 400):
+            if expected and rng.random() < 0.4:
+                removed = int(rng.choice(sorted(expected)))
+                table.pop(removed)
+                del expected[removed]
+            elif expected and rng.random() < 0.3:
+                moved = int(rng.choice(sorted(expected)))
+                path, priority = routes[int(rng.integers(4))], int(rng.integers(4))
+                table.set_route(moved, paths.intern(path), priority)
+                expected[moved] = (expected[moved][0], (path[0][1], path[-1][0]), priority)
+            path, priority = routes[int(rng.integers(4))], int(rng.integers(4))
+            table.add(embedded_flow(flow_id, path, priority, rate=1e6 + flow_id))
+            expected[flow_id] = (path[0][0], (path[0][1], path[-1][0]), priority)
+
+        for priority in range(4):
+            assert table.find(priority=priority) == sorted(f for f, (_, _, p) in expected.items() if p == priority)
+        for src in range(10, 14):
+            for switches in {key for _, key, _ in expected.values()}:
+                assert table.find(src=src, switches=switches) == \
+                       sorted(f for f, (s, key, _) in expected.items() if (s, key) == (src, switches))
+        assert sum(table.count('priority').values()) == len(expected)
+        flow_id = max(expected)
+        assert table.get_profile(flow_id) == (1e6 + flow_id, 8000, 0.02)
@@ -0,0 +1,43 @@
+import pytest
+
+from Routing.routing import FlowManager, FlowRequest
+
+
+@pytest.fixture
+def two_flows(idle_networks, embed_flows):
+    """ A flow manager with two embedded flows, the networks and the ids of the flows """
+    networks, hosts = idle_networks()
+    flow_manager = FlowManager()
+    flow_requests = [FlowRequest(hosts[i], hosts[-1 - i], 0, 8000, 1e6, 0.02) for i in range(2)]
+    embeddings, networks, _ = embed_flows(flow_manager, flow_requests, networks)
+    return flow_manager, networks, [embedding.id for embedding in embeddings]
+
+
+class TestLeases:
+    def test_expired_leases_are_forgotten(self, two_flows):
+        flow_manager, networks, (short, long) = two_flows
+        flow_manager.set_lease_wheel(0.5)
+        flow_manager.set_lease(short, 1.0, 0.0)
+        flow_manager.set_lease(long, 10.0, 0.0)
+
+        expired = flow_manager.expired_leases(2.0)
+        assert expired == [short]
+        assert not flow_manager.renew_lease(short, 2.0)
+        flow_manager.remove_flows(expired, networks)
+
+        # Rescheduling after an expiry keeps the remaining lease
+        flow_manager.set_lease_wheel(0.1, now=2.0)
+        assert flow_manager.get_lease_expiry(long) == 10.0
+        assert flow_manager.expired_leases(9.9) == []
+        assert flow_manager.expired_leases(10.0) == [long]
+
+    def test_removed_flow_loses_its_lease(self, two_flows):
+        flow_manager, networks, (flow_id, other) = two_flows
+        flow_manager.set_lease(flow_id, 5.0, 0.0)
+        flow_manager.set_lease(other, 5.0, 0.0)
+        flow_manager.remove_flows([flow_id], networks)
+
+        assert flow_manager.get_lease_expiry(flow_id) is None
+        assert not flow_manager.renew_lease(flow_id, 1.0)
+        flow_manager.set_lease_wheel(0.1, now=1.0)
+        assert flow_manager.expired_leases(6.0) == [other]
@@ -0,0 +1,97 @@
+import copy
+
+import pytest
+
+from NetworkCalculus.dnc import DNCAgent
+from Routing.routing import FlowManager, FlowRequest, LCDNStrategy
+
+
+@pytest.fixture
+def embed_flow(idle_networks, embed_flows):
+    def embed_flow(strategy):
+        """ Embeds two flows across the ring and returns the flow manager, the networks and the id of the first flow """
+        networks, hosts = idle_networks()
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(strategy)
+        flow_requests = [FlowRequest(hosts[0], hosts[6], 0, 8000, 1e6, 0.02), FlowRequest(hosts[1], hosts[7], 0, 8000, 1e6, 0.02)]
+        embeddings, networks, _ = embed_flows(flow_manager, flow_requests, networks)
+        return flow_manager, networks, embeddings[0].id
+    return embed_flow
+
+
+@pytest.fixture
+def rebuilt_networks(ring_network):
+    def rebuilt_networks(flow_manager):
+        """ The networks with the reservations of all flows in the flow table made from scratch. """
+        manager, _ = ring_network()
+        networks = manager.get_current_networks()
+        dnc = DNCAgent()
+        for embedded_flow in sorted(flow_manager.get_flow_table().values(), key=lambda f: f.id):
+            assert dnc.reserve_resources(embedded_flow.flow_reservation, networks, embedded_flow.priority) is None
+        assert dnc.check_and_update_network_state(networks) is None
+        return networks
+    return rebuilt_networks
+
+
+def assert_same_state(networks, expected):
+    for network, expected_network in zip(networks, expected):
+        expected_graph = expected_network.get_network_graph()
+        for u, v, data in network.get_network_graph().edges(data=True):
+            curve = data['arrival_curve']
+            expected_curve = expected_graph[u][v]['arrival_curve']
+            assert abs(curve.rate - expected_curve.rate) <= 1e-6 * max(1.0, expected_curve.rate)
+            assert abs(curve.burst - expected_curve.burst) <= 1e-6 * max(1.0, expected_curve.burst)
+
+
+class TestModifyFlow:
+    def test_in_place(self, embed_flow, rebuilt_networks):
+        flow_manager, networks, flow_id = embed_flow(LCDNStrategy.GREEDY)
+        before = flow_manager.get_flow_table()[flow_id]
+
+        modified, networks, rerouted = flow_manager.modify_flow(flow_id, networks, rate=5e5, burst=4000)
+        assert rerouted is None
+        assert modified.id == flow_id
+        assert (modified.path, modified.priority) == (before.path, before.priority)
+        assert (modified.flow_request.rate, modified.flow_request.burst) == (5e5, 4000)
+        assert_same_state(networks, rebuilt_networks(flow_manager))
+
+    def test_fallback_embeds_again(self, embed_flow, rebuilt_networks):
+        flow_manager, networks, flow_id = embed_flow(LCDNStrategy.NOTGREEDY)
+        assert flow_manager.get_flow_table()[flow_id].priority == 1
+
+        # The tighter deadline is not met in priority 1 any more
+        modified, networks, _ = flow_manager.modify_flow(flow_id, networks, deadline=0.003)
+        assert modified.id == flow_id
+        assert modified.priority == 0
+        assert flow_manager.get_flow_table()[flow_id].flow_request.deadline == 0.003
+        assert_same_state(networks, rebuilt_networks(flow_manager))
+
+    def test_fallback_keeps_demotion(self, embed_flow):
+        flow_manager, networks, flow_id = embed_flow(LCDNStrategy.NOTGREEDY)
+        moved, networks = flow_manager.reroute_embedded_flow(flow_id, networks)
+        assert moved
+        demotion = flow_manager.get_demoted_flows()[flow_id]
+
+        modified, networks, _ = flow_manager.modify_flow(flow_id, networks, deadline=0.003)
+        assert modified is not None
+        assert (modified.path, modified.priority) != demotion
+        assert flow_manager.get_demoted_flows()[flow_id] == demotion
+
+    def test_failure_rolls_back(self, embed_flow, rebuilt_networks):
+        flow_manager, networks, flow_id = embed_flow(LCDNStrategy.NOTGREEDY)
+        moved, networks = flow_manager.reroute_embedded_flow(flow_id, networks)
+        assert moved
+        flow_manager.set_lease(flow_id, 5.0, 0.0)
+        before = flow_manager.get_flow_table()[flow_id]
+        demoted = flow_manager.get_demoted_flows()
+        original = copy.deepcopy(networks)
+
+        modified, new_networks, _ = flow_manager.modify_flow(flow_id, networks, deadline=1e-5)
+        assert modified is None
+        assert new_networks is networks
+        after = flow_manager.get_flow_table()[flow_id]
+        assert (after.path, after.priority, after.flow_request) == (before.path, before.priority, before.flow_request)
+        assert flow_manager.get_demoted_flows() == demoted
+        assert flow_manager.get_lease_expiry(flow_id) == 5.0
+        assert_same_state(new_networks, original)
+        assert_same_state(new_networks, rebuilt_networks(flow_manager))
@@ -0,0 +1,110 @@
+import copy
+
+from NetworkCalculus.dnc import DNCAgent
+from Network.network_components import Node
+from Routing.optimistic_admission import OptimisticAdmission
+from Routing.routing import FlowManager, LCDNStrategy
+
+
+def mixed(seed: int = 3):
+    flow_manager = FlowManager(seed)
+    flow_manager.set_strategy(LCDNStrategy.GREEDYMIX)
+    flow_manager.set_greedy_p(0.5)
+    return flow_manager
+
+
+def placements(embeddings):
+    return [None if embedding is None else (embedding.path, embedding.priority) for embedding in embeddings]
+
+
+class TestOptimisticAdmission:
+    def test_same_admissions_as_batch(self, ring_network, requests):
+        manager, hosts = ring_network()
+        flows = requests(hosts, count=60)
+
+        batch_manager = FlowManager()
+        batch_manager.set_strategy(LCDNStrategy.NOTGREEDY)
+        batch, _ = batch_manager.embed_flow_batch(flows, manager.get_current_networks())
+
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(LCDNStrategy.NOTGREEDY)
+        admission = OptimisticAdmission(flow_manager, workers=1)
+        version, snapshot = manager.get_snapshot()
+        options = admission.prepare(flows, snapshot)
+        proposals = admission.evaluate(flows, options, snapshot)
+        embeddings, networks = admission.commit(flows, options, proposals, manager.get_current_networks(),
+                                                manager.get_changed_edges(version))
+
+        assert placements(embeddings) == placements(batch)
+        # Flows of one batch conflict if they share edges
+        assert 0 < admission.get_statistics()['conflicts'] < len(flows)
+        assert DNCAgent().check_and_update_network_state(copy.deepcopy(networks)) is None
+
+    def test_concurrent_commit_is_validated(self, ring_network, requests):
+        manager, hosts = ring_network()
+        flows = requests(hosts, count=40)
+        other_flows = requests(hosts, count=40, seed=2)
+
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(LCDNStrategy.NOTGREEDY)
+        admission = OptimisticAdmission(flow_manager, workers=1)
+        version, snapshot = manager.get_snapshot()
+        before = copy.deepcopy(snapshot)
+        options = admission.prepare(flows, snapshot)
+        proposals = admission.evaluate(flows, options, snapshot)
+
+        # Another commit between the evaluation and the commit
+        _, networks = flow_manager.embed_flow_batch(other_flows, manager.get_current_networks())
+        manager.update_network_state(networks)
+        changed = manager.get_changed_edges(version)
+        assert changed
+
+        embeddings, networks = admission.commit(flows, options, proposals, manager.get_current_networks(), changed)
+        assert any(embedding is not None for embedding in embeddings)
+        assert DNCAgent().check_and_update_network_state(copy.deepcopy(networks)) is None
+
+        # The snapshot was not changed
+        for network, expected in zip(snapshot, before):
+            for u, v, ac in network.get_network_graph().edges(data='arrival_curve'):
+                assert ac.rate == expected.get_network_graph()[u][v]['arrival_curve'].rate
+
+    def test_topology_change_copies_snapshot(self, ring_network):
+        manager, _ = ring_network()
+        version, snapshot = manager.get_snapshot()
+        nodes = len(snapshot[0].get_network_graph())
+
+        manager.add_node(Node('s100', 100))
+        assert len(snapshot[0].get_network_graph()) == nodes
+        assert len(manager.get_current_networks()[0].get_network_graph()) == nodes + 1
+        assert manager.get_changed_edges(version) is None
+
+    def test_topology_change_places_prepared_options(self, ring_network, requests):
+        manager, hosts = ring_network()
+        flows = requests(hosts, count=40)
+        batch, _ = mixed().embed_flow_batch(flows, manager.get_current_networks())
+
+        # The strategy of every flow is sampled once, in prepare()
+        admission = OptimisticAdmission(mixed(), workers=1)
+        version, snapshot = manager.get_snapshot()
+        options = admission.prepare(flows, snapshot)
+        proposals = admission.evaluate(flows, options, snapshot)
+        manager.add_node(Node('s100', 100))
+        embeddings, _ = admission.commit(flows, options, proposals, manager.get_current_networks(),
+                                         manager.get_changed_edges(version))
+        assert placements(embeddings) == placements(batch)
+        assert admission.get_statistics()['conflicts'] == len(flows)
+
+        # Options on removed links are left out
+        flow_manager = mixed()
+        admission = OptimisticAdmission(flow_manager, workers=1)
+        version, snapshot = manager.get_snapshot()
+        options = admission.prepare(flows, snapshot)
+        proposals = admission.evaluate(flows, options, snapshot)
+        assert any((0, 1) in path for flow_options in options for _, path, _ in flow_options)
+        manager.remove_edge(6)
+        embeddings, networks = admission.commit(flows, options, proposals, manager.get_current_networks(),
+                                                manager.get_changed_edges(version))
+        assert any(embedding is not None for embedding in embeddings)
+        assert all((0, 1) not in embedding.path for embedding in embeddings if embedding is not None)
+        assert len(flow_manager.get_flow_table()) == sum(embedding is not None for embedding in embeddings)
+        assert DNCAgent().check_and_update_network_state(copy.deepcopy(networks)) is None
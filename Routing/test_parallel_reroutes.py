@@ -0,0 +1,68 @@
+import copy
+import pickle
+
+import pytest
+
+from Routing.routing import FlowManager, FlowRequest, LCDNStrategy
+
+
+@pytest.fixture
+def replay(idle_networks, embed_flows):
+    def replay(flow_manager, deadline, start=0, stop=60, networks=None):
+        """
+        Embeds requests ``start`` to ``stop`` of a fixed sequence on the networks (a fresh ring network by default)
+        and returns the placements of the admitted and rerouted flows and the networks.
+        """
+        idle, hosts = idle_networks()
+        flow_requests = [FlowRequest(hosts[i % 12], hosts[(i * 5 + 3) % 12], 0, 80000, 5e6, deadline) for i in range(start, stop)]
+        embeddings, networks, rerouted = embed_flows(flow_manager, flow_requests, idle if networks is None else networks)
+        placements = [None if embedding is None else
+                      (embedding.id, embedding.path, embedding.priority, [(flow.id, flow.path, flow.priority) for flow in moved])
+                      for embedding, moved in zip(embeddings, rerouted)]
+        return placements, networks
+    return replay
+
+
+def flow_manager(strategy, workers):
+    manager = FlowManager()
+    manager.set_strategy(strategy)
+    manager.set_parallel_reroutes(workers)
+    return manager
+
+
+class TestParallelReroutes:
+    @pytest.mark.parametrize('strategy, deadline', [(LCDNStrategy.GREEDY, 0.02), (LCDNStrategy.NOTGREEDY, 0.003)])
+    def test_same_as_sequential(self, replay, strategy, deadline):
+        sequential = flow_manager(strategy, 0)
+        parallel = flow_manager(strategy, 2)
+        try:
+            expected, _ = replay(sequential, deadline)
+            placements, _ = replay(parallel, deadline)
+        finally:
+            parallel.close()
+
+        assert placements == expected
+        assert parallel.get_number_of_reroutes() == sequential.get_number_of_reroutes() > 0
+
+    def test_copy_and_close(self, replay):
+        expected, _ = replay(flow_manager(LCDNStrategy.GREEDY, 0), 0.02, stop=70)
+        parallel = flow_manager(LCDNStrategy.GREEDY, 2)
+        try:
+            placements, networks = replay(parallel, 0.02)
+            assert placements == expected[:60]
+
+            # The copies do not share the pool of the manager
+            copied = copy.deepcopy(parallel)
+            unpickled = pickle.loads(pickle.dumps(parallel))
+            assert unpickled.get_flow_table().keys() == parallel.get_flow_table().keys()
+        finally:
+            parallel.close()
+        parallel.close()
+
+        # Closed managers and copies start a new pool when they reroute again
+        for manager in (parallel, copied):
+            try:
+                placements, _ = replay(manager, 0.02, start=60, stop=70, networks=copy.deepcopy(networks))
+            finally:
+                manager.close()
+            assert placements == expected[60:]
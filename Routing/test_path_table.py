@@ -0,0 +1,120 @@
+import functools
+
+import numpy as np
+
+from Routing.path_table import PathTable
+from Routing.flow_index import EdgeFlowIndex
+from Routing.routing import FlowManager, LCDNStrategy
+
+
+class TestPathTable:
+    def test_intern_is_idempotent(self):
+        table = PathTable()
+        path = [(1, 2), (2, 3)]
+        path_id = table.intern(path)
+        assert table.intern([(1, 2), (2, 3)]) == path_id
+        assert table.canonical([(1, 2), (2, 3)]) is table.get_path(path_id)
+        assert table.intern([(1, 2), (2, 4)]) != path_id
+        assert len(table) == 2
+
+    def test_edge_arrays_and_bitsets(self):
+        table = PathTable()
+        path_id = table.intern([(1, 2), (2, 3), (3, 4)])
+        edge_ids = table.get_edge_ids(path_id)
+        assert [table.get_edge(e) for e in edge_ids] == [(1, 2), (2, 3), (3, 4)]
+        assert table.get_bitset(path_id).bit_count() == 3
+
+    def test_overlaps(self):
+        table = PathTable()
+        a = table.intern([(1, 2), (2, 3), (3, 4)])
+        b = table.intern([(5, 2), (2, 3), (3, 4)])
+        c = table.intern([(4, 3), (3, 2)])
+        assert table.overlap(a, b) == 2
+        assert table.overlap(a, c) == 0
+        assert table.overlaps(a, np.array([a, b, c])).tolist() == [3, 2, 0]
+
+    def test_collect(self):
+        table = PathTable(min_collect=4)
+        a = table.intern([(1, 2), (2, 3)])
+        b = table.intern([(1, 2), (2, 4)])
+        c = table.intern([(5, 2), (2, 3)])
+        table.acquire(a)
+        table.acquire(a)
+        table.release(a)
+        table.acquire(c)
+
+        # Below the collection size nothing is evicted
+        assert table.collect() == 0 and len(table) == 3
+        assert table.collect(force=True) == 1
+        assert a in table and b not in table and c in table
+        assert table.get_path(a) == [(1, 2), (2, 3)]
+
+        # Evicted ids are not reused
+        assert table.intern([(1, 2), (2, 4)]) not in (a, b, c)
+        assert table.intern([(1, 2), (2, 3)]) == a
+
+        table.release(a)
+        table.release(c)
+        assert table.references(a) == 0
+        for i in range(2):
+            table.intern([(i, 10), (10, 11)])
+        assert len(table) == 5 and table.collect() == 5 and len(table) == 0
+        assert table.get_edge(table.find_edge_id((2, 4))) == (2, 4)
+
+
+class TestPathCollection:
+    def test_collection_between_embeddings(self, idle_networks, requests, embed_flows, monkeypatch):
+        """ Evicting every unreferenced path at each collection point gives the same embeddings as keeping them all """
+        managers = []
+        for collect in (False, True):
+            networks, hosts = idle_networks()
+            flow_manager = FlowManager()
+            flow_manager.set_strategy(LCDNStrategy.GREEDY)
+            flow_manager.set_promotion(True)
+            paths = flow_manager.get_path_table()
+            if collect:
+                monkeypatch.setattr(paths, 'collect', functools.partial(PathTable.collect, paths, True))
+
+            _, networks, _ = embed_flows(flow_manager, requests(hosts, count=30), networks)
+            flow_ids = sorted(flow_manager.get_flow_table())
+            _, networks = flow_manager.remove_flows(flow_ids[::3], networks)
+            for flow_id in flow_ids[1::3]:
+                modified, new_networks, _ = flow_manager.modify_flow(flow_id, networks, rate=4e7)
+                if modified is not None:
+                    networks = new_networks
+            for flow_id in flow_ids[2::3]:
+                # Does not fit anywhere, the flow is restored on its old path
+                assert flow_manager.modify_flow(flow_id, networks, rate=1e12)[0] is None
+            embed_flows(flow_manager, requests(hosts, count=10, seed=1), networks)
+            managers.append(flow_manager)
+
+        kept, collected = managers
+        assert collected.get_all_flows() == kept.get_all_flows()
+        assert collected.get_demoted_flows() == kept.get_demoted_flows()
+        assert collected.get_number_of_reroutes() == kept.get_number_of_reroutes() > 0
+
+        # Only the paths of embedded flows and of demotions are left after a collection
+        paths = collected.get_path_table()
+        paths.collect()
+        referenced = {tuple(flow['path']) for flow in collected.get_all_flows()}
+        referenced.update(tuple(path) for path, _ in collected.get_demoted_flows().values())
+        assert len(paths) == len(referenced) < len(kept.get_path_table())
+
+
+class TestEdgeFlowIndex:
+    def test_top_overlapping(self):
+        table = PathTable()
+        index = EdgeFlowIndex(table)
+        new_path = table.intern([(1, 2), (2, 3), (3, 4)])
+        index.add(1, table.intern([(5, 2), (2, 3)]))
+        index.add(2, table.intern([(1, 2), (2, 3), (3, 4)]))
+        index.add(3, table.intern([(7, 8)]))
+        index.add(4, table.intern([(0, 1), (1, 2)]))
+
+        assert index.top_overlapping(new_path, 10) == [2, 1, 4]
+        assert index.top_overlapping(new_path, 2) == [2, 1]
+
+        index.move(2, table.intern([(1, 2), (2, 3), (3, 4)]), table.intern([(9, 8)]))
+        index.remove(4, table.intern([(0, 1), (1, 2)]))
+        assert index.top_overlapping(new_path, 10) == [1]
+        assert index.flows_on_edge((7, 8)) == {3}
@@ -0,0 +1,43 @@
+from Routing.phase_timer import PhaseHistogram, PhaseTimer
+
+
+class TestPhaseTimer:
+    def test_nested_phases(self):
+        timer = PhaseTimer(enabled=True, trace=True)
+        for _ in range(3):
+            with timer.phase('embed'):
+                with timer.phase('routing'):
+                    pass
+                with timer.phase('check'):
+                    pass
+                with timer.phase('check'):
+                    pass
+
+        histograms = timer.get_histograms()
+        assert list(histograms) == ['embed', 'embed/check', 'embed/routing']
+        assert histograms['embed']['count'] == 3
+        assert histograms['embed/check']['count'] == 6
+        assert set(timer.get_last_trace()) == {'embed', 'embed/check', 'embed/routing'}
+
+        timer.reset()
+        assert timer.get_histograms() == {}
+
+    def test_disabled(self):
+        timer = PhaseTimer()
+        with timer.phase('embed'):
+            pass
+        assert timer.get_histograms() == {}
+        assert not timer.is_tracing()
+
+    def test_histogram(self):
+        histogram = PhaseHistogram()
+        for duration_ns in [1000] * 99 + [1000000]:
+            histogram.add(duration_ns)
+
+        summary = histogram.summary()
+        assert summary['count'] == 100
+        assert summary['max_ns'] == 1000000
+        assert summary['p50_ns'] == 1024
+        assert summary['p99_ns'] == 1024
+        assert histogram.percentile(100) == 1000000
+        assert summary['buckets'] == {1024: 99, 1 << 20: 1}
@@ -0,0 +1,42 @@
+import copy
+
+from NetworkCalculus.dnc import DNCAgent
+from Routing.routing import FlowManager, LCDNStrategy
+
+
+class TestPromotion:
+    def test_demoted_flows_are_promoted_after_removals(self, idle_networks, requests, embed_flows):
+        networks, hosts = idle_networks()
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(LCDNStrategy.GREEDY)
+        flow_manager.set_promotion(True)
+        _, networks, _ = embed_flows(flow_manager, requests(hosts, count=30), networks)
+
+        demoted = flow_manager.get_demoted_flows()
+        assert len(demoted) == flow_manager.get_number_of_reroutes() > 0
+        for flow_id, (_, priority) in demoted.items():
+            assert flow_manager.get_flow_table()[flow_id].priority > priority
+
+        others = [flow_id for flow_id in flow_manager.get_flow_table() if flow_id not in demoted]
+        _, networks = flow_manager.remove_flows(others, networks)
+
+        assert flow_manager.get_number_of_promotions() > 0
+        assert len(flow_manager.get_demoted_flows()) < len(demoted)
+        for flow_id, (path, priority) in demoted.items():
+            embedded_flow = flow_manager.get_flow_table()[flow_id]
+            if flow_id not in flow_manager.get_demoted_flows():
+                assert (embedded_flow.path, embedded_flow.priority) == (path, priority)
+        assert DNCAgent().check_and_update_network_state(copy.deepcopy(networks)) is None
+
+    def test_no_promotion_when_disabled(self, idle_networks, requests, embed_flows):
+        networks, hosts = idle_networks()
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(LCDNStrategy.GREEDY)
+        _, networks, _ = embed_flows(flow_manager, requests(hosts, count=30), networks)
+
+        demoted = flow_manager.get_demoted_flows()
+        others = [flow_id for flow_id in flow_manager.get_flow_table() if flow_id not in demoted]
+        flow_manager.remove_flows(others, networks)
+
+        assert flow_manager.get_number_of_promotions() == 0
+        assert flow_manager.get_demoted_flows() == demoted
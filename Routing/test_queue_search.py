@@ -0,0 +1,57 @@
+import copy
+
+import pytest
+
+from NetworkCalculus.dnc import DNCAgent, Violation
+from Routing.routing import FlowManager, FlowRequest, LCDNStrategy, QueueSearch
+
+
+def notgreedy(search):
+    flow_manager = FlowManager()
+    flow_manager.set_strategy(LCDNStrategy.NOTGREEDY)
+    flow_manager.set_queue_search(search)
+    flow_manager.set_reroutes(0)
+    return flow_manager
+
+
+def fits(flow_manager, flow_request, path, queue, networks):
+    embed_result, _ = flow_manager.embed_flow_on_path(flow_request, path, queue, networks, True)
+    return type(embed_result) is not Violation
+
+
+class TestQueueSearch:
+    def test_deadline_bound_skips_no_feasible_queue(self, idle_networks, requests):
+        networks, hosts = idle_networks()
+        flow_manager = notgreedy(QueueSearch.LINEAR)
+        thresholds = [network.get_threshold() for network in networks]
+        checked = 0
+        for flow_request in requests(hosts, count=40, seed=3):
+            linear = copy.deepcopy(flow_manager)
+            embedding, new_networks, _ = linear.embed_new_flow(flow_request, networks)
+            if embedding is None:
+                continue
+
+            # Every skipped queue fails the DNC check, and the embedding is the lowest priority queue that fits
+            for queue in range(len(networks)):
+                if DNCAgent.deadline_bound(len(embedding.path), queue, thresholds) > flow_request.deadline:
+                    assert not fits(flow_manager, flow_request, embedding.path, queue, networks)
+                    checked += 1
+            lowest = max(queue for queue in range(len(networks))
+                         if fits(flow_manager, flow_request, embedding.path, queue, networks))
+            assert embedding.priority == lowest
+
+            flow_manager, networks = linear, new_networks
+        assert checked > 0
+
+    @pytest.mark.parametrize('deadline', [0.002, 0.003, 0.005, 0.01, 0.02, 0.2])
+    def test_bisect_on_monotone_case(self, idle_networks, deadline):
+        # A single flow on an empty network fits a queue exactly when its deadline bound meets the deadline
+        for src, dst in [(0, 1), (0, 4), (2, 9)]:
+            networks, hosts = idle_networks()
+            flow_request = FlowRequest(hosts[src], hosts[dst], 0, 8000, 1e6, deadline)
+            linear, _, _ = notgreedy(QueueSearch.LINEAR).embed_new_flow(flow_request, networks)
+            bisect, _, _ = notgreedy(QueueSearch.BISECT).embed_new_flow(flow_request, networks)
+            if linear is None:
+                assert bisect is None
+            else:
+                assert (bisect.path, bisect.priority) == (linear.path, linear.priority)
@@ -0,0 +1,71 @@
+import copy
+import threading
+import time
+
+from manager import LCDN
+from NetworkCalculus.cost_models import DelayCostModel
+from NetworkCalculus.dnc import DNCAgent
+from Routing.rebalancer import Rebalancer
+from Routing.routing import FlowManager, LCDNStrategy
+
+
+def max_load(rebalancer, networks):
+    return max(rebalancer._load(network, edge) for network in networks for edge in network.get_network_graph().edges)
+
+
+class TestRebalancer:
+    def test_step_lowers_load_and_keeps_state_consistent(self, ring_network, requests):
+        manager, hosts = ring_network()
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(LCDNStrategy.GREEDY)
+        _, networks = flow_manager.embed_flow_batch(requests(hosts, count=40), manager.get_current_networks())
+
+        rebalancer = Rebalancer(flow_manager)
+        moved, rebalanced = rebalancer.step(networks, time_slice=1.0)
+        # The GREEDY embedding leaves room to spread the load
+        assert moved
+        assert rebalancer.get_statistics()['moves'] >= len(moved)
+        assert max_load(rebalancer, rebalanced) < max_load(rebalancer, networks)
+
+        # The rebalanced state equals a fresh reservation of all flows on their new routes
+        fresh = manager.get_current_networks()
+        dnc = DNCAgent()
+        for flow in flow_manager.get_flow_table().values():
+            assert dnc.reserve_resources(flow.flow_reservation, fresh, flow.priority) is None
+        assert dnc.check_and_update_network_state(fresh) is None
+        for a, b in zip(rebalanced, fresh):
+            for u, v, data in a.get_network_graph().edges(data=True):
+                expected = b.get_network_graph()[u][v]['arrival_curve']
+                assert abs(data['arrival_curve'].rate - expected.rate) <= 1e-6 * max(1, expected.rate)
+                assert abs(data['arrival_curve'].burst - expected.burst) <= 1e-6 * max(1, expected.burst)
+
+    def test_step_without_flows_does_nothing(self, idle_networks):
+        networks, _ = idle_networks()
+        before = copy.deepcopy(networks)
+
+        moved, result = Rebalancer(FlowManager()).step(networks)
+        assert moved == [] and result is networks
+        for a, b in zip(result, before):
+            assert dict(a.get_network_graph().edges).keys() == dict(b.get_network_graph().edges).keys()
+
+    def test_lcdn_reads_and_settings_wait_for_a_step(self, ring_network, requests, tmp_path):
+        lcdn = LCDN(str(tmp_path / 'LCDN.log'))
+        _, hosts = ring_network(manager=lcdn)
+        flow_ids = [admission['id'] for admission in lcdn.embed_flows(requests(hosts, count=10)) if admission]
+        calls = [lambda: lcdn.find_flows(priority=0), lcdn.get_flow_columns, lcdn.get_all_flows_with_information,
+                 lambda: lcdn.get_flows_with_information(flow_ids), lcdn.get_flows_per_queue,
+                 lambda: lcdn.get_lease_expiry(flow_ids[0]), lambda: lcdn.get_delay_of_flow(flow_ids[0]),
+                 lambda: lcdn.set_cost_model(DelayCostModel()), lambda: lcdn.set_time_budget(None),
+                 lambda: lcdn.set_random_seed(1), lambda: lcdn.set_parallel_reroutes(0)]
+
+        # Holding the lock like a running rebalancing step
+        with lcdn._lock:
+            threads = [threading.Thread(target=call) for call in calls]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+            assert all(thread.is_alive() for thread in threads)
+        for thread in threads:
+            thread.join(5)
+        assert not any(thread.is_alive() for thread in threads)
+        lcdn.close()
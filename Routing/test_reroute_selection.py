@@ -0,0 +1,71 @@
+import pytest
+
+from NetworkCalculus.dnc import Violation
+from Routing.routing import FlowManager, FlowRequest, LCDNStrategy, RerouteSelection
+
+
+@pytest.fixture
+def embed(idle_networks, embed_flows):
+    def embed(profiles, strategy=LCDNStrategy.GREEDY, reroutes=10):
+        """ Embeds the (src, dst, burst, rate) flows on an idle ring. Hosts 0, 1 are on switch 0, 2, 3 on switch 1, ... """
+        networks, hosts = idle_networks()
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(strategy)
+        flow_manager.set_reroutes(reroutes)
+        flow_manager.set_reroute_selection(RerouteSelection.BOTTLENECK)
+        flow_requests = [FlowRequest(hosts[src], hosts[dst], 0, burst, rate, 0.02) for src, dst, burst, rate in profiles]
+        embeddings, networks, _ = embed_flows(flow_manager, flow_requests, networks)
+        thresholds = [network.get_threshold() for network in networks]
+        return flow_manager, [embedding.id for embedding in embeddings], thresholds
+    return embed
+
+
+class TestBottleneckSelection:
+    def test_ranked_by_rate_contribution(self, embed):
+        flow_manager, (small, large, medium), thresholds = embed([(0, 4, 8000, 1e6), (1, 5, 8000, 3e6), (0, 5, 8000, 2e6)])
+        path = flow_manager.get_flow_table()[small].path
+        violation = Violation('Rate', (0, 1), 1e9, 2e9, 0)
+
+        assert flow_manager.reroute_candidates(path, violation, thresholds) == [large, medium, small]
+
+    def test_ties_by_flow_id(self, embed):
+        flow_manager, flow_ids, thresholds = embed([(0, 4, 8000, 1e6), (1, 5, 8000, 1e6), (0, 5, 8000, 1e6)])
+        path = flow_manager.get_flow_table()[flow_ids[0]].path
+        violation = Violation('Rate', (0, 1), 1e9, 2e9, 0)
+
+        assert flow_manager.reroute_candidates(path, violation, thresholds) == sorted(flow_ids)
+
+    def test_delay_contribution_grows_per_hop(self, embed):
+        # Same profile, but the burst of the first flow has grown over one more hop when it reaches (1, 2)
+        flow_manager, (far, near), thresholds = embed([(0, 4, 8000, 1e6), (2, 4, 8000, 1e6)])
+        path = flow_manager.get_flow_table()[near].path
+        violation = Violation('Delay', (1, 2), 1e-3, 2e-3, 0)
+
+        assert flow_manager.reroute_candidates(path, violation, thresholds) == [far, near]
+
+    def test_other_priorities_and_remaining_slots(self, embed):
+        flow_manager, (crossing, large, beside, disjoint), thresholds = embed(
+            [(0, 4, 8000, 1e6), (1, 5, 8000, 5e6), (2, 4, 8000, 5e6), (6, 10, 8000, 1e6)], reroutes=3)
+        path = flow_manager.get_flow_table()[crossing].path
+
+        # The flows crossing the violated edge first, then the other flows on the path by overlap
+        violation = Violation('Rate', (0, 1), 1e9, 2e9, 0)
+        assert flow_manager.reroute_candidates(path, violation, thresholds) == [large, crossing, beside]
+
+        # Flows in another queue do not relieve it (GREEDY): only the overlap ranking is left
+        violation = Violation('Rate', (0, 1), 1e9, 2e9, 1)
+        assert flow_manager.reroute_candidates(path, violation, thresholds) == [crossing, large, beside]
+
+    def test_empty_candidates(self, embed):
+        flow_manager, (flow_id,), thresholds = embed([(0, 4, 8000, 1e6)])
+        # No flow crosses the violated edge and none shares an edge with the path
+        path = [(6, 3), (3, 4), (4, 8)]
+        assert flow_manager.reroute_candidates(path, Violation('Rate', (3, 4), 1e9, 2e9, 0), thresholds) == []
+        assert flow_manager.reroute_candidates(path, None, thresholds) == []
+
+        # No flow crosses the violated edge, the flows on the path are ranked by overlap
+        path = flow_manager.get_flow_table()[flow_id].path
+        assert flow_manager.reroute_candidates(path, Violation('Rate', (3, 4), 1e9, 2e9, 0), thresholds) == [flow_id]
+
+        empty, _, thresholds = embed([])
+        assert empty.reroute_candidates(path, Violation('Rate', (0, 1), 1e9, 2e9, 0), thresholds) == []
@@ -0,0 +1,88 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from Routing.csr_routing import CSRTopology
+from Routing.spt_cache import ShortestPathTreeCache
+
+
+def graph_with_hosts(seed: int, switches: int = 30, ties: bool = False) -> nx.DiGraph:
+    rng = np.random.default_rng(seed)
+    graph = nx.DiGraph(nx.connected_watts_strogatz_graph(switches, 4, 0.3, seed=seed))
+    for switch in range(switches):
+        host = switches + switch
+        graph.add_edge(host, switch)
+        graph.add_edge(switch, host)
+    for u, v in graph.edges():
+        # Small integer costs give many shortest paths of the same cost
+        graph[u][v]['cost'] = float(rng.integers(1, 3)) if ties else 1.0 + rng.random()
+    return graph
+
+
+class TestShortestPathTreeCache:
+    @pytest.mark.parametrize('seed', [1, 2, 3])
+    def test_repair_matches_fresh_dijkstra(self, seed):
+        rng = np.random.default_rng(seed)
+        graph = graph_with_hosts(seed)
+        topology = CSRTopology(graph)
+        cache = ShortestPathTreeCache(topology)
+        sources = [30 + i for i in range(0, 30, 3)]
+
+        for _ in range(30):
+            for src in sources:
+                for dst in range(30, 60, 7):
+                    path = cache.shortest_path(src, dst)
+                    fresh = CSRTopology(graph)
+                    fresh.set_costs(topology.costs)
+                    assert topology.path_cost(path) == pytest.approx(fresh.path_cost(fresh.shortest_path(src, dst)))
+
+            # Raise the costs along a path (embedding) or lower random edges (removal)
+            costs = topology.costs.copy()
+            path = cache.shortest_path(int(rng.choice(sources)), 45)
+            for i in range(len(path) - 1):
+                costs[topology.edge_index((path[i], path[i + 1]))] += 5.0 * rng.random()
+            lowered = rng.choice(len(costs), size=5, replace=False)
+            costs[lowered] = np.maximum(1.0, costs[lowered] - 3.0 * rng.random(5))
+            cache.update_costs(costs)
+
+        assert cache.get_statistics()['repairs'] > 0
+
+    @pytest.mark.parametrize('seed', [1, 2])
+    def test_repair_breaks_ties_like_fresh_dijkstra(self, seed):
+        rng = np.random.default_rng(seed)
+        graph = graph_with_hosts(seed, ties=True)
+        topology = CSRTopology(graph)
+        cache = ShortestPathTreeCache(topology)
+        sources = [30 + i for i in range(0, 30, 3)]
+        assert any(len(list(nx.all_shortest_paths(graph, src, 45, weight='cost'))) > 1 for src in sources)
+
+        for step in range(30):
+            fresh = CSRTopology(graph)
+            fresh.set_costs(topology.costs)
+            for src in sources:
+                for dst in range(30, 60, 7):
+                    assert cache.shortest_path(src, dst) == fresh.shortest_path(src, dst)
+
+            costs = topology.costs.copy()
+            if step % 2 == 0:
+                # Flow removals lower the costs along a path back to the idle cost
+                path = cache.shortest_path(int(rng.choice(sources)), 45)
+                for i in range(len(path) - 1):
+                    costs[topology.edge_index((path[i], path[i + 1]))] = 1.0
+                costs[rng.choice(len(costs), size=5, replace=False)] = 1.0
+            else:
+                # Capacity changes raise or lower the costs of random edges
+                changed = rng.choice(len(costs), size=8, replace=False)
+                costs[changed] = rng.integers(1, 4, size=8).astype(np.float64)
+            cache.update_costs(costs)
+
+        assert cache.get_statistics()['repairs'] > 0
+
+    def test_host_source_uses_switch_tree(self):
+        graph = graph_with_hosts(4)
+        cache = ShortestPathTreeCache(CSRTopology(graph))
+        path = cache.shortest_path(30, 45)
+        assert path[0] == 30 and path[1] == 0 and path[-1] == 45
+        assert cache.shortest_path(30, 30) == [30]
+        cache.shortest_path(30, 50)
+        assert cache.get_statistics()['builds'] == 1
@@ -0,0 +1,47 @@
+import numpy as np
+
+from Routing.routing import FlowManager, LCDNStrategy
+
+
+def decisions(flow_manager, count):
+    return [flow_manager.strategy_for_flow() for _ in range(count)]
+
+
+def greedy_mix(seed, p=0.3):
+    flow_manager = FlowManager(seed)
+    flow_manager.set_strategy(LCDNStrategy.GREEDYMIX)
+    flow_manager.set_greedy_p(p)
+    return flow_manager
+
+
+class TestStrategySampling:
+    def test_seeded_instances_are_reproducible(self):
+        count = FlowManager.STRATEGY_BLOCK + 10
+        first = decisions(greedy_mix(7), count)
+        np.random.seed(1)
+        second = decisions(greedy_mix(7), count)
+        assert first == second
+        assert decisions(greedy_mix(8), count) != first
+        assert set(first) == {LCDNStrategy.GREEDY, LCDNStrategy.NOTGREEDY}
+
+    def test_global_random_state_is_not_used(self):
+        np.random.seed(3)
+        expected = np.random.random()
+        np.random.seed(3)
+        decisions(greedy_mix(None), 100)
+        assert np.random.random() == expected
+
+    def test_probability_change_applies_immediately(self):
+        flow_manager = greedy_mix(1, p=0.0)
+        assert set(decisions(flow_manager, 10)) == {LCDNStrategy.NOTGREEDY}
+        flow_manager.set_greedy_p(1.0)
+        assert set(decisions(flow_manager, 10)) == {LCDNStrategy.GREEDY}
+
+        flow_manager.set_greedy_p(0.3)
+        greedy = decisions(flow_manager, 4000).count(LCDNStrategy.GREEDY) / 4000
+        assert 0.25 < greedy < 0.35
+
+    def test_other_strategies_do_not_sample(self):
+        flow_manager = FlowManager(0)
+        flow_manager.set_strategy(LCDNStrategy.NOTGREEDY)
+        assert set(decisions(flow_manager, 5)) == {LCDNStrategy.NOTGREEDY}
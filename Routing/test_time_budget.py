@@ -0,0 +1,91 @@
+import copy
+
+import pytest
+
+import Routing.routing as routing
+from Routing.routing import FlowManager, FlowRequest, LCDNStrategy
+
+
+class Clock(object):
+    """ Replaces perf_counter in the routing module. Every reading advances the time by one second. """
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        self.now += 1.0
+        return self.now
+
+
+class InlinePool(object):
+    """ Reroute pool that evaluates in this process and records the number of candidates of each batch """
+    def __init__(self):
+        self.batches = []
+
+    def map(self, function, chunks, chunksize=None):
+        self.batches.append(sum(len(chunk[3]) for chunk in chunks))
+        return [function(chunk) for chunk in chunks]
+
+
+@pytest.fixture
+def fill(idle_networks, embed_flows):
+    def fill(count, first_queue=0, init_ksp=1, burst=8000, rate=1e6):
+        """ Embeds the first ``count`` requests of a fixed sequence and returns the manager, networks and next request. """
+        networks, hosts = idle_networks()
+        flow_manager = FlowManager()
+        flow_manager.set_strategy(LCDNStrategy.GREEDY)
+        flow_manager.set_first_queue(first_queue)
+        flow_manager.set_init_ksp(init_ksp)
+        flow_requests = [FlowRequest(hosts[i % 12], hosts[(i * 5 + 3) % 12], 0, burst, rate, 0.2) for i in range(count + 1)]
+        embeddings, networks, _ = embed_flows(flow_manager, flow_requests[:-1], networks)
+        assert None not in embeddings
+        return flow_manager, networks, flow_requests[-1]
+    return fill
+
+
+class TestTimeBudget:
+    def test_expiry_mid_routing(self, fill, monkeypatch):
+        flow_manager, networks, flow_request = fill(100, first_queue=3, init_ksp=3)
+        reference = copy.deepcopy(flow_manager)
+        embedding, _, _ = reference.embed_new_flow(flow_request, networks)
+        assert embedding is not None
+
+        # The budget runs out before the second shortest path is tried
+        monkeypatch.setattr(routing, 'time', Clock())
+        flow_manager.set_time_budget(0.0)
+        embedding, _, _ = flow_manager.embed_new_flow(flow_request, networks)
+        assert embedding is None
+        assert flow_manager.get_budget_exhaustions() == 1
+
+    def test_rejected_instead_of_rerouting(self, fill, monkeypatch):
+        flow_manager, networks, flow_request = fill(37, burst=80000, rate=5e6)
+        reference = copy.deepcopy(flow_manager)
+        embedding, _, rerouted = reference.embed_new_flow(flow_request, networks)
+        assert embedding is not None and rerouted
+
+        monkeypatch.setattr(routing, 'time', Clock())
+        flow_manager.set_time_budget(1.0)
+        embedding, _, _ = flow_manager.embed_new_flow(flow_request, networks)
+        assert embedding is None
+        assert flow_manager.get_budget_exhaustions() == 1
+        assert flow_manager.get_number_of_reroutes() == 0
+
+    def test_expiry_between_parallel_reroute_batches(self, fill, monkeypatch):
+        # Flows in the lowest queue cannot be rerouted, so every candidate is evaluated without a budget
+        flow_manager, networks, flow_request = fill(100, first_queue=3)
+        flow_manager.set_parallel_reroutes(2)
+        pool = InlinePool()
+        monkeypatch.setattr(flow_manager, '_get_reroute_pool', lambda: pool)
+        reference = copy.deepcopy(flow_manager)
+        reference_pool = InlinePool()
+        monkeypatch.setattr(reference, '_get_reroute_pool', lambda: reference_pool)
+        embedding, _, _ = reference.embed_new_flow(flow_request, networks)
+        assert embedding is None
+        assert len(reference_pool.batches) == 1 and reference_pool.batches[0] > 2
+
+        # The budget is read when the embedding starts, before rerouting and before each batch
+        monkeypatch.setattr(routing, 'time', Clock())
+        flow_manager.set_time_budget(3.0)
+        embedding, _, _ = flow_manager.embed_new_flow(flow_request, networks)
+        assert embedding is None
+        assert pool.batches == [2]
+        assert flow_manager.get_budget_exhaustions() == 1
@@ -0,0 +1,51 @@
+import pytest
+
+from Routing.timer_wheel import TimerWheel
+
+
+class TestTimerWheel:
+    def test_expires_in_order_and_not_early(self):
+        wheel = TimerWheel(tick=1.0, slots=8)
+        wheel.schedule('a', 2.5)
+        wheel.schedule('b', 1.0)
+        wheel.schedule('c', 30.0)
+
+        assert wheel.advance(0.9) == []
+        assert wheel.advance(1.0) == ['b']
+        assert wheel.advance(2.9) == []
+        assert wheel.advance(3.0) == ['a']
+        assert len(wheel) == 1
+
+        # c is several rounds ahead and shares a slot with earlier ticks
+        assert wheel.advance(29.0) == []
+        assert wheel.advance(31.0) == ['c']
+        assert len(wheel) == 0
+
+    def test_cancel_and_reschedule(self):
+        wheel = TimerWheel(tick=0.5, slots=4)
+        wheel.schedule(1, 1.0)
+        wheel.schedule(2, 1.0)
+        assert wheel.cancel(1)
+        assert not wheel.cancel(1)
+        wheel.schedule(2, 5.0)
+
+        assert wheel.advance(2.0) == []
+        assert 2 in wheel
+        assert wheel.get_expiry(2) == pytest.approx(5.0)
+        assert wheel.advance(5.0) == [2]
+
+    def test_bulk_expiry_after_long_pause(self):
+        wheel = TimerWheel(tick=1.0, slots=16, now=100.0)
+        for i in range(1000):
+            wheel.schedule(i, 100.0 + i % 50)
+        wheel.schedule('late', 500.0)
+
+        expired = wheel.advance(200.0)
+        assert sorted(expired) == list(range(1000))
+        assert list(wheel._timers) == ['late']
+
+    def test_past_expiry_fires_on_next_tick(self):
+        wheel = TimerWheel(tick=1.0, now=10.0)
+        wheel.schedule('x', 3.0)
+        assert wheel.advance(10.5) == []
+        assert wheel.advance(11.0) == ['x']
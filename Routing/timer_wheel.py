@@ -0,0 +1,77 @@
+import logging
+import math
+from typing import Dict, Hashable, List, Union
+
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel(object):
+    """
+    Hashed timer wheel.
+
+    Time is divided into ticks of ``tick`` seconds and every timer is stored in the slot of its expiry tick (modulo the
+    number of slots). Scheduling and cancelling are O(1). Advancing the wheel only visits the slots of the ticks that
+    passed (all slots at most) and returns all timers that expired, so many timers expire in one call.
+
+    Timers never expire early: a timer expires with the first advance to a time at or after its expiry time rounded up
+    to the next tick.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512, now: float = 0.0):
+        self._tick = tick
+        self._slots: List[Dict[Hashable, int]] = [{} for _ in range(slots)]
+        self._timers: Dict[Hashable, int] = {}
+        self._current = math.floor(now / tick)
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def get_expiry(self, key: Hashable) -> Union[None, float]:
+        """ Time the timer expires (rounded up to its tick). """
+        tick = self._timers.get(key)
+        return None if tick is None else tick * self._tick
+
+    def schedule(self, key: Hashable, expires_at: float) -> None:
+        """ Schedules (or reschedules) the timer of ``key``. """
+        self.cancel(key)
+        tick = max(math.ceil(expires_at / self._tick), self._current + 1)
+        self._timers[key] = tick
+        self._slots[tick % len(self._slots)][key] = tick
+
+    def cancel(self, key: Hashable) -> bool:
+        tick = self._timers.pop(key, None)
+        if tick is None:
+            return False
+        del self._slots[tick % len(self._slots)][key]
+        return True
+
+    def advance(self, now: float) -> List[Hashable]:
+        """ Advances the wheel to ``now`` and returns the keys of all expired timers in expiry order. """
+        target = math.floor(now / self._tick)
+        if target <= self._current:
+            return []
+
+        num_slots = len(self._slots)
+        if target - self._current >= num_slots:
+            slots = range(num_slots)
+        else:
+            slots = [tick % num_slots for tick in range(self._current + 1, target + 1)]
+
+        expired = []
+        for slot in slots:
+            timers = self._slots[slot]
+            if not timers:
+                continue
+            due = [(tick, key) for key, tick in timers.items() if tick <= target]
+            for tick, key in due:
+                del timers[key]
+                del self._timers[key]
+            expired.extend(due)
+
+        self._current = target
+        expired.sort(key=lambda timer: timer[0])
+        return [key for _, key in expired]
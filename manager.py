@@ -1,118 +1,510 @@
+import atexit
 import logging
-from typing import List, Dict
+import queue
+import threading
+from enum import Enum
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Dict, Tuple
 import networkx as nx
 import time
 
 from Network.network_components import Edge, Node, Host, NetworkManager
-from Routing.routing import RoutingModule, FlowRequest, FlowManager, RerouteStrategy, LCDNStrategy, LCDNStrategy
+from Routing.routing import RoutingModule, FlowRequest, FlowManager, RerouteStrategy, LCDNStrategy, RoutingBackend, RerouteSelection, QueueSearch, AdmissionOrder
+from NetworkCalculus.cost_models import LinkCostModel
+from Routing.admission_planner import AdmissionPlanner, AdmissionPlan, PlanObjective
+from Routing.rebalancer import Rebalancer
+from Routing.optimistic_admission import OptimisticAdmission
 
 logger = logging.getLogger(__name__)
 FORMAT = '%(asctime)s %(levelname)s:%(name)s: %(message)s'
 
 
-class LCDN(object):
-    def __init__(self, logfile: str = 'LCDN.log'):
+class LogMode(Enum):
+    DEBUG = 1       # Everything from DEBUG on, written in the calling thread
+    PRODUCTION = 2  # Warnings and errors only, written by a background thread. Violations are sampled and counted.
+
+
+# Background writer of the PRODUCTION log and the handler that feeds it
+_log_listener = None
+_log_handler = None
+
+
+def _configure_logging(logfile: str, log_mode: LogMode):
+    global _log_listener, _log_handler
+
+    if log_mode != LogMode.PRODUCTION:
         logging.basicConfig(filename=logfile, level=logging.DEBUG, format=FORMAT, filemode='w')
+        return
+
+    root = logging.getLogger()
+    if _log_listener is not None:
+        _log_listener.stop()
+        root.removeHandler(_log_handler)
+    else:
+        atexit.register(lambda: _log_listener.stop())
+
+    file_handler = logging.FileHandler(logfile, mode='w')
+    file_handler.setFormatter(logging.Formatter(FORMAT))
+    log_queue = queue.SimpleQueue()
+    _log_handler = QueueHandler(log_queue)
+    _log_listener = QueueListener(log_queue, file_handler)
+    root.addHandler(_log_handler)
+    root.setLevel(logging.WARNING)
+    _log_listener.start()
+
+
+class LCDN(object):
+    def __init__(self, logfile: str = 'LCDN.log', log_mode: LogMode = LogMode.DEBUG, violation_sample: int = 1000):
+        """
+        :param log_mode: DEBUG logs every event to the file. PRODUCTION only logs warnings and errors through a queue
+                         that a background thread writes to the file, and logs every ``violation_sample``-th violation
+                         (all violations are counted, see get_violation_counts).
+        """
+        _configure_logging(logfile, log_mode)
         logger.info('LCDN-Manager started')
         self._network_manager= NetworkManager()
         self._flow_manager = FlowManager()
+        self._violations = self._flow_manager.get_dnc_agent().get_violation_log()
+        self._violations.set_sample(violation_sample if log_mode == LogMode.PRODUCTION else 1)
+        self._timer = self._flow_manager.get_phase_timer()
+        # Serializes changes of the flows and the network state (API threads, background rebalancing)
+        self._lock = threading.RLock()
+        self._rebalancer = Rebalancer(self._flow_manager)
+        self._rebalance_thread = None
+        self._rebalance_stop = threading.Event()
 
     """ Function to change the Graph """
     def add_node(self, node: Node) -> bool:
-        return self._network_manager.add_node(node)
+        with self._lock:
+            return self._network_manager.add_node(node)
 
     def add_edge(self, edge: Edge) -> bool:
-        return self._network_manager.add_edge(edge)
+        with self._lock:
+            return self._network_manager.add_edge(edge)
 
     def add_host(self, host: Host) -> bool:
-        return self._network_manager.add_host(host)
+        with self._lock:
+            return self._network_manager.add_host(host)
 
     def remove_node(self, node_id: int) -> bool:
-        return self._network_manager.remove_node(node_id)
+        with self._lock:
+            return self._network_manager.remove_node(node_id)
 
     def remove_edge(self, edge_id: int) -> bool:
-        return self._network_manager.remove_edge(edge_id)
+        with self._lock:
+            return self._network_manager.remove_edge(edge_id)
 
     def remove_host(self, host_id: int) -> bool:
-        return self._network_manager.remove_host(host_id)
+        with self._lock:
+            return self._network_manager.remove_host(host_id)
 
     """ Functions to embed and manage flows """
-    def embed_flow(self, flow_request: FlowRequest):
+    def embed_flow(self, flow_request: FlowRequest, ttl: float = None):
         """ Returns FlowAdmission or None
 
+        With a ttl (seconds) the flow gets a lease and is removed if the lease is not renewed in time. With phase
+        tracing, the admission holds the time (ns) of every phase of the embedding under 'phase_times'.
+
+        Single embeddings hold the lock for the whole embedding and are serialized with all other calls: rerouting
+        moves embedded flows and changes the flow bookkeeping, which cannot be validated against a snapshot. Only
+        embed_flows_optimistic evaluates without the lock.
         """
+        with self._lock:
+            with self._timer.phase('embed_flow'):
+                admission = self._embed_flow(flow_request, ttl)
+
+            if admission is not None and self._timer.is_tracing():
+                admission['phase_times'] = self._timer.get_last_trace()
+            return admission
+
+    def _embed_flow(self, flow_request: FlowRequest, ttl: float = None):
+        with self._timer.phase('leases'):
+            self.expire_leases()
 
         # Check if we have hosts in the endpoints
-        if not self._network_manager.is_node_host(flow_request.sourceVM):
-            logger.error('Source is not a Host.')
-            return None
+        with self._timer.phase('endpoints'):
+            if not self._network_manager.is_node_host(flow_request.sourceVM):
+                logger.error('Source is not a Host.')
+                return None
 
-        if not self._network_manager.is_node_host(flow_request.destinationVM):
-            logger.error('Destination is not a Host.')
-            return None
+            if not self._network_manager.is_node_host(flow_request.destinationVM):
+                logger.error('Destination is not a Host.')
+                return None
 
         # Try to embed the Flow
         start_ns = time.time_ns()
-        embedding, networks, rerouted_flows = self._flow_manager.embed_new_flow(flow_request, self._network_manager.get_current_networks())
+        with self._timer.phase('embed'):
+            embedding, networks, rerouted_flows = self._flow_manager.embed_new_flow(flow_request, self._network_manager.get_current_networks())
         stop_ns = time.time_ns()
 
         if embedding is not None:
-            self._network_manager.update_network_state(networks)
-            # get reroute results
-            rerouted_flows_returnable = []
-            if rerouted_flows != None:
-                for r_flow in rerouted_flows:
-                    rerouted_flows_returnable.append({
-                        "id": r_flow.id,
-                        "path":r_flow.path,
-                        "priority": r_flow.priority
-                    })
-
-            logger.info(f'Found Path for Flow: {embedding.path} with priority {embedding.priority}')
-            flow_admission = {
-                "id": embedding.id,
-                "src": flow_request.sourceVM,
-                "dst": flow_request.destinationVM,
-                "path": embedding.path,
-                "priority": embedding.priority,
-                "embedding_strategy": str(self._flow_manager._strategy),
-                "embedding_time": stop_ns - start_ns,
-                "rerouted_flows": rerouted_flows_returnable
-            }
-            return flow_admission
+            with self._timer.phase('commit'):
+                self._network_manager.update_network_state(networks)
+                if ttl is not None:
+                    self._flow_manager.set_lease(embedding.id, ttl, time.monotonic())
+            logger.info('Found Path for Flow: %s with priority %s', embedding.path, embedding.priority)
+            return self._flow_admission(embedding, stop_ns - start_ns, rerouted_flows)
         else:
             return None
 
+    def embed_flows(self, flow_requests: List[FlowRequest], order: AdmissionOrder = AdmissionOrder.GIVEN,
+                    ttl: float = None) -> List:
+        """ Returns a FlowAdmission or None for every request (in request order)
+
+        All requests are routed up front and admitted against one working network state, which is committed once.
+        Flows are admitted in the given order and are not rerouted. embedding_time is the share of the batch time.
+        """
+        with self._lock:
+            self.expire_leases()
+            valid = self._valid_requests(flow_requests)
+            requests_to_embed = [request for request, is_valid in zip(flow_requests, valid) if is_valid]
+
+            start_ns = time.time_ns()
+            embeddings, networks = self._flow_manager.embed_flow_batch(requests_to_embed, self._network_manager.get_current_networks(), order)
+            stop_ns = time.time_ns()
+
+            self._network_manager.update_network_state(networks)
+            return self._batch_admissions(valid, embeddings, (stop_ns - start_ns) // max(len(requests_to_embed), 1), ttl)
+
+    def embed_flows_optimistic(self, flow_requests: List[FlowRequest], workers: int = None, ttl: float = None) -> List:
+        """ Returns a FlowAdmission or None for every request (in request order)
+
+        Same admissions as embed_flows, with optimistic concurrency (see OptimisticAdmission): the requests are evaluated
+        against a snapshot of the network state in ``workers`` processes without holding the lock, so other calls are
+        not blocked meanwhile. The commit validates the edges every evaluation depends on and evaluates conflicting
+        requests again. Single embed_flow calls still take the lock for the whole embedding and wait for the prepare
+        and commit steps of a batch.
+        """
+        with self._lock:
+            self.expire_leases()
+            valid = self._valid_requests(flow_requests)
+            requests_to_embed = [request for request, is_valid in zip(flow_requests, valid) if is_valid]
+
+            start_ns = time.time_ns()
+            version, snapshot = self._network_manager.get_snapshot()
+            admission = OptimisticAdmission(self._flow_manager, workers)
+            options = admission.prepare(requests_to_embed, snapshot)
+
+        proposals = admission.evaluate(requests_to_embed, options, snapshot)
+
+        with self._lock:
+            embeddings, networks = admission.commit(requests_to_embed, options, proposals,
+                                                    self._network_manager.get_current_networks(),
+                                                    self._network_manager.get_changed_edges(version))
+            stop_ns = time.time_ns()
+
+            self._network_manager.update_network_state(networks)
+            logger.info('Optimistic admission statistics: %s', admission.get_statistics())
+            return self._batch_admissions(valid, embeddings, (stop_ns - start_ns) // max(len(requests_to_embed), 1), ttl)
+
+    def _batch_admissions(self, valid: List[bool], embeddings: List, embedding_time: int, ttl: float = None) -> List:
+        if ttl is not None:
+            now = time.monotonic()
+            for embedding in embeddings:
+                if embedding is not None:
+                    self._flow_manager.set_lease(embedding.id, ttl, now)
+
+        embeddings = iter(embeddings)
+        flow_admissions = []
+        for is_valid in valid:
+            embedding = next(embeddings) if is_valid else None
+            flow_admissions.append(None if embedding is None else self._flow_admission(embedding, embedding_time, None))
+        return flow_admissions
+
+    def plan_flows(self, flow_requests: List[FlowRequest], objective: PlanObjective = PlanObjective.FLOWS,
+                   iterations: int = 200, paths_per_flow: int = 3) -> AdmissionPlan:
+        """ Plans the admission of a known flow set (see AdmissionPlanner). Nothing is embedded until commit_plan.
+
+        Requests whose source or destination is not a host are left out of the plan.
+        """
+        with self._lock:
+            valid = self._valid_requests(flow_requests)
+            requests_to_plan = [request for request, is_valid in zip(flow_requests, valid) if is_valid]
+
+            planner = AdmissionPlanner(self._flow_manager, objective, paths_per_flow, iterations)
+            return planner.plan(requests_to_plan, self._network_manager.get_current_networks())
+
+    def commit_plan(self, plan: AdmissionPlan) -> List:
+        """ Returns a FlowAdmission or None for every flow of the plan (in plan.flows order) """
+        with self._lock:
+            start_ns = time.time_ns()
+            embeddings, networks = AdmissionPlanner(self._flow_manager).commit(plan, self._network_manager.get_current_networks())
+            stop_ns = time.time_ns()
+
+            self._network_manager.update_network_state(networks)
+
+            embedding_time = (stop_ns - start_ns) // max(len(plan.flows), 1)
+            return [None if embedding is None else self._flow_admission(embedding, embedding_time, None) for embedding in embeddings]
+
+    def _valid_requests(self, flow_requests: List[FlowRequest]) -> List[bool]:
+        valid = []
+        for request in flow_requests:
+            is_valid = self._network_manager.is_node_host(request.sourceVM) and \
+                       self._network_manager.is_node_host(request.destinationVM)
+            if not is_valid:
+                logger.error('Source or Destination of %s is not a Host.', request)
+            valid.append(is_valid)
+        return valid
+
+    def _flow_admission(self, embedding, embedding_time: int, rerouted_flows) -> Dict:
+        # get reroute results
+        rerouted_flows_returnable = []
+        if rerouted_flows != None:
+            for r_flow in rerouted_flows:
+                rerouted_flows_returnable.append({
+                    "id": r_flow.id,
+                    "path":r_flow.path,
+                    "priority": r_flow.priority
+                })
+
+        flow_admission = {
+            "id": embedding.id,
+            "src": embedding.flow_request.sourceVM,
+            "dst": embedding.flow_request.destinationVM,
+            "path": embedding.path,
+            "priority": embedding.priority,
+            "embedding_strategy": str(self._flow_manager._strategy),
+            "embedding_time": embedding_time,
+            "rerouted_flows": rerouted_flows_returnable
+        }
+        return flow_admission
+
     def get_all_flows_with_information(self):
-        return self._flow_manager.get_all_flows()
+        with self._lock:
+            return self._flow_manager.get_all_flows()
+
+    def get_flows_with_information(self, flow_ids: List[int]):
+        with self._lock:
+            return self._flow_manager.get_flows(flow_ids)
+
+    def find_flows(self, src: int = None, dst: int = None, priority: int = None, switches: Tuple[int, int] = None) -> List[int]:
+        """ Ids of the flows that match all given filters: source host, destination host, queue and
+        (first switch, last switch) of the path. Cost is O(result), the ids can be passed to remove_flows.
+        """
+        with self._lock:
+            return self._flow_manager.find_flows(src, dst, priority, switches)
+
+    def get_flows_per_queue(self) -> Dict[int, int]:
+        with self._lock:
+            return self._flow_manager.get_flow_table().count('priority')
+
+    def get_flow_columns(self, names: List[str] = None) -> Dict:
+        """ NumPy columns (id, src, dst, protocol, rate, burst, deadline, priority, path_id) of all embedded flows """
+        with self._lock:
+            return self._flow_manager.get_flow_table().columns(names)
     
-    def remove_flow(self, flow_id):
-        networks = self._flow_manager.remove_flow(flow_id, self._network_manager.get_current_networks())
-        self._network_manager.update_network_state(networks)
+    def modify_flow(self, flow_id: int, rate: float = None, burst: float = None, deadline: float = None):
+        """ Returns the FlowAdmission of the modified flow or None if the new profile does not fit (the flow is kept)
+
+        The change is applied on the current path and priority if it fits, otherwise the flow is embedded again.
+        """
+        with self._lock:
+            start_ns = time.time_ns()
+            embedding, networks, rerouted_flows = self._flow_manager.modify_flow(flow_id, self._network_manager.get_current_networks(),
+                                                                                rate, burst, deadline)
+            stop_ns = time.time_ns()
+
+            if embedding is None:
+                return None
+
+            self._network_manager.update_network_state(networks)
+            return self._flow_admission(embedding, stop_ns - start_ns, rerouted_flows)
+
+    def remove_flow(self, flow_id) -> bool:
+        return len(self.remove_flows([flow_id])) > 0
+
+    def remove_flows(self, flow_ids: List[int]) -> List[int]:
+        """ Removes many flows with one network state update. Returns the ids of the removed flows. """
+        with self._lock:
+            removed, networks = self._flow_manager.remove_flows(flow_ids, self._network_manager.get_current_networks())
+            if removed:
+                self._network_manager.update_network_state(networks)
+            return removed
+
+    """ Flow leases """
+    def renew_lease(self, flow_id: int, ttl: float = None) -> bool:
+        """ Extends the lease of a flow by its ttl (or a new ttl) from now """
+        with self._lock:
+            return self._flow_manager.renew_lease(flow_id, time.monotonic(), ttl)
+
+    def get_lease_expiry(self, flow_id: int):
+        """ time.monotonic() time the lease of the flow expires, None if the flow has no lease """
+        with self._lock:
+            return self._flow_manager.get_lease_expiry(flow_id)
+
+    def set_lease_resolution(self, tick: float, slots: int = 512) -> bool:
+        with self._lock:
+            self._flow_manager.set_lease_wheel(tick, slots, time.monotonic())
+        return True
+
+    def expire_leases(self, now: float = None) -> List[int]:
+        """ Removes all flows with expired leases in one network state update. Called on every admission.
+
+        Returns the ids of the removed flows.
+        """
+        with self._lock:
+            expired = self._flow_manager.expired_leases(time.monotonic() if now is None else now)
+            if not expired:
+                return []
+
+            removed, networks = self._flow_manager.remove_flows(expired, self._network_manager.get_current_networks())
+            self._network_manager.update_network_state(networks)
+            logger.info('Leases of %s flows expired: %s', len(removed), removed)
+            return removed
+
+    """ Rebalancing """
+    def rebalance(self, time_slice: float = 0.01) -> List[Dict]:
+        """ One rebalancing step of about time_slice seconds (see Rebalancer). Returns the moved flows (id, path, priority) """
+        with self._lock:
+            moved, networks = self._rebalancer.step(self._network_manager.get_current_networks(), time_slice)
+            if moved:
+                self._network_manager.update_network_state(networks)
+        return [{"id": flow.id, "path": flow.path, "priority": flow.priority} for flow in moved]
+
+    def start_rebalancing(self, interval: float = 1.0, time_slice: float = 0.01) -> bool:
+        """ Runs a rebalancing step every interval seconds in a background thread. Admissions wait at most one time slice. """
+        if self._rebalance_thread is not None:
+            return False
+        self._rebalance_stop.clear()
+        self._rebalance_thread = threading.Thread(target=self._rebalance_loop, args=(interval, time_slice),
+                                                  name='LCDN-rebalancer', daemon=True)
+        self._rebalance_thread.start()
+        return True
+
+    def stop_rebalancing(self) -> bool:
+        if self._rebalance_thread is None:
+            return False
+        self._rebalance_stop.set()
+        self._rebalance_thread.join()
+        self._rebalance_thread = None
+        return True
+
+    def _rebalance_loop(self, interval: float, time_slice: float):
+        while not self._rebalance_stop.wait(interval):
+            try:
+                self.rebalance(time_slice)
+            except Exception:
+                logger.exception('Rebalancing step failed')
+
+    def get_rebalance_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            return self._rebalancer.get_statistics()
+
+    def close(self):
+        """ Stops background rebalancing and shuts down the reroute worker processes """
+        self.stop_rebalancing()
+        with self._lock:
+            self._flow_manager.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     """ Functions to set parameters to set routing """
     def set_rerouting_strategy(self, strategy: RerouteStrategy):
-        self._flow_manager.set_reroute_strat(strategy)
+        with self._lock:
+            self._flow_manager.set_reroute_strat(strategy)
+
+    def set_reroute_selection(self, selection: RerouteSelection) -> bool:
+        with self._lock:
+            self._flow_manager.set_reroute_selection(selection)
+        return True
+
+    def set_queue_search(self, search: QueueSearch) -> bool:
+        """
+        Queue search of NOTGREEDY embeddings. BISECT assumes that feasibility is monotone in the queue level, which
+        does not hold in general: it can pick another queue than LINEAR or reject a flow LINEAR embeds.
+        """
+        with self._lock:
+            self._flow_manager.set_queue_search(search)
+        return True
 
     def set_initial_sps(self, k_sps: int) -> bool:
-        self._flow_manager.set_init_ksp(k_sps)
+        with self._lock:
+            self._flow_manager.set_init_ksp(k_sps)
         return True
 
     def set_reroutings(self, reroutes: int) -> bool:
-        self._flow_manager.set_reroutes(reroutes)
+        with self._lock:
+            self._flow_manager.set_reroutes(reroutes)
 
     def set_ksp_offset(self, offset: int) -> bool:
-        self._flow_manager.set_ksp_offset(offset)
+        with self._lock:
+            self._flow_manager.set_ksp_offset(offset)
+
+    def set_routing_backend(self, backend: RoutingBackend, validate: bool = False) -> bool:
+        with self._lock:
+            self._flow_manager.set_routing_backend(backend, validate)
+        return True
+
+    def set_incremental_trees(self, enabled: bool, max_trees: int = 256) -> bool:
+        with self._lock:
+            self._flow_manager.set_incremental_trees(enabled, max_trees)
+        return True
+
+    def set_cost_model(self, cost_model: LinkCostModel) -> bool:
+        """ Link cost model used for routing. Applied with the next network state update. """
+        with self._lock:
+            self._flow_manager.set_cost_model(cost_model)
+        return True
+
+    def set_negative_admission_cache(self, enabled: bool, max_profiles: int = 8) -> bool:
+        """ Reject requests that failed before on the same candidate paths or host link with a less demanding profile
+        without DNC checks, until capacity is released on the links the rejection depends on. Only used without
+        rerouting (set_reroutings(0)), since later flows can become reroute candidates that make room.
+        """
+        with self._lock:
+            self._flow_manager.set_negative_cache(enabled, max_profiles)
+        return True
+
+    def set_time_budget(self, budget: float = None) -> bool:
+        """ Time budget (seconds) per embedding; when it is spent the best embedding found so far (or a rejection) is
+        returned. None disables the budget.
+        """
+        with self._lock:
+            self._flow_manager.set_time_budget(budget)
+        return True
+
+    def set_phase_timing(self, enabled: bool, trace: bool = False) -> bool:
+        """ Time the phases of every embed_flow call (see get_phase_timings). With trace, every admission also holds the
+        phase times of its own embedding.
+        """
+        with self._lock:
+            self._timer.set_enabled(enabled, trace)
+        return True
+
+    def set_promotion_pass(self, enabled: bool) -> bool:
+        """ After flows are removed, move rerouted flows on the freed links back to better queues or shorter paths """
+        with self._lock:
+            self._flow_manager.set_promotion(enabled)
+        return True
+
+    def set_parallel_reroutes(self, workers: int) -> bool:
+        """ Evaluate single flow reroute candidates concurrently in ``workers`` processes (0 or 1: sequentially). """
+        with self._lock:
+            self._flow_manager.set_parallel_reroutes(workers)
+        return True
 
     def set_initial_q_level(self, q_level: int) -> bool:
-        self._flow_manager.set_first_queue(q_level)
+        with self._lock:
+            self._flow_manager.set_first_queue(q_level)
 
     def set_lcdn_strategy(self, strategy: LCDNStrategy) -> bool:
-        self._flow_manager.set_strategy(strategy)
+        with self._lock:
+            self._flow_manager.set_strategy(strategy)
         return True
 
     def set_greedy_probability(self, p: float) -> bool:
-        self._flow_manager.set_greedy_p(p)
+        with self._lock:
+            self._flow_manager.set_greedy_p(p)
+        return True
+
+    def set_random_seed(self, seed: int = None) -> bool:
+        """ Seed of the GREEDYMIX strategy decisions (per instance, the global NumPy random state is not used) """
+        with self._lock:
+            self._flow_manager.set_seed(seed)
         return True
 
     """ Debug and ease of use Functions """
@@ -120,38 +512,85 @@ class LCDN(object):
         self._network_manager.get_id_from_ip(ip)
         return node_id 
 
+    def get_negative_admission_cache_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            return self._flow_manager.get_negative_cache_statistics()
+
+    def get_phase_timings(self) -> Dict[str, Dict]:
+        """ Histogram (count, total, mean, p50, p99, max and power of two buckets in ns) of every phase path, e.g.
+        'embed_flow/embed/reroute/evaluate'
+        """
+        with self._lock:
+            return self._timer.get_histograms()
+
+    def get_last_phase_trace(self) -> Dict[str, int]:
+        """ Phase times (ns) of the last embed_flow call (also rejected ones), needs tracing """
+        with self._lock:
+            return self._timer.get_last_trace()
+
+    def reset_phase_timings(self) -> None:
+        with self._lock:
+            self._timer.reset()
+
+    def get_violation_counts(self) -> Dict[str, Dict[int, int]]:
+        """ Number of violations of the embedding attempts of this LCDN per type and priority (pool workers not included) """
+        with self._lock:
+            return self._violations.get_counts()
+
+    def get_budget_exhaustions(self) -> int:
+        """ Number of embeddings that ran out of their time budget """
+        with self._lock:
+            return self._flow_manager.get_budget_exhaustions()
+
     def get_number_of_reroutes(self) -> int:
-        return self._flow_manager.get_number_of_reroutes()
+        with self._lock:
+            return self._flow_manager.get_number_of_reroutes()
+
+    def get_number_of_promotions(self) -> int:
+        with self._lock:
+            return self._flow_manager.get_number_of_promotions()
+
+    def get_aggregate_statistics(self) -> Dict[str, int]:
+        """ Number of (path, priority, class) aggregates and of their flows """
+        with self._lock:
+            return self._flow_manager.get_aggregate_table().get_statistics()
 
     def get_delay_of_flow(self, flow_id: int) -> float:
-        return self._flow_manager.get_delay_of_flow(flow_id, self._network_manager.get_current_networks())
+        with self._lock:
+            return self._flow_manager.get_delay_of_flow(flow_id, self._network_manager.get_current_networks())
 
     def get_all_q_delays(self):
-        return self._network_manager.get_all_delays()
+        with self._lock:
+            return self._network_manager.get_all_delays()
 
     def get_all_buffers(self):
-        return self._network_manager.get_all_buffers()
+        with self._lock:
+            return self._network_manager.get_all_buffers()
     
     def get_all_rates(self):
-        return self._network_manager.get_all_rates()
+        with self._lock:
+            return self._network_manager.get_all_rates()
     
     def draw_q_delay(self):
-        self._network_manager.get_current_networks()[0].draw_q_delay()
-        self._network_manager.get_current_networks()[1].draw_q_delay()
-        self._network_manager.get_current_networks()[2].draw_q_delay()
-        self._network_manager.get_current_networks()[3].draw_q_delay()
+        with self._lock:
+            self._network_manager.get_current_networks()[0].draw_q_delay()
+            self._network_manager.get_current_networks()[1].draw_q_delay()
+            self._network_manager.get_current_networks()[2].draw_q_delay()
+            self._network_manager.get_current_networks()[3].draw_q_delay()
 
     def draw_burst(self):
-        self._network_manager.get_current_networks()[0].draw_burst()
-        self._network_manager.get_current_networks()[1].draw_burst()
-        self._network_manager.get_current_networks()[2].draw_burst()
-        self._network_manager.get_current_networks()[3].draw_burst()
+        with self._lock:
+            self._network_manager.get_current_networks()[0].draw_burst()
+            self._network_manager.get_current_networks()[1].draw_burst()
+            self._network_manager.get_current_networks()[2].draw_burst()
+            self._network_manager.get_current_networks()[3].draw_burst()
 
     def draw_rate(self):
-        self._network_manager.get_current_networks()[0].draw_rate()
-        self._network_manager.get_current_networks()[1].draw_rate()
-        self._network_manager.get_current_networks()[2].draw_rate()
-        self._network_manager.get_current_networks()[3].draw_rate()
+        with self._lock:
+            self._network_manager.get_current_networks()[0].draw_rate()
+            self._network_manager.get_current_networks()[1].draw_rate()
+            self._network_manager.get_current_networks()[2].draw_rate()
+            self._network_manager.get_current_networks()[3].draw_rate()
 
 
 if __name__ == '__main__':
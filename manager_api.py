@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from manager import LCDN
 from pydantic import BaseModel
+from typing import Optional
 from manager import FlowRequest
 import uvicorn
 import logging
@@ -18,11 +19,16 @@ class ClientFlowRequest(BaseModel):
     rate: float
     burst: float
     deadline: float
+    ttl: Optional[float] = None
 
 
 def _get_node_id_from_ip(ip: str):
     return lcdn.get_node_id_from_ip(ip)
 
+@app.on_event('shutdown')
+def shutdown():
+    lcdn.close()
+
 @app.get('/request-node-id')
 def request_node_id(ip: str):
     # Ask LCDN for the ID
@@ -36,16 +42,24 @@ def try_flow_register(flow_request: ClientFlowRequest):
     logger.debug(f'FR: {flow_request.src_node} -> {flow_request.dst_ip}; {flow_request.rate} bits/s, {flow_request.burst} bit, max {flow_request.deadline} s')
     
     # Ask LCDN to embed the current Flow. LCDN returns the VLAN TAG for the spanning tree that contains the route
-    path, prio = lcdn.embed_flow(FlowRequest(flow_request.src_node, _get_node_id_from_ip(flow_request.dst_ip), 
-                                             last_prot, flow_request.burst, flow_request.rate, flow_request.deadline))
+    # Single flows may reroute others, so concurrent requests are serialized by the LCDN lock (not optimistic)
+    admission = lcdn.embed_flow(FlowRequest(flow_request.src_node, _get_node_id_from_ip(flow_request.dst_ip), 
+                                            last_prot, flow_request.burst, flow_request.rate, flow_request.deadline),
+                                flow_request.ttl)
 
-    return 
+    return admission
 
 
 @app.get('/remove-flow')
-def remove_flow():
+def remove_flow(flow_id: int):
     # Remove the flow in LCDN
-    return {'result': True}
+    return {'result': lcdn.remove_flow(flow_id)}
+
+
+@app.get('/renew-lease')
+def renew_lease(flow_id: int, ttl: Optional[float] = None):
+    # Keep the flow of a live client
+    return {'result': lcdn.renew_lease(flow_id, ttl)}
 
 
 if __name__ == '__main__':